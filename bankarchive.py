@@ -0,0 +1,231 @@
+import os
+import sqlite3
+from datetime import date, datetime
+from urllib.parse import quote
+
+import bankdb
+
+# Yearly archive partitions. A closed year's transactions move out of
+# bank.db into bank_YYYY.db beside it (training.db into training_YYYY.db),
+# so the live table, its indexes and everything that walks it (history
+# paging, search, edits) only hold the open years. Each archive is stamped
+# with the id of the database it came from and is never overwritten by
+# another. Archives are attached read-only, per connection, the first
+# time a query needs them: a date-ranged read attaches only the years its
+# range overlaps, and the all_transactions view unions every partition.
+#
+# Totals, the daily rollup, the ledger and its checkpoints are not touched
+# by archiving, so balances and rollup-based reports read the same as
+# before and never open an archive.
+ARCHIVE_FILE = "{stem}_{year}.db"
+ARCHIVE_SCHEMA = "archive_{year}"
+ALL_TRANSACTIONS = "all_transactions"
+# Triggers that would undo a row's totals, rollup and postings when it is
+# deleted; they are dropped while rows move out and recreated after
+SUSPENDED_TRIGGERS = ["trg_totals_delete", "trg_daily_rollup_delete", "trg_ledger_delete"]
+
+
+def archive_table(schema):
+    return f"""CREATE TABLE IF NOT EXISTS {schema}.transactions (
+                    sr_no INTEGER PRIMARY KEY,
+                    date TEXT,
+                    customer_name TEXT,
+                    account_number TEXT,
+                    ifsc_code TEXT,
+                    mobile TEXT,
+                    address TEXT,
+                    transaction_no TEXT,
+                    transaction_type TEXT,
+                    transaction_mode TEXT,
+                    bank_name TEXT,
+                    amount INTEGER)"""
+
+
+def main_file(conn):
+    main = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not main:
+        raise ValueError("Archiving needs a database file")
+    return main
+
+
+def archive_path(conn, name):
+    # Archives live next to the main database file
+    return os.path.join(os.path.dirname(main_file(conn)), name)
+
+
+def archive_name(conn, year):
+    stem = os.path.splitext(os.path.basename(main_file(conn)))[0]
+    return ARCHIVE_FILE.format(stem=stem, year=year)
+
+
+def archive_owner(path):
+    # The (database id, year) an archive file was stamped with, or None for
+    # a file that isn't an archive
+    try:
+        archive = sqlite3.connect(f"file:{quote(path)}?mode=ro", uri=True)
+        try:
+            return archive.execute("SELECT database_id, year FROM archive_owner").fetchone()
+        finally:
+            archive.close()
+    except sqlite3.Error:
+        return None
+
+
+def year_bounds(year):
+    return f"{year}-01-01", f"{year + 1}-01-01"
+
+
+def archived_years(conn):
+    return conn.execute("SELECT year, path FROM archives ORDER BY year").fetchall()
+
+
+def open_years(conn):
+    # Closed years that still have transactions in bank.db
+    rows = conn.execute("""SELECT DISTINCT CAST(substr(date, 1, 4) AS INTEGER) FROM transactions
+                        WHERE date < ?""", (f"{date.today().year}-01-01",)).fetchall()
+    return [year for year, in rows if year]
+
+
+def attach(conn, year, path):
+    schema = ARCHIVE_SCHEMA.format(year=year)
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    if schema not in attached:
+        uri = f"file:{quote(archive_path(conn, path))}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS " + schema, (uri,))
+    return schema
+
+
+def source(conn, start_date=None, end_date=None):
+    # What to select transactions FROM: the live table when no archived year
+    # overlaps [start_date, end_date], else the live table unioned with just
+    # those years. Without a range, every partition through the view.
+    if not (start_date and end_date):
+        return all_transactions(conn)
+    years = [(year, path) for year, path in archived_years(conn)
+             if start_date.year <= year <= end_date.year]
+    if not years:
+        return "transactions"
+    return f"({union(attach(conn, year, path) for year, path in years)})"
+
+
+def union(schemas):
+    return " UNION ALL ".join(["SELECT * FROM main.transactions"] +
+                              [f"SELECT * FROM {schema}.transactions" for schema in schemas])
+
+
+def all_transactions(conn):
+    # TEMP, as a view over attached databases has to be; recreated on this
+    # connection whenever a year has been archived since it was made
+    years = archived_years(conn)
+    if not years:
+        return "transactions"
+    select = union(attach(conn, year, path) for year, path in years)
+    current = conn.execute("SELECT sql FROM sqlite_temp_master WHERE name = ?", (ALL_TRANSACTIONS,)).fetchone()
+    if not current or not current[0].endswith(select):
+        conn.execute(f"DROP VIEW IF EXISTS temp.{ALL_TRANSACTIONS}")
+        conn.execute(f"CREATE TEMP VIEW {ALL_TRANSACTIONS} AS {select}")
+    return ALL_TRANSACTIONS
+
+
+def find_transaction(conn, sr_no):
+    # An archived transaction by sr_no, for receipts and detail views
+    for year, path in reversed(archived_years(conn)):
+        schema = attach(conn, year, path)
+        row = conn.execute(f"SELECT * FROM {schema}.transactions WHERE sr_no = ?", (sr_no,)).fetchone()
+        if row:
+            return row
+    return None
+
+
+def archive_year(conn, year):
+    # Moves one closed year's transactions into its archive and returns how
+    # many moved. The archive is written and committed first, then the rows
+    # leave bank.db in a second transaction; a run cut short in between
+    # leaves them in both, and running it again finishes the job.
+    if year >= date.today().year:
+        raise ValueError(f"{year} is not closed yet")
+    start, end = year_bounds(year)
+    conn.commit()
+    count = conn.execute("SELECT COUNT(*) FROM transactions WHERE date >= ? AND date < ?",
+                         (start, end)).fetchone()[0]
+    if not count:
+        return 0
+
+    database_id = bankdb.read_database_id(conn)
+    registered = conn.execute("SELECT path FROM archives WHERE year = ?", (year,)).fetchone()
+    name = registered[0] if registered else archive_name(conn, year)
+    path = archive_path(conn, name)
+    if os.path.exists(path):
+        # Only ever written into, or cleared, when it is this database's
+        # archive of this year; archives made before the stamp existed are
+        # trusted only while registered here
+        owner = archive_owner(path)
+        if owner != (database_id, year) and not (registered and owner is None):
+            raise ValueError(f"{path} is not this database's archive of {year}; move it aside first")
+        if not registered:
+            # Left by a run of this database that stopped before registering it
+            os.remove(path)
+    # Another connection may have this year attached read-only already; a
+    # name of its own keeps this read-write attachment apart
+    conn.execute("ATTACH DATABASE ? AS archive_writer", (path,))
+    try:
+        conn.execute("BEGIN")
+        conn.execute(archive_table("archive_writer"))
+        conn.execute("CREATE INDEX IF NOT EXISTS archive_writer.idx_transactions_date ON transactions (date)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS archive_writer.archive_owner (
+                        database_id TEXT NOT NULL,
+                        year INTEGER NOT NULL)""")
+        conn.execute("DELETE FROM archive_writer.archive_owner")
+        conn.execute("INSERT INTO archive_writer.archive_owner VALUES (?, ?)", (database_id, year))
+        conn.execute("""INSERT OR REPLACE INTO archive_writer.transactions
+                     SELECT * FROM main.transactions WHERE date >= ? AND date < ?""", (start, end))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive_writer")
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute("""INSERT INTO archived_rollup
+                        (day, transaction_type, transaction_mode, bank_name, amount, count)
+                        SELECT COALESCE(date(date), ''), COALESCE(transaction_type, ''),
+                               COALESCE(transaction_mode, ''), COALESCE(bank_name, ''),
+                               COALESCE(SUM(amount), 0), COUNT(*)
+                        FROM transactions
+                        WHERE date >= ? AND date < ?
+                        GROUP BY 1, 2, 3, 4
+                        ON CONFLICT DO UPDATE SET
+                            amount = amount + excluded.amount,
+                            count = count + excluded.count""", (start, end))
+        for trigger in SUSPENDED_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER {trigger}")
+        cursor.execute("DELETE FROM transactions WHERE date >= ? AND date < ?", (start, end))
+        bankdb.create_totals_triggers(cursor)
+        bankdb.create_rollup_triggers(cursor)
+        bankdb.create_ledger_triggers(cursor)
+        cursor.execute("""INSERT INTO archives (year, path, rows, archived_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (year) DO UPDATE SET
+                            rows = rows + excluded.rows,
+                            archived_at = excluded.archived_at""",
+                       (year, name, count, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return count
+
+
+def archive_through(conn, through=None, progress=None):
+    # Archives every closed year up to through (default last year);
+    # returns {year: rows moved}
+    through = through or date.today().year - 1
+    years = [year for year in open_years(conn) if year <= through]
+    moved = {}
+    for done, year in enumerate(years):
+        if progress:
+            progress(done, len(years), f"Archiving {year}")
+        moved[year] = archive_year(conn, year)
+    return moved
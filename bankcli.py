@@ -0,0 +1,206 @@
+# Headless entry point for scripted and nightly work on bank.db, without a
+# display. Every command goes through bankservice, the same code the GUI
+# runs. Only the standard library and the data layer are imported up front;
+# import / export pull in pandas or reportlab when they run, and tkinter and
+# matplotlib are never loaded.
+#
+#   python bankcli.py import statement.csv
+#   python bankcli.py export csv out.csv --from 2024-04-01 --to 2024-04-30
+#   python bankcli.py report balances --as-of 2024-03-31
+#   python bankcli.py rollup close-days
+#   python bankcli.py check
+#   python bankcli.py archive --through 2023
+#
+# Reports go to stdout as tab-separated lines with rupee amounts; progress
+# and problems go to stderr. The exit status is 1 when check finds problems
+# or a command fails.
+import argparse
+import sys
+from datetime import date
+
+import bankdb
+import bankpool
+import bankreports
+import bankservice
+from bankmoney import format_amount
+
+
+def parse_day(text):
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {text}")
+
+
+def progress(done, total=None, message=""):
+    print(message or f"{done:,}" + (f" / {total:,}" if total else ""), file=sys.stderr)
+
+
+def print_rows(rows):
+    for row in rows:
+        print("\t".join("" if value is None else str(value) for value in row))
+
+
+def date_range(args):
+    # Both ends or neither: the exporters filter only on a complete range
+    if bool(args.start_date) != bool(args.end_date):
+        raise ValueError("--from and --to must be given together")
+    return args.start_date, args.end_date
+
+
+def run_import(conn, args):
+    imported, rejected, error_file = bankservice.import_csv(conn, args.file, progress)
+    print(f"imported {imported:,} rows, rejected {rejected:,}", file=sys.stderr)
+    if error_file:
+        print(f"rejected rows written to {error_file}", file=sys.stderr)
+    return 0
+
+
+def run_export(conn, args):
+    start_date, end_date = date_range(args)
+    columns = args.columns.split(",") if args.columns else None
+    if args.format == "csv":
+        count = bankservice.export_csv(conn, args.output, columns, start_date, end_date, progress)
+        print(f"exported {count:,} rows to {args.output}", file=sys.stderr)
+    elif args.format == "excel":
+        count = bankservice.export_excel(conn, args.output, columns, start_date, end_date, progress)
+        print(f"exported {count:,} rows to {args.output}", file=sys.stderr)
+    else:
+        pages = bankservice.export_pdf(conn, args.output, start_date, end_date, progress)
+        print(f"wrote {pages:,} pages to {args.output}", file=sys.stderr)
+    return 0
+
+
+def run_report(conn, args):
+    if args.report == "summary":
+        end_date = args.end_date or date.today()
+        start_date = args.start_date or end_date.replace(day=1)
+        print_rows((txn_type, mode, format_amount(amount))
+                   for txn_type, mode, amount in bankservice.summary_report(conn, start_date, end_date))
+    elif args.report == "daily":
+        print_rows((day, format_amount(deposits), format_amount(withdrawals))
+                   for day, deposits, withdrawals in bankservice.daily_summary(conn))
+    elif args.report == "balances":
+        # Close of business on --as-of, or the live balances without it
+        if args.as_of:
+            balances = bankservice.balances_as_of(conn, args.as_of)
+        else:
+            balances = bankdb.read_balances(conn.cursor())
+        print_rows((account, format_amount(balance)) for account, balance in sorted(balances.items()))
+    elif args.report in bankreports.REPORTS:
+        end_date = args.end_date or date.today()
+        start_date = args.start_date or end_date.replace(day=1)
+        columns, rows = bankservice.report(conn, args.report, start_date, end_date)
+        money = [column in bankreports.MONEY_COLUMNS for column in columns]
+        print_rows([columns] + [[format_amount(value) if is_money else value
+                                 for value, is_money in zip(row, money)] for row in rows])
+    else:
+        figures = bankservice.dashboard(conn, args.as_of)
+        print_rows([
+            ("cash", format_amount(figures['cash'])),
+            *((bankdb.bank_account(bank_name), format_amount(balance))
+              for bank_name, balance in figures['banks']),
+            ("total", format_amount(figures['total'])),
+            ("deposits", format_amount(figures['deposits'])),
+            ("withdrawals", format_amount(figures['withdrawals'])),
+            (f"closing {figures['closing_day']}", format_amount(figures['closing'])),
+        ])
+    return 0
+
+
+def run_rollup(conn, args):
+    if args.action == "rebuild":
+        bankservice.rebuild_rollup(conn)
+        print("daily rollup rebuilt", file=sys.stderr)
+    else:
+        written = bankservice.close_days(conn)
+        print(f"wrote {written:,} checkpoint rows", file=sys.stderr)
+    return 0
+
+
+def run_archive(conn, args):
+    moved = bankservice.archive_years(conn, args.through, progress)
+    for year, rows in moved.items():
+        print(f"archived {rows:,} rows of {year}", file=sys.stderr)
+    if not moved:
+        print("no closed years left to archive", file=sys.stderr)
+    return 0
+
+
+def run_check(conn, args):
+    problems = bankservice.check_integrity(conn, repair=not args.no_repair)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if not problems:
+        print("all checks passed", file=sys.stderr)
+    elif not args.no_repair:
+        print("derived tables rebuilt", file=sys.stderr)
+    return 1 if problems else 0
+
+
+def run_migrate(conn, args):
+    # Opening the database already migrated it
+    print(f"schema version {bankdb.schema_version(conn)}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bankingsoft", description="bank.db without the GUI")
+    parser.add_argument("--db", default=bankdb.DB_PATH, help=f"database file (default {bankdb.DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="import transactions from a CSV file")
+    command.add_argument("file")
+    command.set_defaults(run=run_import)
+
+    command = commands.add_parser("export", help="export transactions")
+    command.add_argument("format", choices=["csv", "excel", "pdf"])
+    command.add_argument("output")
+    command.add_argument("--from", dest="start_date", type=parse_day)
+    command.add_argument("--to", dest="end_date", type=parse_day)
+    command.add_argument("--columns", help="comma-separated columns (csv and excel only)")
+    command.set_defaults(run=run_export)
+
+    command = commands.add_parser("report", help="print a report")
+    command.add_argument("report", choices=["summary", "daily", "balances", "totals",
+                                                "by_type", "daily_totals", "by_bank", "top_customers"])
+    command.add_argument("--from", dest="start_date", type=parse_day,
+                         help="summary and range reports: first day (default start of the month)")
+    command.add_argument("--to", dest="end_date", type=parse_day, help="summary and range reports: last day (default today)")
+    command.add_argument("--as-of", type=parse_day,
+                         help="balances / totals: close of business on this day")
+    command.set_defaults(run=run_report)
+
+    command = commands.add_parser("rollup", help="maintain the derived daily tables")
+    command.add_argument("action", choices=["rebuild", "close-days"])
+    command.set_defaults(run=run_rollup)
+
+    command = commands.add_parser("check", help="run every integrity check")
+    command.add_argument("--no-repair", action="store_true",
+                         help="only report problems, leave the derived tables untouched")
+    command.set_defaults(run=run_check)
+
+    command = commands.add_parser("archive", help="move closed years out to <name>_YYYY.db files")
+    command.add_argument("--through", type=int, help="last year to archive (default last year)")
+    command.set_defaults(run=run_archive)
+
+    command = commands.add_parser("migrate", help="bring the schema up to date")
+    command.set_defaults(run=run_migrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    conn = bankpool.open_connection(args.db)
+    try:
+        bankdb.migrate(conn)
+        return args.run(conn, args)
+    except Exception as e:
+        print(f"bankingsoft: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
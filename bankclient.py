@@ -0,0 +1,360 @@
+import functools
+import http.client
+import json
+import sqlite3
+import threading
+from datetime import date
+from urllib.parse import urlencode, urlsplit, quote
+
+import bankdb
+import bankpool
+import bankservice
+import bankwrites
+
+# The books the GUI works on: either bank.db on this machine or a bankserver
+# shared by several counters. Both hand each thread a session from
+# connection() (so a bankjobs.JobExecutor can run on either) whose methods
+# are the bankservice functions without the conn argument. Calling one of
+# those methods on the books object itself uses the calling thread's session.
+#
+# Books also publish a change event for every transaction row written
+# through them, once it has committed: listener(kind, sr_no) with kind
+# "insert", "update" or "delete", or ("reload", None) after a bulk import.
+# Listeners run on the thread that made the write.
+CHANGE_WRITES = {"add_transaction", "insert_transaction", "update_transaction",
+                 "delete_transaction", "import_csv"}
+# Requests that are safe to send again when the response was lost
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+
+def open_books(server=None, path=bankdb.DB_PATH):
+    return RemoteBooks(server) if server else LocalBooks(path)
+
+
+class ChangeFeed:
+    def __init__(self):
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def publish(self, kind, sr_no=None):
+        for listener in list(self.listeners):
+            listener(kind, sr_no)
+
+    def published(self, name, args, result):
+        # The event for a successful write of bankservice function name
+        if name in ("add_transaction", "insert_transaction"):
+            self.publish("insert", result)
+        elif name == "update_transaction":
+            self.publish("update", args[0])
+        elif name == "delete_transaction":
+            if result:
+                self.publish("delete", args[0])
+        elif name == "import_csv":
+            if result[0]:
+                self.publish("reload")
+
+
+class WatchedSession:
+    # A session whose transaction writes publish to the books' change feed
+    def __init__(self, session, changes):
+        self.session = session
+        self.changes = changes
+
+    def __getattr__(self, name):
+        attr = getattr(self.session, name)
+        if name not in CHANGE_WRITES:
+            return attr
+
+        def write(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            self.changes.published(name, args, result)
+            return result
+        return write
+
+
+def publish_outcomes(changes, writes, outcomes):
+    for write, (ok, value) in zip(writes, outcomes):
+        if ok:
+            changes.published(write.name, write.args, value)
+    return outcomes
+
+
+class LocalSession:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        return functools.partial(getattr(bankservice, name), self.conn)
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+class LocalBooks:
+    def __init__(self, path=bankdb.DB_PATH):
+        self.pool = bankpool.ConnectionPool(path)
+        self.changes = ChangeFeed()
+
+    def connection(self):
+        return WatchedSession(LocalSession(self.pool.connection()), self.changes)
+
+    def release(self):
+        self.pool.release()
+
+    def close(self):
+        self.pool.close()
+
+    def write_queue(self, post=None, on_batch=None):
+        # Writes are named after bankservice functions that don't commit
+        # (insert_transaction); a batch shares one commit
+        def apply(writes):
+            outcomes = bankwrites.apply_batch(self.pool.connection(),
+                                              [(getattr(bankservice, write.name), write.args) for write in writes])
+            return publish_outcomes(self.changes, writes, outcomes)
+        return bankwrites.WriteQueue(apply, post, on_batch)
+
+    def __getattr__(self, name):
+        return getattr(self.connection(), name)
+
+
+class ApiError(Exception):
+    pass
+
+
+# One keep-alive HTTP connection to the server. Amounts travel as integer
+# paise, dates as ISO strings; rows come back as tuples like the local ones.
+class RemoteSession:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.http = None
+
+    def request(self, method, path, params=None, body=None):
+        if params:
+            path += "?" + urlencode({key: value for key, value in params.items() if value is not None})
+        payload = None if body is None else json.dumps(body, default=str)
+        headers = {"Content-Type": "application/json"} if payload else {}
+        # A kept-alive connection the server has since closed fails on first
+        # use; retry once on a fresh one. A POST is only retried when it
+        # failed before it was sent: once sent, the server may have acted on
+        # it, and sending it again could add the same transaction twice.
+        for attempt in (0, 1):
+            reused = self.http is not None
+            if self.http is None:
+                self.http = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            sent = False
+            try:
+                self.http.request(method, path, payload, headers)
+                sent = True
+                response = self.http.getresponse()
+                data = json.loads(response.read() or "null")
+                break
+            except (ConnectionError, http.client.HTTPException):
+                self.close()
+                retry = method in IDEMPOTENT_METHODS or (reused and not sent)
+                if attempt or not retry:
+                    raise
+        if response.status == 404:
+            return None
+        if response.status == 409:
+            # A unique constraint, as it would be raised locally
+            raise sqlite3.IntegrityError(data["error"])
+        if response.status >= 400:
+            raise ApiError(data.get("error", f"HTTP {response.status}"))
+        return data
+
+    def rollback(self):
+        # Every request commits or rolls back on the server
+        pass
+
+    def close(self):
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+
+    # Users
+    def register_user(self, username, password, security_question, security_answer):
+        self.request("POST", "/users", body={
+            "username": username, "password": password,
+            "security_question": security_question, "security_answer": security_answer})
+
+    def authenticate(self, username, password):
+        return self.request("POST", "/login", body={"username": username, "password": password})["ok"]
+
+    def security_question(self, username):
+        result = self.request("GET", f"/users/{quote(username, safe='')}/question")
+        return result and result["question"]
+
+    def reset_password(self, username, answer, new_password):
+        return self.request("POST", f"/users/{quote(username, safe='')}/password",
+                            body={"answer": answer, "password": new_password})["ok"]
+
+    # Transactions
+    def add_transaction(self, customer_name, account_number, ifsc_code, mobile, address,
+                        transaction_no, transaction_type, transaction_mode, bank_name, amount):
+        return self.request("POST", "/transactions", body=transaction_body(locals()))["sr_no"]
+
+    # The server groups concurrent inserts into shared commits itself
+    insert_transaction = add_transaction
+
+    def get_transaction(self, sr_no):
+        row = self.request("GET", f"/transactions/{sr_no}")
+        return tuple(row) if row else None
+
+    def update_transaction(self, sr_no, customer_name, account_number, ifsc_code, mobile, address,
+                           transaction_no, transaction_type, transaction_mode, bank_name, amount):
+        if self.request("PUT", f"/transactions/{sr_no}", body=transaction_body(locals())) is None:
+            raise ApiError(f"No transaction {sr_no}")
+
+    def delete_transaction(self, sr_no):
+        return self.request("DELETE", f"/transactions/{sr_no}") is not None
+
+    def history_page(self, columns, limit, history_filter=None, older_than=None, newer_than=None):
+        start_date, end_date = history_filter or (None, None)
+        older_than = older_than or (None, None)
+        newer_than = newer_than or (None, None)
+        rows = self.request("GET", "/transactions", {
+            "columns": column_names(columns), "limit": limit,
+            "from": start_date, "to": end_date,
+            "older_date": older_than[0], "older_sr_no": older_than[1],
+            "newer_date": newer_than[0], "newer_sr_no": newer_than[1],
+        })
+        return [tuple(row) for row in rows]
+
+    def transaction_rows(self, columns, sr_nos):
+        rows = self.request("GET", "/transactions/rows",
+                            {"columns": column_names(columns), "ids": ",".join(map(str, sr_nos))})
+        return [tuple(row) for row in rows]
+
+    def search_transactions(self, columns, query, limit):
+        rows = self.request("GET", "/transactions/search",
+                            {"columns": column_names(columns), "q": query, "limit": limit})
+        return [tuple(row) for row in rows]
+
+    # Banks and balances
+    def list_banks(self):
+        return self.request("GET", "/banks")
+
+    def set_bank_balance(self, bank_name, balance):
+        self.request("PUT", f"/banks/{quote(bank_name, safe='')}", body={"balance": balance})
+
+    def delete_bank(self, bank_name):
+        return self.request("DELETE", f"/banks/{quote(bank_name, safe='')}") is not None
+
+    def set_cash(self, cash):
+        self.request("PUT", "/cash", body={"balance": cash})
+
+    def close_days(self):
+        return self.request("POST", "/close-days")["written"]
+
+    def dashboard(self, closing_day=None):
+        figures = self.request("GET", "/dashboard", {"closing_day": closing_day})
+        figures['banks'] = [tuple(bank) for bank in figures['banks']]
+        figures['closing_day'] = date.fromisoformat(figures['closing_day'])
+        return figures
+
+    def balances_as_of(self, day):
+        return self.request("GET", "/balances", {"as_of": day})
+
+    def balance_history(self, start_date, end_date):
+        history = self.request("GET", "/balances/history", {"from": start_date, "to": end_date})
+        return {account: [tuple(point) for point in points] for account, points in history.items()}
+
+    # Reports
+    def report(self, name, start_date, end_date):
+        # Cached on the server
+        result = self.request("GET", f"/reports/{name}", {"from": start_date, "to": end_date})
+        if result is None:
+            raise ApiError(f"Unknown report: {name}")
+        return result["columns"], [tuple(row) for row in result["rows"]]
+
+    def summary_report(self, start_date, end_date):
+        return [row[:3] for row in self.report("summary", start_date, end_date)[1]]
+
+    def cash_flow(self, start_date, end_date, bucket="day", series="total", points=None):
+        flow = self.request("GET", "/reports/cash-flow", {"from": start_date, "to": end_date,
+                                                           "bucket": bucket, "series": series, "points": points})
+        flow['rows'] = [tuple(row) for row in flow['rows']]
+        return flow
+
+    def daily_summary(self):
+        return [tuple(row) for row in self.request("GET", "/reports/daily")]
+
+    def report_rows(self, start_date, end_date):
+        return self.report("detailed", start_date, end_date)
+
+    # Receipts are drawn here from the server's copy of the transaction;
+    # bulk import and export read and write files on the machine holding
+    # bank.db, so they stay on the server (bankcli there)
+    def build_receipt(self, sr_no, filename):
+        import bankreceipts
+        bankreceipts.build_receipt(self.get_transaction(sr_no), filename)
+
+    def unavailable(self, *args, **kwargs):
+        raise ApiError("Not available when connected to a server; run bankcli on the server instead")
+
+    import_csv = export_csv = export_excel = export_pdf = batch_receipts = unavailable
+
+    # Maintenance
+    def check_integrity(self, repair=True, progress=None):
+        # One request; it can only be cancelled before it is sent
+        if progress:
+            progress(0, None, "Checking on the server")
+        return self.request("POST", "/check", body={"repair": repair})["problems"]
+
+    def rebuild_rollup(self):
+        self.request("POST", "/rollup")
+
+
+def transaction_body(fields):
+    return {name: fields[name] for name in bankservice.TRANSACTION_COLUMNS if name in fields}
+
+
+def column_names(columns):
+    # The server takes a list of column names, never SQL
+    return ",".join(name.strip() for name in columns.split(","))
+
+
+class RemoteBooks:
+    def __init__(self, url):
+        self.url = url
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.changes = ChangeFeed()
+
+    def connection(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = RemoteSession(self.url)
+            with self.lock:
+                self.sessions.append(session)
+            session = self.local.session = WatchedSession(session, self.changes)
+        return session
+
+    def release(self):
+        pass
+
+    def write_queue(self, post=None, on_batch=None):
+        # Sent one request each; the batch only coalesces the callbacks
+        def apply(writes):
+            session = self.connection().session
+            outcomes = bankwrites.apply_each(session, [(getattr(RemoteSession, write.name), write.args)
+                                                       for write in writes])
+            return publish_outcomes(self.changes, writes, outcomes)
+        return bankwrites.WriteQueue(apply, post, on_batch)
+
+    def close(self):
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+
+    def __getattr__(self, name):
+        return getattr(self.connection(), name)
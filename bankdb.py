@@ -0,0 +1,849 @@
+import re
+import sqlite3
+import uuid
+from datetime import date, datetime, timedelta
+
+DB_PATH = 'bank.db'
+
+# Ledger accounts. Every transaction posts to the till (cash) or one bank
+# account and the opposite amount to the customers account; balances set by
+# hand are posted against adjustments. Debits are positive, credits
+# negative, and the postings of any entry sum to zero.
+CASH_ACCOUNT = 'cash'
+BANK_ACCOUNT_PREFIX = 'bank:'
+CUSTOMERS_ACCOUNT = 'customers'
+ADJUSTMENTS_ACCOUNT = 'adjustments'
+
+
+# Schema steps. Each step runs once, in order, inside its own transaction and
+# is recorded in schema_version. Never edit a step that has shipped; append a
+# new one instead.
+def create_base_tables(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    password TEXT,
+                    security_question TEXT,
+                    security_answer TEXT)""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS transactions (
+                    sr_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT,
+                    customer_name TEXT,
+                    account_number TEXT,
+                    ifsc_code TEXT,
+                    mobile TEXT,
+                    address TEXT,
+                    transaction_no TEXT,
+                    transaction_type TEXT,
+                    transaction_mode TEXT,
+                    bank_name TEXT,
+                    amount REAL)""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS balances (
+                    cash REAL DEFAULT 0)""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS banks (
+                    bank_name TEXT PRIMARY KEY,
+                    balance REAL DEFAULT 0)""")
+
+    if not cursor.execute("SELECT 1 FROM balances").fetchone():
+        cursor.execute("INSERT INTO balances (cash) VALUES (0)")
+
+
+def add_secondary_indexes(cursor):
+    # History paging walks transactions by date; sr_no is the rowid, so this
+    # index is exactly (date, sr_no) and serves keyset pages without a sort.
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_date
+                    ON transactions (date)""")
+    # Date-range reports and the daily summary aggregate these columns only,
+    # so they can be answered from the index without touching the table.
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_date_cover
+                    ON transactions (date, transaction_type, transaction_mode, bank_name, amount)""")
+    # Deposit / withdrawal totals on the dashboard
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_type
+                    ON transactions (transaction_type, amount)""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_bank
+                    ON transactions (bank_name, date)""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_account
+                    ON transactions (account_number)""")
+    cursor.execute("""CREATE INDEX IF NOT EXISTS idx_transactions_txn_no
+                    ON transactions (transaction_no)""")
+
+
+def add_totals_table(cursor):
+    # Running deposit / withdrawal totals, kept current by triggers so every
+    # write path (GUI, CSV import, manual SQL) updates them in the same
+    # transaction and the dashboard never has to SUM the whole table.
+    cursor.execute("""CREATE TABLE IF NOT EXISTS totals (
+                    transaction_type TEXT PRIMARY KEY,
+                    amount REAL NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0)""")
+    create_totals_triggers(cursor)
+    rebuild_totals(cursor)
+
+
+def create_totals_triggers(cursor):
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_totals_insert
+                    AFTER INSERT ON transactions
+                    WHEN NEW.transaction_type IS NOT NULL
+                    BEGIN
+                        INSERT INTO totals (transaction_type, amount, count)
+                        VALUES (NEW.transaction_type, COALESCE(NEW.amount, 0), 1)
+                        ON CONFLICT (transaction_type) DO UPDATE SET
+                            amount = amount + excluded.amount,
+                            count = count + 1;
+                    END""")
+
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_totals_delete
+                    AFTER DELETE ON transactions
+                    WHEN OLD.transaction_type IS NOT NULL
+                    BEGIN
+                        UPDATE totals SET
+                            amount = amount - COALESCE(OLD.amount, 0),
+                            count = count - 1
+                        WHERE transaction_type = OLD.transaction_type;
+                    END""")
+
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_totals_update
+                    AFTER UPDATE OF transaction_type, amount ON transactions
+                    BEGIN
+                        UPDATE totals SET
+                            amount = amount - COALESCE(OLD.amount, 0),
+                            count = count - 1
+                        WHERE transaction_type = OLD.transaction_type;
+                        INSERT INTO totals (transaction_type, amount, count)
+                        SELECT NEW.transaction_type, COALESCE(NEW.amount, 0), 1
+                        WHERE NEW.transaction_type IS NOT NULL
+                        ON CONFLICT (transaction_type) DO UPDATE SET
+                            amount = amount + excluded.amount,
+                            count = count + 1;
+                    END""")
+
+
+def add_daily_rollup(cursor):
+    # Per-day aggregates keyed by (day, type, mode, bank). Cash rows and
+    # anything else without a bank use '' so the key never contains NULL.
+    cursor.execute("""CREATE TABLE IF NOT EXISTS daily_rollup (
+                    day TEXT NOT NULL,
+                    transaction_type TEXT NOT NULL,
+                    transaction_mode TEXT NOT NULL,
+                    bank_name TEXT NOT NULL,
+                    amount REAL NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, transaction_type, transaction_mode, bank_name))
+                    WITHOUT ROWID""")
+    create_rollup_triggers(cursor)
+    rebuild_daily_rollup(cursor)
+
+
+def create_rollup_triggers(cursor):
+    add_new = """INSERT INTO daily_rollup
+                    (day, transaction_type, transaction_mode, bank_name, amount, count)
+                    VALUES (COALESCE(date(NEW.date), ''), COALESCE(NEW.transaction_type, ''),
+                            COALESCE(NEW.transaction_mode, ''), COALESCE(NEW.bank_name, ''),
+                            COALESCE(NEW.amount, 0), 1)
+                    ON CONFLICT DO UPDATE SET
+                        amount = amount + excluded.amount,
+                        count = count + 1;"""
+    remove_old = """UPDATE daily_rollup SET
+                        amount = amount - COALESCE(OLD.amount, 0),
+                        count = count - 1
+                    WHERE day = COALESCE(date(OLD.date), '')
+                      AND transaction_type = COALESCE(OLD.transaction_type, '')
+                      AND transaction_mode = COALESCE(OLD.transaction_mode, '')
+                      AND bank_name = COALESCE(OLD.bank_name, '');
+                    DELETE FROM daily_rollup
+                    WHERE day = COALESCE(date(OLD.date), '')
+                      AND transaction_type = COALESCE(OLD.transaction_type, '')
+                      AND transaction_mode = COALESCE(OLD.transaction_mode, '')
+                      AND bank_name = COALESCE(OLD.bank_name, '')
+                      AND count <= 0;"""
+
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_daily_rollup_insert
+                    AFTER INSERT ON transactions
+                    BEGIN
+                        {add_new}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_daily_rollup_delete
+                    AFTER DELETE ON transactions
+                    BEGIN
+                        {remove_old}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_daily_rollup_update
+                    AFTER UPDATE OF date, transaction_type, transaction_mode, bank_name, amount
+                    ON transactions
+                    BEGIN
+                        {remove_old}
+                        {add_new}
+                    END""")
+
+
+SEARCH_COLUMNS = 'customer_name, account_number, mobile, address, transaction_no'
+
+
+def add_search_index(cursor):
+    # External-content FTS5 index: the text lives in transactions only and
+    # the index is kept in sync by triggers. The prefix indexes make
+    # search-as-you-type prefix queries index lookups instead of term scans.
+    cursor.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts
+                    USING fts5({SEARCH_COLUMNS},
+                               content='transactions', content_rowid='sr_no',
+                               prefix='1 2 3')""")
+    create_search_triggers(cursor)
+    cursor.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def create_search_triggers(cursor):
+    new_values = ", ".join(f"NEW.{col}" for col in SEARCH_COLUMNS.split(", "))
+    old_values = ", ".join(f"OLD.{col}" for col in SEARCH_COLUMNS.split(", "))
+    add_new = f"""INSERT INTO transactions_fts (rowid, {SEARCH_COLUMNS})
+                  VALUES (NEW.sr_no, {new_values});"""
+    remove_old = f"""INSERT INTO transactions_fts (transactions_fts, rowid, {SEARCH_COLUMNS})
+                     VALUES ('delete', OLD.sr_no, {old_values});"""
+
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_fts_insert
+                    AFTER INSERT ON transactions
+                    BEGIN
+                        {add_new}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_fts_delete
+                    AFTER DELETE ON transactions
+                    BEGIN
+                        {remove_old}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_fts_update
+                    AFTER UPDATE OF {SEARCH_COLUMNS} ON transactions
+                    BEGIN
+                        {remove_old}
+                        {add_new}
+                    END""")
+
+
+def store_amounts_in_paise(cursor):
+    # REAL rupees -> INTEGER paise (see bankmoney). SQLite can't change a
+    # column's type in place, so each table is rebuilt under a new name with
+    # the amount rounded to the nearest paisa and renamed back. Dropping the
+    # old transactions table drops its indexes and triggers with it; they
+    # are recreated by the earlier steps' helpers. sr_no values are kept, so
+    # the search index, keyed by them, stays valid as it is.
+    seq = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+    cursor.execute("""CREATE TABLE transactions_new (
+                    sr_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date TEXT,
+                    customer_name TEXT,
+                    account_number TEXT,
+                    ifsc_code TEXT,
+                    mobile TEXT,
+                    address TEXT,
+                    transaction_no TEXT,
+                    transaction_type TEXT,
+                    transaction_mode TEXT,
+                    bank_name TEXT,
+                    amount INTEGER)""")
+    cursor.execute("""INSERT INTO transactions_new
+                    SELECT sr_no, date, customer_name, account_number, ifsc_code, mobile,
+                           address, transaction_no, transaction_type, transaction_mode,
+                           bank_name, CAST(ROUND(amount * 100) AS INTEGER)
+                    FROM transactions""")
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_new RENAME TO transactions")
+    if seq:
+        # Keep AUTOINCREMENT from handing out sr_no values of deleted rows
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'transactions'")
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', ?)", seq)
+
+    cursor.execute("CREATE TABLE balances_new (cash INTEGER DEFAULT 0)")
+    cursor.execute("""INSERT INTO balances_new
+                    SELECT CAST(ROUND(cash * 100) AS INTEGER) FROM balances""")
+    cursor.execute("DROP TABLE balances")
+    cursor.execute("ALTER TABLE balances_new RENAME TO balances")
+
+    cursor.execute("""CREATE TABLE banks_new (
+                    bank_name TEXT PRIMARY KEY,
+                    balance INTEGER DEFAULT 0)""")
+    cursor.execute("""INSERT INTO banks_new
+                    SELECT bank_name, CAST(ROUND(balance * 100) AS INTEGER) FROM banks""")
+    cursor.execute("DROP TABLE banks")
+    cursor.execute("ALTER TABLE banks_new RENAME TO banks")
+
+    cursor.execute("DROP TABLE totals")
+    cursor.execute("""CREATE TABLE totals (
+                    transaction_type TEXT PRIMARY KEY,
+                    amount INTEGER NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0)""")
+    cursor.execute("DROP TABLE daily_rollup")
+    cursor.execute("""CREATE TABLE daily_rollup (
+                    day TEXT NOT NULL,
+                    transaction_type TEXT NOT NULL,
+                    transaction_mode TEXT NOT NULL,
+                    bank_name TEXT NOT NULL,
+                    amount INTEGER NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, transaction_type, transaction_mode, bank_name))
+                    WITHOUT ROWID""")
+
+    add_secondary_indexes(cursor)
+    create_totals_triggers(cursor)
+    create_rollup_triggers(cursor)
+    create_search_triggers(cursor)
+    rebuild_totals(cursor)
+    rebuild_daily_rollup(cursor)
+
+
+def add_ledger(cursor):
+    # Append-only double-entry ledger replacing the balances that used to
+    # be mutated in place. Triggers post every transaction as it is
+    # written; an edit or delete reverses what the transaction had posted
+    # so far with compensating postings, so nothing is ever rewritten.
+    cursor.execute("""CREATE TABLE postings (
+                    id INTEGER PRIMARY KEY,
+                    sr_no INTEGER,
+                    date TEXT NOT NULL,
+                    account TEXT NOT NULL,
+                    amount INTEGER NOT NULL)""")
+    cursor.execute("CREATE INDEX idx_postings_account_date ON postings (account, date)")
+    cursor.execute("CREATE INDEX idx_postings_sr_no ON postings (sr_no)")
+    # Current balance per account, for O(1) reads
+    cursor.execute("""CREATE TABLE account_balances (
+                    account TEXT PRIMARY KEY,
+                    balance INTEGER NOT NULL DEFAULT 0,
+                    postings INTEGER NOT NULL DEFAULT 0)
+                    WITHOUT ROWID""")
+    # Closing balance of an account at the end of a day
+    cursor.execute("""CREATE TABLE balance_checkpoints (
+                    account TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    balance INTEGER NOT NULL,
+                    PRIMARY KEY (account, day))
+                    WITHOUT ROWID""")
+
+    # Backfill from the transaction history, then true the result up to the
+    # balances as they stand, which also carry every manual balance change
+    # and the drift left behind by past edits and deletes.
+    cursor.execute(f"""INSERT INTO postings (sr_no, date, account, amount)
+                    SELECT sr_no, date, account, amount FROM (
+                        SELECT sr_no, date, 0 AS leg, {POSTING_ACCOUNT.format(row='t')} AS account,
+                               {POSTING_SIGN.format(row='t')} * amount AS amount
+                        FROM transactions t WHERE {POSTABLE.format(row='t')}
+                        UNION ALL
+                        SELECT sr_no, date, 1, '{CUSTOMERS_ACCOUNT}',
+                               -{POSTING_SIGN.format(row='t')} * amount
+                        FROM transactions t WHERE {POSTABLE.format(row='t')})
+                    ORDER BY date, sr_no, leg""")
+    rebuild_account_balances(cursor)
+    create_ledger_triggers(cursor)
+    current = [(CASH_ACCOUNT, cursor.execute("SELECT COALESCE(SUM(cash), 0) FROM balances").fetchone()[0])]
+    current += [(bank_account(bank_name), balance)
+                for bank_name, balance in cursor.execute("SELECT bank_name, balance FROM banks").fetchall()]
+    for account, balance in current:
+        post_adjustment(cursor, account, balance or 0)
+    cursor.execute("DROP TABLE balances")
+    cursor.execute("ALTER TABLE banks DROP COLUMN balance")
+
+
+# Ledger posting rules, as SQL over a transactions row
+POSTABLE = """{row}.transaction_type IN ('Deposit', 'Withdrawal') AND {row}.amount IS NOT NULL
+              AND ({row}.transaction_mode = 'Cash'
+                   OR ({row}.transaction_mode = 'Bank' AND {row}.bank_name IS NOT NULL))"""
+POSTING_ACCOUNT = (f"CASE {{row}}.transaction_mode WHEN 'Cash' THEN '{CASH_ACCOUNT}' "
+                   f"ELSE '{BANK_ACCOUNT_PREFIX}' || {{row}}.bank_name END")
+POSTING_SIGN = "CASE {row}.transaction_type WHEN 'Deposit' THEN 1 ELSE -1 END"
+NOW = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+
+
+def create_ledger_triggers(cursor):
+    # A new transaction posts on its own date; the corrections for an edit
+    # are dated when the edit is made, so past closing balances never change
+    post_new = """INSERT INTO postings (sr_no, date, account, amount)
+                   SELECT NEW.sr_no, {date}, {account}, {sign} * NEW.amount
+                   WHERE {postable};
+                   INSERT INTO postings (sr_no, date, account, amount)
+                   SELECT NEW.sr_no, {date}, '{customers}', -{sign} * NEW.amount
+                   WHERE {postable};""".format(
+        account=POSTING_ACCOUNT.format(row='NEW'), sign=POSTING_SIGN.format(row='NEW'),
+        postable=POSTABLE.format(row='NEW'), customers=CUSTOMERS_ACCOUNT, date='{date}')
+    # Reverses the net of everything posted for the row so far
+    reverse_old = f"""INSERT INTO postings (sr_no, date, account, amount)
+                      SELECT OLD.sr_no, {NOW}, account, -SUM(amount)
+                      FROM postings WHERE sr_no = OLD.sr_no
+                      GROUP BY account HAVING SUM(amount) != 0
+                      ORDER BY account;"""
+
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_insert
+                    AFTER INSERT ON transactions
+                    BEGIN
+                        {post_new.format(date='NEW.date')}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_delete
+                    AFTER DELETE ON transactions
+                    BEGIN
+                        {reverse_old}
+                    END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_update
+                    AFTER UPDATE OF transaction_type, transaction_mode, bank_name, amount
+                    ON transactions
+                    WHEN OLD.transaction_type IS NOT NEW.transaction_type
+                      OR OLD.transaction_mode IS NOT NEW.transaction_mode
+                      OR OLD.bank_name IS NOT NEW.bank_name
+                      OR OLD.amount IS NOT NEW.amount
+                    BEGIN
+                        {reverse_old}
+                        {post_new.format(date=NOW)}
+                    END""")
+
+    # Keep the snapshot current, and any checkpoint at or after the
+    # posting's day, which only exists when a posting is back-dated
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_postings_balance
+                    AFTER INSERT ON postings
+                    BEGIN
+                        INSERT INTO account_balances (account, balance, postings)
+                        VALUES (NEW.account, NEW.amount, 1)
+                        ON CONFLICT (account) DO UPDATE SET
+                            balance = balance + excluded.balance,
+                            postings = postings + 1;
+                        UPDATE balance_checkpoints SET balance = balance + NEW.amount
+                        WHERE account = NEW.account AND day >= date(NEW.date);
+                    END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_postings_no_update
+                    BEFORE UPDATE ON postings
+                    BEGIN
+                        SELECT RAISE(ABORT, 'postings are append-only');
+                    END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_postings_no_delete
+                    BEFORE DELETE ON postings
+                    BEGIN
+                        SELECT RAISE(ABORT, 'postings are append-only');
+                    END""")
+
+
+def add_daily_checkpoints(cursor):
+    # Closing balances for every past day with activity, so as-of queries
+    # start from at most a day away; close_days keeps them current.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_postings_date ON postings (date)")
+    close_days(cursor)
+
+
+def index_checkpoint_days(cursor):
+    # MAX(day), asked by close_days on every dashboard refresh, otherwise
+    # walks the whole (account, day) primary key
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_balance_checkpoints_day ON balance_checkpoints (day)")
+
+
+def add_data_version(cursor):
+    # A counter bumped by every statement row that changes transactions, so
+    # anything derived from them (the report cache) can tell it is stale
+    # with one lookup, whichever connection or process made the change.
+    cursor.execute("""CREATE TABLE IF NOT EXISTS data_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL)""")
+    cursor.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+    create_data_version_triggers(cursor)
+
+
+def create_data_version_triggers(cursor):
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_transactions_version_{event.lower()}
+                        AFTER {event} ON transactions
+                        BEGIN
+                            UPDATE data_version SET version = version + 1 WHERE id = 1;
+                        END""")
+
+
+def read_data_version(cursor):
+    return cursor.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def add_archives(cursor):
+    # Closed years moved out to <name>_YYYY.db files by bankarchive. Only the
+    # transaction rows move: totals, the rollup and the ledger keep covering
+    # archived years, and archived_rollup keeps the per-day aggregates of
+    # the moved rows so those can still be rebuilt and checked without
+    # opening the archives.
+    cursor.execute("""CREATE TABLE IF NOT EXISTS archives (
+                    year INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    rows INTEGER NOT NULL,
+                    archived_at TEXT NOT NULL)""")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS archived_rollup (
+                    day TEXT NOT NULL,
+                    transaction_type TEXT NOT NULL,
+                    transaction_mode TEXT NOT NULL,
+                    bank_name TEXT NOT NULL,
+                    amount INTEGER NOT NULL DEFAULT 0,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, transaction_type, transaction_mode, bank_name))
+                    WITHOUT ROWID""")
+
+
+def add_database_id(cursor):
+    # A random identity for this database, stamped into each archive it
+    # writes, so an archive file can be told apart from one belonging to a
+    # copy or another database in the same folder
+    cursor.execute("""CREATE TABLE IF NOT EXISTS database_id (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    uuid TEXT NOT NULL)""")
+    cursor.execute("INSERT OR IGNORE INTO database_id (id, uuid) VALUES (1, ?)", (uuid.uuid4().hex,))
+
+
+def read_database_id(cursor):
+    return cursor.execute("SELECT uuid FROM database_id WHERE id = 1").fetchone()[0]
+
+
+def has_archives(cursor):
+    # False before the archives step has run, as in the earlier steps
+    return cursor.execute("""SELECT 1 FROM sqlite_master
+                          WHERE type = 'table' AND name = 'archived_rollup'""").fetchone() is not None
+
+
+MIGRATIONS = [
+    (1, "Base tables", create_base_tables),
+    (2, "Secondary indexes on transactions", add_secondary_indexes),
+    (3, "Running totals maintained by triggers", add_totals_table),
+    (4, "Daily rollup maintained by triggers", add_daily_rollup),
+    (5, "Full-text search index over customer fields", add_search_index),
+    (6, "Amounts stored as integer paise", store_amounts_in_paise),
+    (7, "Double-entry ledger with balance snapshots", add_ledger),
+    (8, "Daily balance checkpoints", add_daily_checkpoints),
+    (9, "Index on checkpoint days", index_checkpoint_days),
+    (10, "Data version counter for caches", add_data_version),
+    (11, "Archived years", add_archives),
+    (12, "Database identity for archives", add_database_id),
+]
+
+
+def schema_version(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TEXT)""")
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(conn, target=None):
+    current = schema_version(conn)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            step(cursor)
+            cursor.execute("INSERT INTO schema_version VALUES (?, ?, ?)",
+                           (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def date_bounds(start_date, end_date):
+    # Half-open [start, end + 1 day) bounds on the raw date text, so a range
+    # covers the whole end day and stays usable by the date indexes.
+    return start_date.isoformat(), (end_date + timedelta(days=1)).isoformat()
+
+
+# Running totals
+def rebuild_totals(cursor):
+    cursor.execute("DELETE FROM totals")
+    cursor.execute("""INSERT INTO totals (transaction_type, amount, count)
+                    SELECT transaction_type, COALESCE(SUM(amount), 0), COUNT(*)
+                    FROM transactions
+                    WHERE transaction_type IS NOT NULL
+                    GROUP BY transaction_type""")
+    if has_archives(cursor):
+        cursor.execute("""INSERT INTO totals (transaction_type, amount, count)
+                        SELECT transaction_type, SUM(amount), SUM(count)
+                        FROM archived_rollup
+                        WHERE transaction_type != ''
+                        GROUP BY transaction_type
+                        ON CONFLICT (transaction_type) DO UPDATE SET
+                            amount = amount + excluded.amount,
+                            count = count + excluded.count""")
+
+
+def read_totals(cursor):
+    cursor.execute("SELECT transaction_type, amount FROM totals")
+    return dict(cursor.fetchall())
+
+
+def check_totals(conn, repair=True):
+    # Recompute the totals from scratch and report every type whose stored
+    # figure has drifted as (type, stored amount, stored count, actual
+    # amount, actual count), amounts in paise. With repair the table is
+    # rebuilt in place.
+    cursor = conn.cursor()
+    cursor.execute("""SELECT transaction_type, COALESCE(SUM(amount), 0), COUNT(*)
+                    FROM transactions
+                    WHERE transaction_type IS NOT NULL
+                    GROUP BY transaction_type""")
+    actual = {row[0]: row[1:] for row in cursor.fetchall()}
+    if has_archives(cursor):
+        cursor.execute("""SELECT transaction_type, SUM(amount), SUM(count)
+                        FROM archived_rollup
+                        WHERE transaction_type != ''
+                        GROUP BY transaction_type""")
+        for txn_type, amount, count in cursor.fetchall():
+            live_amount, live_count = actual.get(txn_type, (0, 0))
+            actual[txn_type] = (live_amount + amount, live_count + count)
+    cursor.execute("SELECT transaction_type, amount, count FROM totals")
+    stored = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    drift = []
+    for txn_type in sorted(set(actual) | set(stored)):
+        stored_amount, stored_count = stored.get(txn_type, (0, 0))
+        actual_amount, actual_count = actual.get(txn_type, (0, 0))
+        if stored_count != actual_count or stored_amount != actual_amount:
+            drift.append((txn_type, stored_amount, stored_count, actual_amount, actual_count))
+
+    if drift and repair:
+        rebuild_totals(cursor)
+        conn.commit()
+    return drift
+
+
+# Daily rollup
+def rebuild_daily_rollup(cursor):
+    cursor.execute("DELETE FROM daily_rollup")
+    cursor.execute("""INSERT INTO daily_rollup
+                    (day, transaction_type, transaction_mode, bank_name, amount, count)
+                    SELECT COALESCE(date(date), ''), COALESCE(transaction_type, ''),
+                           COALESCE(transaction_mode, ''), COALESCE(bank_name, ''),
+                           COALESCE(SUM(amount), 0), COUNT(*)
+                    FROM transactions
+                    GROUP BY 1, 2, 3, 4""")
+    if has_archives(cursor):
+        cursor.execute("""INSERT INTO daily_rollup
+                        (day, transaction_type, transaction_mode, bank_name, amount, count)
+                        SELECT day, transaction_type, transaction_mode, bank_name, amount, count
+                        FROM archived_rollup
+                        WHERE true
+                        ON CONFLICT DO UPDATE SET
+                            amount = amount + excluded.amount,
+                            count = count + excluded.count""")
+
+
+def daily_summary(cursor):
+    cursor.execute("""SELECT day,
+                    SUM(CASE WHEN transaction_type='Deposit' THEN amount ELSE 0 END),
+                    SUM(CASE WHEN transaction_type='Withdrawal' THEN amount ELSE 0 END)
+                    FROM daily_rollup
+                    GROUP BY day
+                    ORDER BY day DESC""")
+    return cursor.fetchall()
+
+
+# Ledger
+def bank_account(bank_name):
+    return BANK_ACCOUNT_PREFIX + bank_name
+
+
+def rebuild_account_balances(cursor):
+    cursor.execute("DELETE FROM account_balances")
+    cursor.execute("""INSERT INTO account_balances (account, balance, postings)
+                    SELECT account, SUM(amount), COUNT(*)
+                    FROM postings
+                    GROUP BY account""")
+
+
+def read_balances(cursor):
+    cursor.execute("SELECT account, balance FROM account_balances")
+    return dict(cursor.fetchall())
+
+
+def account_balance(cursor, account):
+    row = cursor.execute("SELECT balance FROM account_balances WHERE account = ?",
+                         (account,)).fetchone()
+    return row[0] if row else 0
+
+
+def post_adjustment(cursor, account, balance):
+    # Brings account to balance with one balanced entry against the
+    # adjustments account. Returns the amount posted.
+    delta = balance - account_balance(cursor, account)
+    if delta:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany("INSERT INTO postings (sr_no, date, account, amount) VALUES (NULL, ?, ?, ?)",
+                           [(now, account, delta), (now, ADJUSTMENTS_ACCOUNT, -delta)])
+    return delta
+
+
+def balance_as_of(cursor, account, day):
+    # Closing balance of account at the end of day (a date): the nearest
+    # checkpoint at or before it plus the postings between the two, which
+    # idx_postings_account_date reads as one range.
+    row = cursor.execute("""SELECT day, balance FROM balance_checkpoints
+                          WHERE account = ? AND day <= ?
+                          ORDER BY day DESC LIMIT 1""",
+                         (account, day.isoformat())).fetchone()
+    if row:
+        start = (date.fromisoformat(row[0]) + timedelta(days=1)).isoformat()
+        balance = row[1]
+    else:
+        start, balance = '', 0
+    end = (day + timedelta(days=1)).isoformat()
+    delta = cursor.execute("""SELECT COALESCE(SUM(amount), 0) FROM postings
+                            WHERE account = ? AND date >= ? AND date < ?""",
+                           (account, start, end)).fetchone()[0]
+    return balance + delta
+
+
+def write_checkpoint(cursor, day):
+    # Records every account's closing balance for day
+    for account in [row[0] for row in cursor.execute("SELECT account FROM account_balances")]:
+        cursor.execute("""INSERT OR REPLACE INTO balance_checkpoints (account, day, balance)
+                        VALUES (?, ?, ?)""",
+                       (account, day.isoformat(), balance_as_of(cursor, account, day)))
+
+
+def close_days(cursor, through=None):
+    # Checkpoints every day after the last closed one up to through
+    # (default yesterday): one row per account that moved that day, carrying
+    # its running balance forward. A quiet account keeps its last
+    # checkpoint, and as-of queries scan nothing from there. Returns the
+    # number of checkpoints written.
+    through = through or date.today() - timedelta(days=1)
+    last = cursor.execute("SELECT MAX(day) FROM balance_checkpoints").fetchone()[0]
+    first = date.fromisoformat(last) + timedelta(days=1) if last else None
+    if first and first > through:
+        return 0
+    cursor.execute("""SELECT account, date(date), SUM(amount) FROM postings
+                    WHERE date >= ? AND date < ?
+                    GROUP BY 1, 2
+                    ORDER BY 1, 2""",
+                   (first.isoformat() if first else '', (through + timedelta(days=1)).isoformat()))
+    checkpoints = []
+    running = {}
+    for account, day, amount in cursor.fetchall():
+        if account not in running:
+            running[account] = balance_as_of(cursor, account, first - timedelta(days=1)) if first else 0
+        running[account] += amount
+        checkpoints.append((account, day, running[account]))
+    cursor.executemany("""INSERT OR REPLACE INTO balance_checkpoints (account, day, balance)
+                        VALUES (?, ?, ?)""", checkpoints)
+    return len(checkpoints)
+
+
+def balance_accounts(cursor):
+    # The accounts that hold money: the till and every bank ever posted to
+    cursor.execute("""SELECT account FROM account_balances
+                    WHERE account = ? OR account LIKE ? ORDER BY account != ?, account""",
+                   (CASH_ACCOUNT, BANK_ACCOUNT_PREFIX + '%', CASH_ACCOUNT))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def balances_as_of(cursor, day):
+    # Cash and per-bank closing balances at the end of day
+    return {account: balance_as_of(cursor, account, day) for account in balance_accounts(cursor)}
+
+
+def read_dashboard(cursor, closing_day):
+    # Every figure of the balance panel in one statement: a row per bank in
+    # the order they were added, the till, each running total, and the till
+    # plus banks at close of business on closing_day (worked out like
+    # balance_as_of, for all accounts at once).
+    cursor.execute("""WITH money AS (
+                        SELECT account FROM account_balances
+                        WHERE account = :cash OR account LIKE :banks
+                    ),
+                    opening AS (
+                        SELECT money.account, checkpoint.day, COALESCE(checkpoint.balance, 0) AS balance
+                        FROM money LEFT JOIN balance_checkpoints AS checkpoint
+                        ON checkpoint.account = money.account
+                        AND checkpoint.day = (SELECT MAX(day) FROM balance_checkpoints
+                                              WHERE account = money.account AND day <= :day)
+                    )
+                    SELECT 0, banks.rowid, banks.bank_name, COALESCE(account_balances.balance, 0)
+                    FROM banks LEFT JOIN account_balances
+                    ON account_balances.account = :prefix || banks.bank_name
+                    UNION ALL
+                    SELECT 1, 0, NULL, COALESCE((SELECT balance FROM account_balances
+                                                 WHERE account = :cash), 0)
+                    UNION ALL
+                    SELECT 2, 0, transaction_type, amount FROM totals
+                    UNION ALL
+                    SELECT 3, 0, NULL, COALESCE(SUM(opening.balance + (
+                        SELECT COALESCE(SUM(amount), 0) FROM postings
+                        WHERE postings.account = opening.account
+                        AND postings.date >= COALESCE(date(opening.day, '+1 day'), '')
+                        AND postings.date < :end)), 0)
+                    FROM opening
+                    ORDER BY 1, 2""",
+                   {"cash": CASH_ACCOUNT, "banks": BANK_ACCOUNT_PREFIX + '%', "prefix": BANK_ACCOUNT_PREFIX,
+                    "day": closing_day.isoformat(), "end": (closing_day + timedelta(days=1)).isoformat()})
+    figures = {'banks': [], 'totals': {}}
+    for part, _, name, amount in cursor.fetchall():
+        if part == 0:
+            figures['banks'].append((name, amount))
+        elif part == 1:
+            figures['cash'] = amount
+        elif part == 2:
+            figures['totals'][name] = amount
+        else:
+            figures['closing'] = amount
+    return figures
+
+
+def balance_history(cursor, start_day, end_day):
+    # Closing balance per account for each day from start_day to end_day,
+    # as {account: [(day, balance), ...]}. After the opening point only the
+    # days on which an account moved are listed; it holds its balance in
+    # between. Closed days come from the checkpoints, later ones straight
+    # from the postings.
+    closed = cursor.execute("SELECT MAX(day) FROM balance_checkpoints").fetchone()[0]
+    closed = date.fromisoformat(closed) if closed else start_day
+    open_from = (max(start_day, closed) + timedelta(days=1)).isoformat()
+    history = {}
+    for account in balance_accounts(cursor):
+        points = [(start_day.isoformat(), balance_as_of(cursor, account, start_day))]
+        cursor.execute("""SELECT day, balance FROM balance_checkpoints
+                        WHERE account = ? AND day > ? AND day <= ?
+                        ORDER BY day""",
+                       (account, start_day.isoformat(), min(end_day, closed).isoformat()))
+        points += cursor.fetchall()
+        balance = points[-1][1]
+        cursor.execute("""SELECT date(date), SUM(amount) FROM postings
+                        WHERE account = ? AND date >= ? AND date < ?
+                        GROUP BY 1 ORDER BY 1""",
+                       (account, open_from, date_bounds(end_day, end_day)[1]))
+        for day, amount in cursor.fetchall():
+            balance += amount
+            points.append((day, balance))
+        history[account] = points
+    return history
+
+
+def check_balances(conn, repair=True):
+    # Recompute every account's balance from its postings and report those
+    # whose snapshot has drifted as (account, stored, actual). With repair
+    # the snapshot is rebuilt.
+    cursor = conn.cursor()
+    actual = dict(cursor.execute("SELECT account, SUM(amount) FROM postings GROUP BY account").fetchall())
+    stored = read_balances(cursor)
+    drift = [(account, stored.get(account, 0), actual.get(account, 0))
+             for account in sorted(set(actual) | set(stored))
+             if stored.get(account, 0) != actual.get(account, 0)]
+    if drift and repair:
+        rebuild_account_balances(cursor)
+        conn.commit()
+    return drift
+
+
+# Search
+def search_query(text):
+    # Free text from the search box -> FTS5 query: every word must match
+    # the start of some token, so "pri sha" finds "Priya Sharma". Each word
+    # is quoted, which keeps FTS5 operators and punctuation literal.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    return conn
+
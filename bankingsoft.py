@@ -1,55 +1,138 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from tkcalendar import DateEntry
+import importlib
 import sqlite3
-import hashlib
-import re
-from datetime import datetime
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-# Database Setup
-conn = sqlite3.connect('bank.db')
-cursor = conn.cursor()
-
-cursor.execute("""CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password TEXT,
-                security_question TEXT,
-                security_answer TEXT)""")
-
-cursor.execute("""CREATE TABLE IF NOT EXISTS transactions (
-                sr_no INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT,
-                customer_name TEXT,
-                account_number TEXT,
-                ifsc_code TEXT,
-                mobile TEXT,
-                address TEXT,
-                transaction_no TEXT,
-                transaction_type TEXT,
-                transaction_mode TEXT,
-                bank_name TEXT,
-                amount REAL)""")
-
-cursor.execute("""CREATE TABLE IF NOT EXISTS balances (
-                cash REAL DEFAULT 0)""")
-
-cursor.execute("""CREATE TABLE IF NOT EXISTS banks (
-                bank_name TEXT PRIMARY KEY,
-                balance REAL DEFAULT 0)""")
-
-if not cursor.execute("SELECT 1 FROM balances").fetchone():
-    cursor.execute("INSERT INTO balances (cash) VALUES (0)")
-    conn.commit()
+import threading
+import bankdb
+import bankclient
+import bankjobs
+import bankmetrics
+import bankmoney
+from bankmoney import Money
+import bankreports
+import bankservice
+from datetime import date, datetime
+
+# Only what the login screen needs is imported at startup. pandas,
+# matplotlib, tkcalendar and reportlab (via bankio / bankreceipts) cost
+# seconds to import, so each is imported by the first screen or report that
+# uses it. After login the report modules are also imported on a background
+# thread, so the first chart or export doesn't pay for them either.
+PREWARM_AFTER_LOGIN = True
+PREWARM_MODULES = [
+    "pandas",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_tkagg",
+    "bankio",
+    "bankreceipts",
+]
+
+# Database Setup. The books are bank.db here, or a bankserver shared with
+# the other counters when started with --server URL. Every thread, the Tk
+# thread included, gets its own session (a tuned pooled connection, or a
+# keep-alive HTTP connection).
+
+# Transaction history is virtualized: only a sliding window of rows lives in
+# the Treeview, paged in from SQLite by (date, sr_no) keyset as the user scrolls.
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_ROWS = 3 * HISTORY_PAGE_SIZE
+HISTORY_COLUMNS = '''sr_no, date, customer_name, account_number, ifsc_code, mobile,
+                   transaction_type, transaction_mode, bank_name, amount'''
+SEARCH_PLACEHOLDER = "Type here to search"
+# Report dialog choices -> bankreports report names; None is the cash flow
+# chart, which is drawn from bankreports.run_flow rather than a report
+REPORT_TYPES = {
+    "Summary": "summary",
+    "Detailed": "detailed",
+    "Graphical": None,
+    "Daily Totals": "daily_totals",
+    "By Bank": "by_bank",
+    "Top Customers": "top_customers",
+}
+SEARCH_DEBOUNCE_MS = 250
+# Cash flow chart choices -> bankreports bucket and series names
+FLOW_BUCKETS = {"Day": "day", "Week": "week", "Month": "month"}
+FLOW_SERIES = {"Total": "total", "Mode": "mode", "Bank": "bank"}
+DIAGNOSTICS_REFRESH_MS = 2000
+
+# Background tasks. These run on a bankjobs worker with that worker's own
+# connection and must not touch Tk; results go back through the callbacks.
+def history_page_task(job, session, history_filter, older_than=None, newer_than=None):
+    return session.history_page(HISTORY_COLUMNS, HISTORY_PAGE_SIZE,
+                                history_filter, older_than, newer_than)
+
+def transaction_rows_task(job, session, sr_nos):
+    return session.transaction_rows(HISTORY_COLUMNS, sr_nos)
+
+def search_task(job, session, query):
+    return session.search_transactions(HISTORY_COLUMNS, query, HISTORY_MAX_ROWS)
+
+def report_task(job, session, name, start_date, end_date):
+    return session.report(name, start_date, end_date)
+
+def cash_flow_task(job, session, start_date, end_date, bucket, series, points):
+    return session.cash_flow(start_date, end_date, bucket, series, points)
+
+def balance_history_task(job, session, start_date, end_date):
+    return session.balance_history(start_date, end_date)
+
+def daily_summary_task(job, session):
+    return session.daily_summary()
+
+def get_transaction_task(job, session, sr_no):
+    return session.get_transaction(sr_no)
+
+def edit_form_task(job, session, sr_no):
+    return session.get_transaction(sr_no), session.list_banks()
+
+def update_transaction_task(job, session, sr_no, fields):
+    return session.update_transaction(sr_no, *fields)
+
+def delete_transaction_task(job, session, sr_no):
+    if not session.delete_transaction(sr_no):
+        raise ValueError("Transaction not found; it may have been deleted already")
+
+def build_receipt_task(job, session, sr_no, filename):
+    return session.build_receipt(sr_no, filename)
+
+def check_integrity_task(job, session, repair):
+    return session.check_integrity(repair, job.progress)
+
+def export_pdf_task(job, session, filename, start_date, end_date):
+    return session.export_pdf(filename, start_date, end_date, job.progress)
+
+def export_excel_task(job, session, filename, columns, start_date, end_date):
+    return session.export_excel(filename, columns, start_date, end_date, job.progress)
+
+def export_csv_task(job, session, filename, columns, start_date, end_date):
+    return session.export_csv(filename, columns, start_date, end_date, job.progress)
+
+def batch_receipts_task(job, session, output, combined, sr_nos, start_date, end_date):
+    return session.batch_receipts(output, combined, sr_nos, start_date, end_date,
+                                  progress=job.progress)
+
+def import_csv_task(job, session, filename):
+    return session.import_csv(filename, job.progress)
+
+def prewarm():
+    # Runs on a daemon thread; a module that fails to import here fails
+    # again, with a proper error, where it is actually used
+    for name in PREWARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+def start_prewarm():
+    if PREWARM_AFTER_LOGIN:
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
 
 class BankingApp:
-    def __init__(self):
+    def __init__(self, server=None):
+        if bankmetrics.enabled():
+            # Before any command or callback captures a method
+            bankmetrics.instrument_methods(self)
+        self.books = bankclient.open_books(server)
         self.root = tk.Tk()
         self.root.title("Data Click Education - Banking System")
         self.root.geometry("1280x800")
@@ -57,10 +140,26 @@ class BankingApp:
         self.current_user = None
         self.selected_transaction = None
         self.blink_flag = True
+        self.jobs = bankjobs.JobExecutor(self.root, self.books)
+        # New transactions are group-committed; the panel and history are
+        # refreshed once per committed batch, not once per transaction
+        self.writes = self.books.write_queue(self.jobs.post, self.on_write_batch)
+        # Row changes are applied to the history one Treeview item at a time
+        self.books.changes.subscribe(lambda kind, sr_no: self.jobs.post(self.on_row_changed, kind, sr_no))
+        # Status bar jobs, oldest first: job -> (status text, percent done)
+        self.active_jobs = {}
+        self.flow_window = None
+        self.flow_generation = 0
+        self.diagnostics_window = None
+        if bankmetrics.enabled():
+            bankmetrics.StallWatch(self.root)
         
         self.setup_styles()
         self.show_auth_screen()
         self.root.mainloop()
+        self.writes.shutdown()
+        self.jobs.shutdown()
+        self.books.close()
 
     def setup_styles(self):
         self.style = ttk.Style()
@@ -250,13 +349,9 @@ class BankingApp:
             messagebox.showerror("Error", "All fields are required!")
             return
 
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        hashed_answer = hashlib.sha256(security_answer.encode()).hexdigest()
-
         try:
-            cursor.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
-                         (username, hashed_pw, security_question, hashed_answer))
-            conn.commit()
+            self.books.register_user(username, password,
+                                     security_question, security_answer)
             messagebox.showinfo("Success", "Registration successful!")
             self.back_to_login()
         except sqlite3.IntegrityError:
@@ -270,26 +365,22 @@ class BankingApp:
             messagebox.showerror("Error", "Please enter username and password")
             return
 
-        hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-        cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, hashed_pw))
-        user = cursor.fetchone()
-
-        if user:
+        if self.books.authenticate(username, password):
             self.current_user = username
             self.auth_frame.destroy()
             self.show_main_app()
             self.update_balances()
             self.load_transactions()
+            start_prewarm()
         else:
             messagebox.showerror("Error", "Invalid credentials")
 
     def fetch_security_question(self):
         username = self.recovery_user.get()
-        cursor.execute("SELECT security_question FROM users WHERE username=?", (username,))
-        result = cursor.fetchone()
+        question = self.books.security_question(username)
         
-        if result:
-            self.security_ques.config(text=result[0])
+        if question:
+            self.security_ques.config(text=question)
         else:
             messagebox.showerror("Error", "Username not found")
 
@@ -302,13 +393,7 @@ class BankingApp:
             messagebox.showerror("Error", "All fields are required!")
             return
             
-        hashed_answer = hashlib.sha256(answer.encode()).hexdigest()
-        cursor.execute("SELECT 1 FROM users WHERE username=? AND security_answer=?", (username, hashed_answer))
-        
-        if cursor.fetchone():
-            new_hashed_pw = hashlib.sha256(new_pw.encode()).hexdigest()
-            cursor.execute("UPDATE users SET password=? WHERE username=?", (new_hashed_pw, username))
-            conn.commit()
+        if self.books.reset_password(username, answer, new_pw):
             messagebox.showinfo("Success", "Password reset successful!")
             self.back_to_login()
         else:
@@ -323,6 +408,7 @@ class BankingApp:
 
     # Main Banking Interface
     def show_main_app(self):
+        from tkcalendar import DateEntry
         self.main_frame = ttk.Frame(self.root)
         self.main_frame.pack(fill=tk.BOTH, expand=True)
         
@@ -341,11 +427,29 @@ class BankingApp:
                  text="Logout", 
                  command=self.logout, 
                  style="Red.TButton").pack(side=tk.RIGHT)
+        if bankmetrics.enabled():
+            ttk.Button(header_frame, text="Diagnostics",
+                       command=self.show_diagnostics).pack(side=tk.RIGHT, padx=5)
+        
+        # Background job status
+        status_frame = ttk.Frame(self.main_frame)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
+        self.job_status = ttk.Label(status_frame, text="Ready")
+        self.job_status.pack(side=tk.LEFT)
+        self.job_cancel = ttk.Button(status_frame, text="Cancel", command=self.cancel_job,
+                                     style="Red.TButton", state=tk.DISABLED)
+        self.job_cancel.pack(side=tk.RIGHT)
+        self.job_progress = ttk.Progressbar(status_frame, length=200, maximum=100)
+        self.job_progress.pack(side=tk.RIGHT, padx=10)
         
         # Search Bar
         self.search_entry = ttk.Entry(header_frame)
         self.search_entry.pack(side=tk.RIGHT, padx=10)
-        self.search_entry.insert(0, "Type here to search")
+        self.search_entry.insert(0, SEARCH_PLACEHOLDER)
+        self.search_entry.bind("<FocusIn>", self.clear_search_placeholder)
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_after_id = None
+        self.history_searching = False
         
         # Main Content
         content_frame = ttk.Frame(self.main_frame)
@@ -412,6 +516,8 @@ class BankingApp:
         # Bank Balances Container
         self.banks_container = ttk.Frame(balance_display_frame)
         self.banks_container.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        # bank name -> (frame, label, shown text), kept across refreshes
+        self.bank_widgets = {}
         
         # Other Balances
         other_balances_frame = ttk.Frame(balance_display_frame)
@@ -484,41 +590,47 @@ class BankingApp:
             columns=[c[0] for c in columns], 
             show="headings",
             height=25,
-            selectmode='browse'
+            selectmode='extended'
         )
         
         for col in columns:
             self.history_tree.heading(col[0], text=col[0])
             self.history_tree.column(col[0], width=col[1], anchor=tk.CENTER)
             
-        vsb = ttk.Scrollbar(history_frame, orient="vertical", command=self.history_tree.yview)
+        self.history_vsb = ttk.Scrollbar(history_frame, orient="vertical", command=self.history_tree.yview)
         hsb = ttk.Scrollbar(history_frame, orient="horizontal", command=self.history_tree.xview)
-        self.history_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.history_tree.configure(yscrollcommand=self.on_history_scroll, xscrollcommand=hsb.set)
         
         self.history_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_vsb.pack(side=tk.RIGHT, fill=tk.Y)
         hsb.pack(side=tk.BOTTOM, fill=tk.X)
 
+        self.history_filter = None
+        self.history_has_newer = False
+        self.history_has_older = False
+        self.history_paging = False
+        self.history_generation = 0
+        self.pending_changes = {}
+        self.pending_reload = False
+        self.changes_after_id = None
+
     def apply_date_filter(self):
         start_date = self.start_filter_date.get_date()
         end_date = self.end_filter_date.get_date()
         self.load_transactions(start_date, end_date)
+        self.update_balances()
 
     def clear_date_filter(self):
         self.start_filter_date.set_date(datetime.now())
         self.end_filter_date.set_date(datetime.now())
         self.load_transactions()
+        self.update_balances()
 
     def show_daily_summary(self):
-        cursor.execute('''SELECT 
-                        date(date) as trans_date,
-                        SUM(CASE WHEN transaction_type='Deposit' THEN amount ELSE 0 END) as total_deposit,
-                        SUM(CASE WHEN transaction_type='Withdrawal' THEN amount ELSE 0 END) as total_withdrawal
-                        FROM transactions
-                        GROUP BY trans_date
-                        ORDER BY trans_date DESC''')
-        data = cursor.fetchall()
-        
+        self.jobs.submit(daily_summary_task, on_done=self.show_daily_summary_window,
+                         on_error=lambda e: messagebox.showerror("Error", str(e)), interactive=True)
+
+    def show_daily_summary_window(self, data):
         summary_window = tk.Toplevel(self.root)
         summary_window.title("Daily Transaction Summary")
         summary_window.geometry("600x400")
@@ -537,11 +649,7 @@ class BankingApp:
         tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
         
         for row in data:
-            tree.insert("", tk.END, values=(
-                row[0],
-                f"₹{row[1]:,.2f}",
-                f"₹{row[2]:,.2f}"
-            ))
+            tree.insert("", tk.END, values=(row[0], str(Money(row[1])), str(Money(row[2]))))
             
         tree.pack(fill=tk.BOTH, expand=True)
         vsb.pack(side=tk.RIGHT, fill=tk.Y)
@@ -558,10 +666,14 @@ class BankingApp:
         self.selected_transaction = self.get_selected_transaction()
         if not self.selected_transaction:
             return
-        
-        cursor.execute("SELECT * FROM transactions WHERE sr_no=?", (self.selected_transaction,))
-        transaction = cursor.fetchone()
-        
+        self.jobs.submit(edit_form_task, self.selected_transaction,
+                         on_done=lambda result: self.show_edit_form(*result),
+                         on_error=lambda e: messagebox.showerror("Error", str(e)), interactive=True)
+
+    def show_edit_form(self, transaction, banks):
+        if transaction is None:
+            messagebox.showerror("Error", "Transaction not found; it may have been deleted already")
+            return
         self.txn_window = tk.Toplevel(self.root)
         self.txn_window.title("Edit Transaction")
         self.txn_window.geometry("400x500")
@@ -576,7 +688,7 @@ class BankingApp:
             ("Mobile*:", "txn_mobile", transaction[5]),
             ("Address:", "txn_address", transaction[6]),
             ("Transaction No*:", "txn_number", transaction[7]),
-            ("Amount*:", "txn_amount", transaction[11]),
+            ("Amount*:", "txn_amount", bankmoney.format_amount(transaction[11], grouping=False)),
             ("Type*:", "txn_type", transaction[8]),
             ("Mode*:", "txn_mode", transaction[9]),
             ("Bank:", "txn_bank", transaction[10])
@@ -591,8 +703,6 @@ class BankingApp:
                 entry.current(values.index(value))
             elif "Bank" in label:
                 entry = ttk.Combobox(form_frame, state="readonly")
-                cursor.execute("SELECT bank_name FROM banks")
-                banks = [row[0] for row in cursor.fetchall()]
                 entry['values'] = banks
                 if value in banks:
                     entry.current(banks.index(value))
@@ -608,38 +718,28 @@ class BankingApp:
 
     def update_transaction(self):
         try:
-            cursor.execute('''UPDATE transactions SET
-                            date=?, 
-                            customer_name=?, 
-                            account_number=?, 
-                            ifsc_code=?, 
-                            mobile=?, 
-                            address=?, 
-                            transaction_no=?, 
-                            transaction_type=?, 
-                            transaction_mode=?, 
-                            bank_name=?,
-                            amount=?
-                            WHERE sr_no=?''',
-                            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                             self.entries['txn_customer'].get(),
-                             self.entries['txn_account'].get(),
-                             self.entries['txn_ifsc'].get(),
-                             self.entries['txn_mobile'].get(),
-                             self.entries['txn_address'].get(),
-                             self.entries['txn_number'].get(),
-                             self.entries['txn_type'].get(),
-                             self.entries['txn_mode'].get(),
-                             self.entries['txn_bank'].get() if self.entries['txn_mode'].get() == "Bank" else None,
-                             float(self.entries['txn_amount'].get()),
-                             self.selected_transaction))
-            conn.commit()
-            self.update_balances()
-            self.load_transactions()
-            self.txn_window.destroy()
-            messagebox.showinfo("Success", "Transaction updated!")
+            fields = (
+                self.entries['txn_customer'].get(),
+                self.entries['txn_account'].get(),
+                self.entries['txn_ifsc'].get(),
+                self.entries['txn_mobile'].get(),
+                self.entries['txn_address'].get(),
+                self.entries['txn_number'].get(),
+                self.entries['txn_type'].get(),
+                self.entries['txn_mode'].get(),
+                self.entries['txn_bank'].get(),
+                bankmoney.parse_amount(self.entries['txn_amount'].get()))
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+        self.run_job("Updating transaction", update_transaction_task, self.selected_transaction, fields,
+                     on_done=lambda _: self.on_transaction_updated())
+
+    def on_transaction_updated(self):
+        self.update_balances()
+        if self.txn_window.winfo_exists():
+            self.txn_window.destroy()
+        messagebox.showinfo("Success", "Transaction updated!")
 
     def delete_transaction(self):
         self.selected_transaction = self.get_selected_transaction()
@@ -648,72 +748,65 @@ class BankingApp:
         
         confirm = messagebox.askyesno("Confirm", "Are you sure you want to delete this transaction?")
         if confirm:
-            cursor.execute("DELETE FROM transactions WHERE sr_no=?", (self.selected_transaction,))
-            conn.commit()
-            self.update_balances()
-            self.load_transactions()
-            messagebox.showinfo("Success", "Transaction deleted!")
+            self.run_job("Deleting transaction", delete_transaction_task, self.selected_transaction,
+                         on_done=lambda _: self.on_transaction_deleted())
+
+    def on_transaction_deleted(self):
+        self.update_balances()
+        messagebox.showinfo("Success", "Transaction deleted!")
 
     def print_receipt(self):
+        selected = self.history_tree.selection()
+        if len(selected) > 1:
+            self.batch_receipts([int(item) for item in selected])
+            return
+
         self.selected_transaction = self.get_selected_transaction()
         if not self.selected_transaction:
             return
         
-        cursor.execute("SELECT * FROM transactions WHERE sr_no=?", (self.selected_transaction,))
-        transaction = cursor.fetchone()
-        
         filename = filedialog.asksaveasfilename(defaultextension=".pdf",
                                                filetypes=[("PDF Files", "*.pdf")])
         if filename:
-            doc = SimpleDocTemplate(filename, pagesize=letter)
-            elements = []
-            
-            styles = getSampleStyleSheet()
-            styles.add(ParagraphStyle(name='ShopStyle', 
-                                    fontSize=18,
-                                    textColor=colors.HexColor('#e74c3c'),
-                                    alignment=1,
-                                    spaceAfter=20))
-            
-            elements.append(Paragraph("Data Click Education", styles['ShopStyle']))
-            elements.append(Paragraph("Bank Receipt", styles['Title']))
-            elements.append(Spacer(1, 12))
-            
-            data = [
-                ["Transaction No:", transaction[7]],
-                ["Date:", transaction[1]],
-                ["Customer Name:", transaction[2]],
-                ["Account No:", transaction[3]],
-                ["IFSC Code:", transaction[4]],
-                ["Amount:", f"₹{transaction[11]:,.2f}"],
-                ["Transaction Type:", transaction[8]],
-                ["Mode:", transaction[9]],
-                ["Bank:", transaction[10] if transaction[10] else "N/A"]
-            ]
-            
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#4F81BD')),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0,0), (-1,0), 12),
-                ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-                ('GRID', (0,0), (-1,-1), 1, colors.black)
-            ]))
-            elements.append(table)
-            
-            doc.build(elements)
-            messagebox.showinfo("Success", "Receipt saved successfully!")
+            self.run_job("Receipt", build_receipt_task, self.selected_transaction, filename,
+                         on_done=lambda _: messagebox.showinfo("Success", "Receipt saved successfully!"))
+
+    def batch_receipts(self, sr_nos=None):
+        # Either the rows selected in the history or, from the reports
+        # dialog, every transaction in its date range
+        start_date = end_date = None
+        if sr_nos is None:
+            start_date = self.start_date.get_date()
+            end_date = self.end_date.get_date()
+
+        combined = messagebox.askyesnocancel(
+            "Batch Receipts",
+            "Save all receipts in one combined PDF?\n\n"
+            "Yes: one PDF, a receipt per page\nNo: one PDF per receipt in a folder")
+        if combined is None:
+            return
+        if combined:
+            output = filedialog.asksaveasfilename(defaultextension=".pdf",
+                                                  filetypes=[("PDF Files", "*.pdf")])
+        else:
+            output = filedialog.askdirectory()
+        if output:
+            self.run_job("Batch receipts", batch_receipts_task, output, combined,
+                         sr_nos, start_date, end_date,
+                         on_done=lambda count: messagebox.showinfo("Success", f"{count} receipts saved!"))
 
     def show_transaction_details(self):
         self.selected_transaction = self.get_selected_transaction()
         if not self.selected_transaction:
             return
-        
-        cursor.execute("SELECT * FROM transactions WHERE sr_no=?", (self.selected_transaction,))
-        transaction = cursor.fetchone()
-        
+        self.jobs.submit(get_transaction_task, self.selected_transaction,
+                         on_done=self.show_details_window,
+                         on_error=lambda e: messagebox.showerror("Error", str(e)), interactive=True)
+
+    def show_details_window(self, transaction):
+        if transaction is None:
+            messagebox.showerror("Error", "Transaction not found; it may have been deleted already")
+            return
         detail_window = tk.Toplevel(self.root)
         detail_window.title("Transaction Details")
         detail_window.geometry("400x400")
@@ -732,7 +825,7 @@ class BankingApp:
             ("Type:", transaction[8]),
             ("Mode:", transaction[9]),
             ("Bank:", transaction[10] if transaction[10] else "N/A"),
-            ("Amount:", f"₹{transaction[11]:,.2f}")
+            ("Amount:", str(Money(transaction[11])))
         ]
         
         for i, (label, value) in enumerate(fields):
@@ -785,8 +878,7 @@ class BankingApp:
 
     def on_mode_selected(self, event=None):
         if self.txn_mode.get() == "Bank":
-            cursor.execute("SELECT bank_name FROM banks")
-            banks = [row[0] for row in cursor.fetchall()]
+            banks = self.books.list_banks()
             if not banks:
                 messagebox.showerror("Error", "No banks available. Please add a bank first.")
                 self.txn_mode.current(0)
@@ -801,56 +893,35 @@ class BankingApp:
 
     def add_transaction(self):
         try:
-            if not self.validate_ifsc(self.txn_ifsc.get()):
-                raise ValueError("Invalid IFSC Code")
-                
-            if not self.validate_mobile(self.txn_mobile.get()):
-                raise ValueError("Invalid Mobile Number")
-                
-            amount = float(self.txn_amount.get())
-            if amount <= 0:
-                raise ValueError("Amount must be positive")
-            
-            txn_type = self.txn_type.get()
-            txn_mode = self.txn_mode.get()
-            bank_name = self.bank_combobox.get() if txn_mode == "Bank" else None
-            
-            # Insert transaction
-            cursor.execute('''INSERT INTO transactions 
-                            (date, customer_name, account_number, ifsc_code, mobile, address,
-                             transaction_no, transaction_type, transaction_mode, bank_name, amount)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                             self.txn_customer.get(),
-                             self.txn_account.get(),
-                             self.txn_ifsc.get(),
-                             self.txn_mobile.get(),
-                             self.txn_address.get(),
-                             self.txn_number.get(),
-                             txn_type,
-                             txn_mode,
-                             bank_name,
-                             amount))
-            
-            # Update balances
-            if txn_type == "Deposit":
-                if txn_mode == "Cash":
-                    cursor.execute("UPDATE balances SET cash = cash + ?", (amount,))
-                elif txn_mode == "Bank":
-                    cursor.execute("UPDATE banks SET balance = balance + ? WHERE bank_name=?", (amount, bank_name))
-            elif txn_type == "Withdrawal":
-                if txn_mode == "Cash":
-                    cursor.execute("UPDATE balances SET cash = cash - ?", (amount,))
-                elif txn_mode == "Bank":
-                    cursor.execute("UPDATE banks SET balance = balance - ? WHERE bank_name=?", (amount, bank_name))
-            
-            conn.commit()
-            self.update_balances()
-            self.load_transactions()
-            self.txn_window.destroy()
-            messagebox.showinfo("Success", "Transaction added!")
-        except Exception as e:
+            amount = bankmoney.parse_amount(self.txn_amount.get())
+            bankservice.validate_transaction(self.txn_ifsc.get(), self.txn_mobile.get(), amount)
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        window = self.txn_window
+        self.writes.submit(
+            "insert_transaction",
+            self.txn_customer.get(),
+            self.txn_account.get(),
+            self.txn_ifsc.get(),
+            self.txn_mobile.get(),
+            self.txn_address.get(),
+            self.txn_number.get(),
+            self.txn_type.get(),
+            self.txn_mode.get(),
+            self.bank_combobox.get(),
+            amount,
+            on_done=lambda sr_no: self.on_transaction_added(window),
+            on_error=lambda e: messagebox.showerror("Error", str(e)))
+
+    def on_transaction_added(self, window):
+        if window.winfo_exists():
+            window.destroy()
+        # After the batch's refresh, which is queued behind this callback
+        self.root.after_idle(messagebox.showinfo, "Success", "Transaction added!")
+
+    def on_write_batch(self, count):
+        self.update_balances()
 
     # Bank Management
     def add_update_bank(self):
@@ -860,10 +931,8 @@ class BankingApp:
             messagebox.showerror("Error", "Bank name and balance are required")
             return
         try:
-            balance = float(balance)
-            cursor.execute("INSERT OR REPLACE INTO banks (bank_name, balance) VALUES (?, ?)",
-                         (bank_name, balance))
-            conn.commit()
+            balance = bankmoney.parse_amount(balance)
+            self.books.set_bank_balance(bank_name, balance)
             self.update_balances()
             messagebox.showinfo("Success", "Bank balance updated")
         except ValueError:
@@ -874,9 +943,7 @@ class BankingApp:
         if not bank_name:
             messagebox.showerror("Error", "Enter bank name to delete")
             return
-        cursor.execute("DELETE FROM banks WHERE bank_name=?", (bank_name,))
-        conn.commit()
-        if cursor.rowcount == 0:
+        if not self.books.delete_bank(bank_name):
             messagebox.showerror("Error", "Bank not found")
         else:
             messagebox.showinfo("Success", "Bank deleted")
@@ -884,15 +951,20 @@ class BankingApp:
 
     # Reporting System
     def show_report_dialog(self):
+        from tkcalendar import DateEntry
         self.report_window = tk.Toplevel(self.root)
         self.report_window.title("Reports & Utilities")
-        self.report_window.geometry("500x450")
+        self.report_window.geometry("500x620")
         
         main_frame = ttk.Frame(self.report_window)
         main_frame.pack(padx=20, pady=20, fill=tk.BOTH, expand=True)
 
         ttk.Button(main_frame, text="Show Daily Summary", 
                  command=self.show_daily_summary).pack(pady=5)
+        ttk.Button(main_frame, text="Check Totals", 
+                 command=self.check_totals).pack(pady=5)
+        ttk.Button(main_frame, text="Balance History",
+                 command=self.balance_history).pack(pady=5)
 
         date_frame = ttk.LabelFrame(main_frame, text="Select Date Range")
         date_frame.pack(fill=tk.X, pady=5)
@@ -906,11 +978,25 @@ class BankingApp:
         self.end_date.grid(row=1, column=1, padx=5)
 
         ttk.Label(date_frame, text="Report Type:").grid(row=2, column=0, padx=5)
-        self.report_type = ttk.Combobox(date_frame, 
-                                      values=["Summary", "Detailed", "Graphical"])
+        self.report_type = ttk.Combobox(date_frame, values=list(REPORT_TYPES), state="readonly")
         self.report_type.current(0)
         self.report_type.grid(row=2, column=1, padx=5)
 
+        options_frame = ttk.LabelFrame(main_frame, text="Export Options")
+        options_frame.pack(fill=tk.X, pady=5)
+
+        self.export_range_only = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Only the selected date range",
+                        variable=self.export_range_only).pack(anchor='w', padx=5)
+
+        ttk.Label(options_frame, text="Columns (CSV / Excel):").pack(anchor='w', padx=5)
+        self.export_columns = tk.Listbox(options_frame, selectmode=tk.MULTIPLE,
+                                         height=6, exportselection=False)
+        for col in bankservice.TRANSACTION_COLUMNS:
+            self.export_columns.insert(tk.END, col)
+        self.export_columns.select_set(0, tk.END)
+        self.export_columns.pack(fill=tk.X, padx=5, pady=5)
+
         export_frame = ttk.LabelFrame(main_frame, text="Data Management")
         export_frame.pack(fill=tk.X, pady=5)
 
@@ -918,7 +1004,8 @@ class BankingApp:
             ("Export PDF", self.export_pdf),
             ("Export Excel", self.export_excel),
             ("Export CSV", self.export_csv),
-            ("Import CSV", self.import_csv)
+            ("Import CSV", self.import_csv),
+            ("Receipts", self.batch_receipts)
         ]
 
         for text, cmd in buttons:
@@ -929,228 +1016,451 @@ class BankingApp:
         ttk.Button(main_frame, text="Close", 
                   command=self.report_window.destroy, style="Red.TButton").pack(pady=10)
 
+    def check_totals(self):
+        self.run_job("Integrity check", check_integrity_task, True, on_done=self.show_check_result)
+
+    def show_check_result(self, problems):
+        if not problems:
+            messagebox.showinfo("Totals", "Running totals and balances are consistent.")
+            return
+        messagebox.showwarning("Totals", "Drift found and repaired:\n" + "\n".join(problems))
+        self.update_balances()
+
     def generate_report(self):
         try:
             start_date = self.start_date.get_date()
             end_date = self.end_date.get_date()
             report_type = self.report_type.get()
+            name = REPORT_TYPES[report_type]
 
-            query = f"""SELECT * FROM transactions 
-                      WHERE date BETWEEN '{start_date}' AND '{end_date}'"""
-            
-            cursor.execute(query)
-            data = cursor.fetchall()
-            
-            if report_type == "Summary":
-                summary = pd.read_sql_query(query, conn)
-                summary = summary.groupby(['transaction_type', 'transaction_mode'])['amount'].sum()
-                messagebox.showinfo("Summary Report", str(summary))
-            
-            elif report_type == "Detailed":
-                self.show_detailed_report(data)
-            
-            elif report_type == "Graphical":
-                self.generate_graphical_report(data)
+            if name is None:
+                self.show_cash_flow(start_date, end_date)
+                return
+            if name == "summary":
+                show = lambda result: self.show_summary_report(result[1])
+            else:
+                show = lambda result: self.show_detailed_report(*result, title=f"{report_type} Report")
+            self.run_job(f"{report_type} report", report_task, name, start_date, end_date, on_done=show)
 
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
-    def show_detailed_report(self, data):
+    def show_summary_report(self, summary):
+        lines = [f"{txn_type} / {txn_mode}: {Money(amount)} ({count})"
+                 for txn_type, txn_mode, amount, count in summary]
+        messagebox.showinfo("Summary Report", "\n".join(lines) or "No transactions in range")
+
+    def show_detailed_report(self, columns, data, title="Detailed Report"):
         report_win = tk.Toplevel(self.root)
-        report_win.title("Detailed Report")
+        report_win.title(title)
         
         text = tk.Text(report_win, wrap=tk.WORD)
         text.pack(fill=tk.BOTH, expand=True)
         
-        columns = [description[0] for description in cursor.description]
         text.insert(tk.END, "\t".join(columns) + "\n")
-        for row in data:
-            text.insert(tk.END, "\t".join(map(str, row)) + "\n")
-
-    def generate_graphical_report(self, data):
-        df = pd.DataFrame(data, columns=[desc[0] for desc in cursor.description])
-        fig = plt.Figure(figsize=(6,4))
+        for index, column in enumerate(columns):
+            if column in bankreports.MONEY_COLUMNS:
+                amounts = bankmoney.format_amounts([row[index] for row in data])
+                data = [row[:index] + (amount,) + row[index + 1:] for row, amount in zip(data, amounts)]
+        text.insert(tk.END, "".join("\t".join(map(str, row)) + "\n" for row in data))
+
+    def balance_history(self):
+        start_date = self.start_date.get_date()
+        end_date = self.end_date.get_date()
+        self.run_job("Balance history", balance_history_task, start_date, end_date,
+                     on_done=lambda history: self.show_balance_history(history, end_date))
+
+    def show_balance_history(self, history, end_date):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        fig = Figure(figsize=(8,4))
         ax = fig.add_subplot(111)
-        df.groupby('transaction_type')['amount'].sum().plot(kind='bar', ax=ax)
-        ax.set_title('Transaction Summary')
-        
+        for account, points in history.items():
+            # Hold the last balance to the end of the range
+            points = points + [(end_date.isoformat(), points[-1][1])]
+            days = [date.fromisoformat(day) for day, _ in points]
+            ax.step(days, [bankmoney.to_rupees(balance) for _, balance in points],
+                    where='post', label=account.removeprefix(bankdb.BANK_ACCOUNT_PREFIX).title())
+        ax.set_title('Closing Balances')
+        ax.legend(fontsize=8)
+        fig.autofmt_xdate()
+
         chart_win = tk.Toplevel(self.root)
+        chart_win.title("Balance History")
         canvas = FigureCanvasTkAgg(fig, chart_win)
-        canvas.get_tk_widget().pack()
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    # Cash flow chart. One window, Figure and canvas are kept for the
+    # session; a new range or a different bucket / breakdown redraws the
+    # same axes. The server side sums daily_rollup into at most about one
+    # bucket per two pixels of chart, so long ranges stay light to draw.
+    def show_cash_flow(self, start_date, end_date):
+        if self.flow_window is None or not self.flow_window.winfo_exists():
+            self.build_cash_flow_window()
+        self.flow_range = (start_date, end_date)
+        self.flow_window.deiconify()
+        self.flow_window.lift()
+        self.refresh_cash_flow()
+
+    def build_cash_flow_window(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        self.flow_window = tk.Toplevel(self.root)
+        self.flow_window.title("Cash Flow")
+        self.flow_window.geometry("1000x700")
+
+        controls = ttk.Frame(self.flow_window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(controls, text="Per:").pack(side=tk.LEFT, padx=5)
+        self.flow_bucket = ttk.Combobox(controls, values=list(FLOW_BUCKETS), state="readonly", width=8)
+        self.flow_bucket.current(0)
+        self.flow_bucket.pack(side=tk.LEFT)
+        ttk.Label(controls, text="Breakdown:").pack(side=tk.LEFT, padx=5)
+        self.flow_series = ttk.Combobox(controls, values=list(FLOW_SERIES), state="readonly", width=8)
+        self.flow_series.current(0)
+        self.flow_series.pack(side=tk.LEFT)
+        for combo in (self.flow_bucket, self.flow_series):
+            combo.bind("<<ComboboxSelected>>", lambda e: self.refresh_cash_flow())
+
+        self.flow_figure = Figure(figsize=(10, 6))
+        self.flow_axes = self.flow_figure.subplots(3, 1, sharex=True)
+        self.flow_canvas = FigureCanvasTkAgg(self.flow_figure, self.flow_window)
+        NavigationToolbar2Tk(self.flow_canvas, self.flow_window)
+        self.flow_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def refresh_cash_flow(self):
+        start_date, end_date = self.flow_range
+        bucket = FLOW_BUCKETS[self.flow_bucket.get()]
+        series = FLOW_SERIES[self.flow_series.get()]
+        # A window opened just now has no size until it is laid out; until
+        # it is mapped, the figure's own size in pixels stands in
+        widget = self.flow_canvas.get_tk_widget()
+        widget.update_idletasks()
+        width = widget.winfo_width()
+        if width <= 1:
+            width = int(self.flow_figure.get_figwidth() * self.flow_figure.dpi)
+        points = max(width // 2, 100)
+        # Charts requested before this one are stale and get dropped
+        self.flow_generation += 1
+        generation = self.flow_generation
+        # On the interactive worker, leaving the status bar to longer jobs
+        self.jobs.submit(cash_flow_task, start_date, end_date, bucket, series, points,
+                         on_done=lambda flow: self.draw_cash_flow(flow, generation),
+                         on_error=lambda e: messagebox.showerror("Error", str(e)), interactive=True)
+
+    def draw_cash_flow(self, flow, generation):
+        if generation != self.flow_generation or not self.flow_window.winfo_exists():
+            return
+        lines = {}
+        for period, name, deposits, withdrawals, net in flow['rows']:
+            days, *values = lines.setdefault(name, ([], [], [], []))
+            days.append(date.fromisoformat(period))
+            for column, amount in zip(values, (deposits, withdrawals, net)):
+                column.append(bankmoney.to_rupees(amount))
+
+        titles = ("Deposits", "Withdrawals", "Net Flow")
+        for ax, title in zip(self.flow_axes, titles):
+            ax.clear()
+            ax.set_title(title, fontsize=9, loc='left')
+        for name, (days, *values) in lines.items():
+            for ax, column in zip(self.flow_axes, values):
+                ax.plot(days, column, linewidth=1, label=name)
+        self.flow_axes[2].axhline(0, color='grey', linewidth=0.5)
+        if len(lines) > 1:
+            self.flow_axes[0].legend(fontsize=8, ncol=min(len(lines), 6))
+        start_date, end_date = self.flow_range
+        self.flow_window.title(f"Cash Flow per {flow['bucket']}, {start_date:%d %b %Y} - {end_date:%d %b %Y}")
+        self.flow_figure.autofmt_xdate()
+        self.flow_canvas.draw_idle()
 
     def export_pdf(self):
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".pdf",
-                filetypes=[("PDF Files", "*.pdf")]
-            )
-            if filename:
-                cursor.execute("SELECT * FROM transactions")
-                data = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                
-                doc = SimpleDocTemplate(filename, pagesize=letter)
-                elements = []
-                
-                styles = getSampleStyleSheet()
-                elements.append(Paragraph("Data Click Education", styles['Title']))
-                elements.append(Spacer(1, 12))
-                
-                table_data = [columns] + list(data)
-                table = Table(table_data)
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.blue),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('BOTTOMPADDING', (0,0), (-1,0), 12),
-                    ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-                    ('GRID', (0,0), (-1,-1), 1, colors.black)
-                ]))
-                elements.append(table)
-                doc.build(elements)
-                messagebox.showinfo("Success", "PDF exported successfully!")
-        except Exception as e:
+            _, start_date, end_date = self.export_options()
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF Files", "*.pdf")]
+        )
+        if filename:
+            self.run_job("PDF export", export_pdf_task, filename, start_date, end_date,
+                         on_done=lambda pages: messagebox.showinfo("Success", f"PDF exported successfully! ({pages} pages)"))
+
+    def export_options(self):
+        columns = [self.export_columns.get(i) for i in self.export_columns.curselection()]
+        if not columns:
+            raise ValueError("Select at least one column to export")
+        if self.export_range_only.get():
+            return columns, self.start_date.get_date(), self.end_date.get_date()
+        return columns, None, None
 
     def export_excel(self):
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel Files", "*.xlsx")]
-            )
-            if filename:
-                cursor.execute("SELECT * FROM transactions")
-                data = cursor.fetchall()
-                df = pd.DataFrame(data, columns=[
-                    'sr_no', 'date', 'customer_name', 'account_number',
-                    'ifsc_code', 'mobile', 'address', 'transaction_no',
-                    'transaction_type', 'transaction_mode', 'bank_name', 'amount'
-                ])
-                df.to_excel(filename, index=False)
-                messagebox.showinfo("Success", "Excel file exported!")
-        except Exception as e:
+            options = self.export_options()
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel Files", "*.xlsx")]
+        )
+        if filename:
+            self.run_job("Excel export", export_excel_task, filename, *options,
+                         on_done=lambda count: messagebox.showinfo("Success", f"Excel file exported! ({count} rows)"))
 
     def export_csv(self):
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV Files", "*.csv")]
-            )
-            if filename:
-                cursor.execute("SELECT * FROM transactions")
-                data = cursor.fetchall()
-                df = pd.DataFrame(data, columns=[
-                    'sr_no', 'date', 'customer_name', 'account_number',
-                    'ifsc_code', 'mobile', 'address', 'transaction_no',
-                    'transaction_type', 'transaction_mode', 'bank_name', 'amount'
-                ])
-                df.to_csv(filename, index=False)
-                messagebox.showinfo("Success", "CSV file exported!")
-        except Exception as e:
+            options = self.export_options()
+        except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")]
+        )
+        if filename:
+            self.run_job("CSV export", export_csv_task, filename, *options,
+                         on_done=lambda count: messagebox.showinfo("Success", f"CSV file exported! ({count} rows)"))
 
     def import_csv(self):
-        try:
-            filename = filedialog.askopenfilename(
-                filetypes=[("CSV Files", "*.csv")]
-            )
-            if filename:
-                df = pd.read_csv(filename)
-                required_columns = [
-                    'customer_name', 'account_number', 'ifsc_code', 'mobile',
-                    'transaction_no', 'transaction_type', 'transaction_mode', 'amount'
-                ]
-                
-                if not all(col in df.columns for col in required_columns):
-                    raise ValueError("Invalid CSV format")
-                
-                for _, row in df.iterrows():
-                    cursor.execute('''INSERT INTO transactions 
-                        (date, customer_name, account_number, ifsc_code, mobile, address,
-                         transaction_no, transaction_type, transaction_mode, amount)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                         row['customer_name'], row['account_number'], row['ifsc_code'],
-                         str(row['mobile']), row.get('address', ''),
-                         row['transaction_no'], row['transaction_type'],
-                         row['transaction_mode'], row['amount']))
-                conn.commit()
-                self.load_transactions()
-                messagebox.showinfo("Success", f"{len(df)} transactions imported!")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        filename = filedialog.askopenfilename(
+            filetypes=[("CSV Files", "*.csv")]
+        )
+        if filename:
+            self.run_job("CSV import", import_csv_task, filename, on_done=self.on_import_done)
 
-    # Utility Functions
-    def validate_ifsc(self, code):
-        return re.match(r"^[A-Z]{4}0[A-Z0-9]{6}$", code)
+    def on_import_done(self, result):
+        imported, rejected, error_file = result
+        self.update_balances()
+        if rejected:
+            messagebox.showwarning("Import", f"{imported} transactions imported, {rejected} rejected.\n"
+                                             f"See {error_file} for details.")
+        else:
+            messagebox.showinfo("Success", f"{imported} transactions imported!")
+
+    # Diagnostics. Only offered with --metrics: the histograms bankmetrics
+    # has collected so far, slowest in total first, and the recent slow
+    # queries (with their plans) and event-loop stalls.
+    def show_diagnostics(self):
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        window = self.diagnostics_window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        window.geometry("1100x650")
+
+        columns = ("kind", "name", "count", "p50 ms", "p95 ms", "max ms", "total ms", "rows")
+        self.diagnostics_tree = ttk.Treeview(window, columns=columns, show="headings", height=16)
+        for column, width in zip(columns, (50, 520, 70, 70, 70, 80, 90, 80)):
+            self.diagnostics_tree.heading(column, text=column.title())
+            self.diagnostics_tree.column(column, width=width, anchor='w' if column in ("kind", "name") else 'e')
+        self.diagnostics_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        ttk.Label(window, text="Slow queries and stalls:").pack(anchor='w', padx=5)
+        self.diagnostics_events = tk.Text(window, height=12, wrap=tk.NONE)
+        self.diagnostics_events.pack(fill=tk.BOTH, expand=True, padx=5)
+
+        buttons = ttk.Frame(window)
+        buttons.pack(fill=tk.X, pady=5)
+        ttk.Button(buttons, text="Reset", command=self.reset_diagnostics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="Write Snapshot", command=self.write_diagnostics).pack(side=tk.LEFT, padx=5)
+        self.refresh_diagnostics(window)
+
+    def refresh_diagnostics(self, window):
+        # Reschedules itself for as long as this window is open
+        if window is not self.diagnostics_window or not window.winfo_exists():
+            return
+        self.fill_diagnostics()
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics, window)
+
+    def fill_diagnostics(self):
+        snapshot = bankmetrics.metrics.snapshot()
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for entry in snapshot['histograms']:
+            self.diagnostics_tree.insert('', tk.END, values=(
+                entry['kind'], entry['name'], entry['count'], f"{entry['p50_ms']:.2f}",
+                f"{entry['p95_ms']:.2f}", f"{entry['max_ms']:.1f}", f"{entry['total_ms']:,.0f}", entry['rows']))
+
+        lines = []
+        for event in reversed(snapshot['recent']):
+            if event['type'] == "slow_query":
+                lines.append(f"{event['time']}  slow query {event['ms']} ms, {event['rows']} rows: {event['sql']}")
+                lines += [f"    {step}" for step in event['plan'] or []]
+            else:
+                lines.append(f"{event['time']}  stall {event['ms']} ms in {event['handler'] or 'event loop'}")
+        self.diagnostics_events.delete("1.0", tk.END)
+        self.diagnostics_events.insert(tk.END, "\n".join(lines) or "None so far")
+
+    def reset_diagnostics(self):
+        bankmetrics.metrics.reset()
+        self.fill_diagnostics()
+
+    def write_diagnostics(self):
+        bankmetrics.write_snapshot()
+        messagebox.showinfo("Diagnostics", f"Snapshot written to {bankmetrics.METRICS_FILE}")
+
+    # Background Jobs
+    def run_job(self, description, fn, *args, on_done=None):
+        def done(result):
+            self.finish_job(job, f"{description} finished")
+            if on_done:
+                on_done(result)
+
+        def failed(error):
+            self.finish_job(job, f"{description} failed")
+            messagebox.showerror("Error", str(error))
+
+        def cancelled():
+            self.finish_job(job, f"{description} cancelled")
+
+        def progress(done_count, total, message):
+            if job in self.active_jobs:
+                percent = 100 * done_count / total if total else self.active_jobs[job][1]
+                self.active_jobs[job] = (f"{message or description}...", percent)
+                self.show_job_status()
+
+        job = self.jobs.submit(fn, *args, on_done=done, on_error=failed,
+                               on_progress=progress, on_cancel=cancelled)
+        self.active_jobs[job] = (f"{description}...", 0)
+        self.show_job_status()
+        return job
+
+    def show_job_status(self):
+        # The newest running job, and how many more are behind it
+        job = list(self.active_jobs)[-1]
+        text, percent = self.active_jobs[job]
+        if len(self.active_jobs) > 1:
+            text += f" (+{len(self.active_jobs) - 1} more)"
+        self.job_status.config(text=text)
+        self.job_progress['value'] = percent
+        self.job_cancel.config(state=tk.NORMAL)
+
+    def finish_job(self, job, text):
+        if self.active_jobs.pop(job, None) is None:
+            return
+        if self.active_jobs:
+            self.show_job_status()
+            return
+        self.job_status.config(text=text)
+        self.job_progress['value'] = 0
+        self.job_cancel.config(state=tk.DISABLED)
 
-    def validate_mobile(self, number):
-        return re.match(r"^[6-9]\d{9}$", number)
+    def cancel_job(self):
+        # Every running job: the status bar stands for all of them
+        for job in self.active_jobs:
+            job.cancel()
+        if self.active_jobs:
+            self.job_status.config(text="Cancelling...")
 
+    # Utility Functions
     def update_balances(self):
+        # Close of business on the history filter's last day, else yesterday
+        closing_day = self.history_filter[1] if self.history_filter else None
+        figures = self.books.dashboard(closing_day)
         # Update cash balance
-        cursor.execute("SELECT cash FROM balances")
-        cash = cursor.fetchone()[0]
-        self.cash_balance.config(text=f"₹{cash:,.2f}")
-        
-        # Clear existing bank displays
-        for widget in self.banks_container.winfo_children():
-            widget.destroy()
-        
-        # Update bank balances
-        cursor.execute("SELECT bank_name, balance FROM banks")
-        banks = cursor.fetchall()
-        for bank_name, balance in banks:
-            frame = ttk.LabelFrame(self.banks_container, text=bank_name, style='Bank.TLabelframe')
-            frame.pack(side=tk.LEFT, padx=5, pady=5)
-            lbl = ttk.Label(frame, text=f"₹{balance:,.2f}", font=('Arial', 12, 'bold'))
-            lbl.pack(padx=10, pady=5)
-        
-        # Calculate total balance
-        cursor.execute("SELECT SUM(balance) FROM banks")
-        total_bank = cursor.fetchone()[0] or 0
-        total = cash + total_bank
+        self.cash_balance.config(text=str(Money(figures['cash'])))
+        
+        # Update bank balances in place; only added or removed banks
+        # create or destroy widgets, and unchanged labels are left alone
+        banks = dict(figures['banks'])
+        for bank_name in list(self.bank_widgets):
+            if bank_name not in banks:
+                self.bank_widgets.pop(bank_name)[0].destroy()
+        for bank_name, balance in banks.items():
+            text = str(Money(balance))
+            if bank_name not in self.bank_widgets:
+                frame = ttk.LabelFrame(self.banks_container, text=bank_name, style='Bank.TLabelframe')
+                frame.pack(side=tk.LEFT, padx=5, pady=5)
+                lbl = ttk.Label(frame, text=text, font=('Arial', 12, 'bold'))
+                lbl.pack(padx=10, pady=5)
+                self.bank_widgets[bank_name] = (frame, lbl, text)
+            elif self.bank_widgets[bank_name][2] != text:
+                frame, lbl, _ = self.bank_widgets[bank_name]
+                lbl.config(text=text)
+                self.bank_widgets[bank_name] = (frame, lbl, text)
         
         # Update other balances
-        cursor.execute("SELECT SUM(amount) FROM transactions WHERE transaction_type='Deposit'")
-        deposits = cursor.fetchone()[0] or 0
-        cursor.execute("SELECT SUM(amount) FROM transactions WHERE transaction_type='Withdrawal'")
-        withdrawals = cursor.fetchone()[0] or 0
-        
-        self.total_balance.config(text=f"₹{total:,.2f}")
-        self.total_deposit.config(text=f"₹{deposits:,.2f}")
-        self.total_withdrawal.config(text=f"₹{withdrawals:,.2f}")
-        self.closing_balance.config(text=f"₹{total:,.2f}")
+        self.total_balance.config(text=str(Money(figures['total'])))
+        self.total_deposit.config(text=str(Money(figures['deposits'])))
+        self.total_withdrawal.config(text=str(Money(figures['withdrawals'])))
+        self.closing_balance.config(
+            text=f"{Money(figures['closing'])}\n{figures['closing_day']:%d %b %Y}")
 
     def load_transactions(self, start_date=None, end_date=None):
-        for item in self.history_tree.get_children():
-            self.history_tree.delete(item)
-        
-        query = '''SELECT 
-                sr_no,
-                date, 
-                customer_name, 
-                account_number,
-                ifsc_code,
-                mobile,
-                transaction_type, 
-                transaction_mode, 
-                bank_name,
-                amount 
-                FROM transactions'''
-        
-        params = ()
-        if start_date and end_date:
-            query += " WHERE date(date) BETWEEN ? AND ?"
-            params = (start_date, end_date)
-        
-        query += " ORDER BY date DESC"
-        
-        cursor.execute(query, params)
-        
-        for row in cursor.fetchall():
+        if self.history_searching:
+            self.history_searching = False
+            self.search_entry.delete(0, tk.END)
+            self.search_entry.insert(0, SEARCH_PLACEHOLDER)
+        self.history_filter = (start_date, end_date) if start_date and end_date else None
+        # Pages requested before this reload are stale and get dropped
+        self.history_generation += 1
+        generation = self.history_generation
+        self.history_paging = True
+        self.jobs.submit(history_page_task, self.history_filter,
+                         on_done=lambda rows: self.show_history_page(rows, generation),
+                         on_error=lambda e: self.on_history_error(e, generation), interactive=True)
+
+    def show_history_page(self, rows, generation):
+        if generation != self.history_generation:
+            return
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.history_has_newer = False
+        self.history_has_older = len(rows) == HISTORY_PAGE_SIZE
+        self.insert_history_rows(rows, tk.END)
+        self.history_tree.yview_moveto(0)
+        self.history_paging = False
+
+    # Search
+    def clear_search_placeholder(self, event=None):
+        if self.search_entry.get() == SEARCH_PLACEHOLDER:
+            self.search_entry.delete(0, tk.END)
+
+    def on_search_typed(self, event=None):
+        # Debounced: only search once typing pauses
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        query = bankdb.search_query(self.search_entry.get())
+        if not query:
+            if self.history_searching:
+                # Leave the (now empty) entry alone while the user is in it
+                self.history_searching = False
+                self.load_transactions(*(self.history_filter or ()))
+            return
+        self.history_searching = True
+        self.history_generation += 1
+        generation = self.history_generation
+        self.history_paging = True
+        self.jobs.submit(search_task, query,
+                         on_done=lambda rows: self.show_search_results(rows, generation),
+                         on_error=lambda e: self.on_history_error(e, generation), interactive=True)
+
+    def show_search_results(self, rows, generation):
+        if generation != self.history_generation:
+            return
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.history_has_newer = False
+        self.history_has_older = False
+        self.insert_history_rows(rows, tk.END)
+        self.history_tree.yview_moveto(0)
+        self.history_paging = False
+
+    def on_history_error(self, error, generation):
+        if generation == self.history_generation:
+            self.history_paging = False
+            messagebox.showerror("Error", str(error))
+
+    def insert_history_rows(self, rows, index):
+        # Rows arrive newest first; inserting at the top keeps that order
+        # by walking them backwards.
+        if index == 0:
+            rows = rows[::-1]
+        amounts = bankmoney.format_amounts([row[9] for row in rows], symbol=bankmoney.CURRENCY)
+        for row, amount in zip(rows, amounts):
             formatted_row = (
                 row[0],  # Sr.No
                 row[1],  # Date
@@ -1161,15 +1471,155 @@ class BankingApp:
                 row[6],  # Type
                 row[7],  # Mode
                 row[8] if row[8] else "",  # Bank
-                f"₹{row[9]:,.2f}"  # Amount
+                amount  # Amount
             )
-            self.history_tree.insert("", tk.END, values=formatted_row)
+            self.history_tree.insert("", index, iid=str(row[0]), values=formatted_row)
+
+    # Change events. Changes that arrive together are applied in one pass:
+    # deletes directly, inserts and updates once their rows are fetched.
+    def on_row_changed(self, kind, sr_no):
+        if not self.current_user:
+            return
+        if kind == "reload":
+            self.pending_reload = True
+        else:
+            self.pending_changes[sr_no] = kind
+        if not self.changes_after_id:
+            self.changes_after_id = self.root.after_idle(self.apply_row_changes)
+
+    def apply_row_changes(self):
+        self.changes_after_id = None
+        if not self.current_user:
+            return
+        changes, self.pending_changes = self.pending_changes, {}
+        if self.pending_reload:
+            # Too many rows changed to patch one by one
+            self.pending_reload = False
+            self.load_transactions(*(self.history_filter or ()))
+            return
+        tree = self.history_tree
+        fetch = []
+        for sr_no, kind in changes.items():
+            if kind == "delete":
+                if tree.exists(str(sr_no)):
+                    tree.delete(str(sr_no))
+            else:
+                fetch.append(sr_no)
+        if fetch:
+            generation = self.history_generation
+            self.jobs.submit(transaction_rows_task, fetch,
+                             on_done=lambda rows: self.place_history_rows(rows, generation), interactive=True)
+
+    def place_history_rows(self, rows, generation):
+        # A reload since the fetch already shows these rows as they are
+        if generation != self.history_generation:
+            return
+        tree = self.history_tree
+        for row in rows:
+            iid = str(row[0])
+            if self.history_searching:
+                # Search results keep their order; only refresh what is shown
+                if tree.exists(iid):
+                    index = tree.index(iid)
+                    tree.delete(iid)
+                    self.insert_history_rows([row], index)
+                continue
+            if tree.exists(iid):
+                tree.delete(iid)
+            if self.history_filter:
+                start, end = bankdb.date_bounds(*self.history_filter)
+                if not start <= row[1] < end:
+                    continue
+            index = self.history_index((row[1], row[0]))
+            children = tree.get_children()
+            # Rows beyond either edge of a window that has more rows past
+            # that edge are picked up by paging instead
+            if index == 0 and self.history_has_newer:
+                continue
+            if index == len(children) and self.history_has_older:
+                continue
+            self.insert_history_rows([row], index)
+            if len(children) + 1 > HISTORY_MAX_ROWS:
+                tree.delete(tree.get_children()[-1])
+                self.history_has_older = True
+
+    def history_index(self, key):
+        # Where a row with this (date, sr_no) key goes in the newest-first
+        # window: binary search, O(log n) item lookups
+        children = self.history_tree.get_children()
+        low, high = 0, len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if self.history_key(children[middle]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def history_key(self, item):
+        return (self.history_tree.set(item, "Date"), int(item))
+
+    def on_history_scroll(self, first, last):
+        self.history_vsb.set(first, last)
+        if self.history_paging:
+            return
+        if float(last) >= 0.9 and self.history_has_older:
+            self.history_paging = True
+            self.root.after_idle(self.page_history, "older")
+        elif float(first) <= 0.1 and self.history_has_newer:
+            self.history_paging = True
+            self.root.after_idle(self.page_history, "newer")
+
+    def page_history(self, direction):
+        children = self.history_tree.get_children()
+        if not children:
+            self.history_paging = False
+            return
+        generation = self.history_generation
+        older_than = self.history_key(children[-1]) if direction == "older" else None
+        newer_than = self.history_key(children[0]) if direction == "newer" else None
+        self.jobs.submit(history_page_task, self.history_filter, older_than, newer_than,
+                         on_done=lambda rows: self.slide_history(direction, rows, generation),
+                         on_error=lambda e: self.on_history_error(e, generation), interactive=True)
+
+    def slide_history(self, direction, rows, generation):
+        if generation != self.history_generation:
+            return
+        try:
+            tree = self.history_tree
+            children = tree.get_children()
+            top = round(tree.yview()[0] * len(children))
+
+            if direction == "older":
+                self.history_has_older = len(rows) == HISTORY_PAGE_SIZE
+                self.insert_history_rows(rows, tk.END)
+                children = tree.get_children()
+                excess = len(children) - HISTORY_MAX_ROWS
+                if excess > 0:
+                    tree.delete(*children[:excess])
+                    top -= excess
+                    self.history_has_newer = True
+            else:
+                self.history_has_newer = len(rows) == HISTORY_PAGE_SIZE
+                self.insert_history_rows(rows, 0)
+                top += len(rows)
+                children = tree.get_children()
+                excess = len(children) - HISTORY_MAX_ROWS
+                if excess > 0:
+                    tree.delete(*children[-excess:])
+                    self.history_has_older = True
+
+            # Keep the same rows on screen after the window slid underneath them
+            children = tree.get_children()
+            if children:
+                tree.yview_moveto(max(top, 0) / len(children))
+        finally:
+            self.history_paging = False
 
     def set_balances(self):
         try:
-            cash = float(self.cash_entry.get())
-            cursor.execute("UPDATE balances SET cash=?", (cash,))
-            conn.commit()
+            cash = bankmoney.parse_amount(self.cash_entry.get())
+            self.books.set_cash(cash)
             self.update_balances()
         except ValueError:
             messagebox.showerror("Error", "Invalid cash amount")
@@ -1185,4 +1635,12 @@ class BankingApp:
         self.show_auth_screen()
 
 if __name__ == "__main__":
-    BankingApp()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Data Click Education - Banking System")
+    parser.add_argument("--server", help="bankserver URL, e.g. http://127.0.0.1:8765 (default: local bank.db)")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"time queries, handlers and stalls into {bankmetrics.METRICS_FILE}")
+    args = parser.parse_args()
+    if bankmetrics.requested(args.metrics):
+        bankmetrics.enable()
+    BankingApp(args.server)
\ No newline at end of file
@@ -0,0 +1,336 @@
+import csv
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import bankarchive
+import bankdb
+import bankmoney
+from bankservice import IFSC_PATTERN, MOBILE_PATTERN, TRANSACTION_COLUMNS
+
+IMPORT_CHUNK_SIZE = 50000
+IMPORT_REQUIRED_COLUMNS = [
+    'customer_name', 'account_number', 'ifsc_code', 'mobile',
+    'transaction_no', 'transaction_type', 'transaction_mode', 'amount'
+]
+EXPORT_CHUNK_SIZE = 5000
+# One sheet holds 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+IMPORT_COLUMNS = [
+    'date', 'customer_name', 'account_number', 'ifsc_code', 'mobile', 'address',
+    'transaction_no', 'transaction_type', 'transaction_mode', 'bank_name', 'amount'
+]
+
+
+def validate_import_chunk(df, banks):
+    # Vectorised form of the checks add_transaction applies to a single
+    # entry. Returns the rejection reason per row, '' for valid rows; only
+    # the first failing rule is reported.
+    errors = pd.Series("", index=df.index)
+
+    def reject(mask, reason):
+        errors[mask & (errors == "")] = reason
+
+    for col in IMPORT_REQUIRED_COLUMNS:
+        if col != 'amount':
+            reject(df[col].str.strip() == "", f"Missing {col}")
+    reject(~df['ifsc_code'].str.match(IFSC_PATTERN), "Invalid IFSC Code")
+    reject(~df['mobile'].str.match(MOBILE_PATTERN), "Invalid Mobile Number")
+    reject(df['amount'].isna(), "Invalid amount")
+    reject(df['amount'].fillna(0) <= 0, "Amount must be positive")
+    reject(~df['transaction_type'].isin(["Deposit", "Withdrawal"]), "Invalid transaction type")
+    reject(~df['transaction_mode'].isin(["Cash", "Bank"]), "Invalid transaction mode")
+    reject((df['transaction_mode'] == "Bank") & ~df['bank_name'].isin(banks), "Unknown bank")
+    return errors
+
+
+def import_csv(conn, filename, progress=None, chunk_size=IMPORT_CHUNK_SIZE):
+    # Streams the file in chunks and inserts every valid row inside a single
+    # transaction; the ledger triggers post each row's balance effect as it
+    # goes in. Rejected rows are written, with
+    # their line number and reason, to <file>_errors.csv next to the input;
+    # the report only appears once the import has committed, so one rolled
+    # back leaves no report behind for rows that were never imported.
+    # Returns (imported, rejected, error_file or None).
+    cursor = conn.cursor()
+    banks = [row[0] for row in cursor.execute("SELECT bank_name FROM banks")]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    error_file = os.path.splitext(filename)[0] + "_errors.csv"
+    error_writer = None
+    error_handle = None
+
+    imported = 0
+    rejected = 0
+
+    try:
+        cursor.execute("BEGIN")
+        reader = pd.read_csv(filename, chunksize=chunk_size, dtype=str, keep_default_na=False)
+        for chunk in reader:
+            missing = [col for col in IMPORT_REQUIRED_COLUMNS if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Invalid CSV format, missing columns: {', '.join(missing)}")
+            for col in ('address', 'bank_name'):
+                if col not in chunk.columns:
+                    chunk[col] = ""
+            raw_amounts = chunk['amount']
+            chunk['amount'] = bankmoney.parse_amounts(raw_amounts)
+
+            errors = validate_import_chunk(chunk, banks)
+            bad = errors != ""
+            if bad.any():
+                if error_writer is None:
+                    error_handle = open(error_file + ".part", "w", newline="")
+                    error_writer = csv.writer(error_handle)
+                    error_writer.writerow(["line", "error"] + list(chunk.columns))
+                # +2: one for the header row, one because lines count from 1
+                # Rejected rows are written back as they were in the file
+                rejected_rows = chunk[bad].assign(amount=raw_amounts[bad])
+                for line, error, row in zip(chunk.index[bad] + 2, errors[bad],
+                                            rejected_rows.itertuples(index=False, name=None)):
+                    error_writer.writerow([line, error] + list(row))
+                rejected += int(bad.sum())
+
+            good = chunk[~bad].copy()
+            if good.empty:
+                continue
+            good['date'] = now
+            good.loc[good['transaction_mode'] != "Bank", 'bank_name'] = None
+            cursor.executemany('''INSERT INTO transactions
+                (date, customer_name, account_number, ifsc_code, mobile, address,
+                 transaction_no, transaction_type, transaction_mode, bank_name, amount)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                zip(*(good[col].tolist() for col in IMPORT_COLUMNS)))
+            imported += len(good)
+
+            if progress:
+                progress(imported + rejected, None, f"Imported {imported:,} rows")
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if error_handle:
+            error_handle.close()
+            os.remove(error_file + ".part")
+        raise
+    if error_handle:
+        error_handle.close()
+        os.replace(error_file + ".part", error_file)
+
+    return imported, rejected, error_file if rejected else None
+
+
+# Exports stream rows out of SQLite with fetchmany, so memory stays at one
+# chunk whatever the size of the table. columns selects and orders the
+# exported columns (default: all); start_date / end_date limit the export to
+# a date range. Rows carry amounts in paise as stored; each writer converts
+# the amount column a chunk at a time.
+def export_rows(conn, columns=None, start_date=None, end_date=None, progress=None,
+                chunk_size=EXPORT_CHUNK_SIZE):
+    columns = columns or TRANSACTION_COLUMNS
+    unknown = [col for col in columns if col not in TRANSACTION_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    where = ""
+    params = ()
+    if start_date and end_date:
+        where = " WHERE date >= ? AND date < ?"
+        params = bankdb.date_bounds(start_date, end_date)
+    # Archived years included, as far as the range reaches
+    source = bankarchive.source(conn, start_date, end_date)
+
+    cursor = conn.cursor()
+    total = cursor.execute(f"SELECT COUNT(*) FROM {source}" + where, params).fetchone()[0]
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {source}{where} ORDER BY sr_no", params)
+    done = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+        done += len(rows)
+        if progress:
+            progress(done, total, f"Exported {done:,} of {total:,} rows")
+
+
+def replace_column(rows, index, values):
+    return [row[:index] + (value,) + row[index + 1:] for row, value in zip(rows, values)]
+
+
+def export_csv(conn, filename, columns=None, start_date=None, end_date=None, progress=None):
+    columns = columns or TRANSACTION_COLUMNS
+    amount_index = columns.index('amount') if 'amount' in columns else None
+    count = 0
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in export_rows(conn, columns, start_date, end_date, progress):
+            if amount_index is not None:
+                # Exact decimal rupees, no grouping, so the file imports back as is
+                amounts = bankmoney.format_amounts([row[amount_index] for row in rows], grouping=False)
+                rows = replace_column(rows, amount_index, amounts)
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def export_excel(conn, filename, columns=None, start_date=None, end_date=None, progress=None):
+    from openpyxl import Workbook
+
+    columns = columns or TRANSACTION_COLUMNS
+    amount_index = columns.index('amount') if 'amount' in columns else None
+    # Write-only mode streams rows to disk instead of keeping every cell in
+    # memory; a sheet that fills up continues on a new one.
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    count = 0
+    for rows in export_rows(conn, columns, start_date, end_date, progress):
+        if amount_index is not None:
+            # Numeric cells in rupees so the sheet can still sum them
+            rows = replace_column(rows, amount_index,
+                                  [bankmoney.to_rupees(row[amount_index]) for row in rows])
+        for row in rows:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Transactions {len(workbook.worksheets) + 1}")
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+        count += len(rows)
+    if sheet is None:
+        workbook.create_sheet("Transactions 1").append(columns)
+    workbook.save(filename)
+    return count
+
+
+PDF_ROWS_PER_PAGE = 40
+PDF_COLUMNS = [
+    ('sr_no', 'Sr.No', 40), ('date', 'Date', 90), ('customer_name', 'Customer', 110),
+    ('account_number', 'Account No', 70), ('ifsc_code', 'IFSC', 60), ('mobile', 'Mobile', 55),
+    ('transaction_no', 'Txn No', 75), ('transaction_type', 'Type', 52),
+    ('transaction_mode', 'Mode', 35), ('bank_name', 'Bank', 45), ('amount', 'Amount', 70),
+]
+
+
+PDF_ROW_HEIGHT = 12
+PDF_FONT_SIZE = 7
+PDF_HEADER_COLOR = (0, 0, 1)
+PDF_BODY_COLOR = (0.961, 0.961, 0.863)
+PDF_SUMMARY_COLOR = (0.827, 0.827, 0.827)
+
+
+def fit_text(pdf, text, font, width):
+    while text and pdf.text_width(text, font, PDF_FONT_SIZE) > width - 4:
+        text = text[:-1]
+    return text
+
+
+def draw_ledger_row(pdf, y, cells, font='F1', fill=PDF_BODY_COLOR, color=(0, 0, 0)):
+    # cells: [(text, width, align)] laid out left to right from the margin.
+    # Only the row's bottom rule is drawn here; column rules are drawn once
+    # per page by the caller.
+    x = pdf.margin
+    for text, width, align in cells:
+        if fill:
+            pdf.fill_rect(x, y, width, PDF_ROW_HEIGHT, fill)
+        text = fit_text(pdf, text, font, width)
+        if align == 'right':
+            pdf.text(x + width - 3, y + 3.5, text, font, PDF_FONT_SIZE, color, align)
+        else:
+            pdf.text(x + width / 2, y + 3.5, text, font, PDF_FONT_SIZE, color, 'center')
+        x += width
+    pdf.line(pdf.margin, y, x, y)
+
+
+def export_pdf(conn, filename, start_date=None, end_date=None, progress=None,
+               rows_per_page=PDF_ROWS_PER_PAGE):
+    # Ledger PDF drawn a page at a time: every page carries the column
+    # header and a subtotal row, the last one the grand total as well. Rows
+    # stream from SQLite and pages go to disk in parts of a few hundred, so
+    # memory does not grow with the ledger. Returns the number of pages
+    # written.
+    from bankpdf import LedgerCanvas
+    from reportlab.lib.pagesizes import letter, landscape
+
+    page_width, page_height = landscape(letter)
+    columns = [col for col, _, _ in PDF_COLUMNS]
+    header = [title for _, title, _ in PDF_COLUMNS]
+    widths = [width for _, _, width in PDF_COLUMNS]
+    aligns = ['center'] * (len(columns) - 1) + ['right']
+    type_index = columns.index('transaction_type')
+    table_width = sum(widths)
+
+    title = "Data Click Education - Transaction Ledger"
+    if start_date and end_date:
+        title += f" ({start_date} to {end_date})"
+    pdf = LedgerCanvas(filename, (page_width, page_height), title)
+    pdf.margin = 30
+
+    grand = {"Deposit": 0, "Withdrawal": 0}
+
+    def summary_row(y, label, totals):
+        net = totals['Deposit'] - totals['Withdrawal']
+        label_width = sum(widths[:-1])
+        draw_ledger_row(pdf, y, [
+            (f"{label} - Deposits: {bankmoney.format_amount(totals['Deposit'])}   "
+             f"Withdrawals: {bankmoney.format_amount(totals['Withdrawal'])}   Net:", label_width, 'right'),
+            (bankmoney.format_amount(net), widths[-1], 'right'),
+        ], font='F2', fill=PDF_SUMMARY_COLOR)
+        for x in (0, label_width, table_width):
+            pdf.line(pdf.margin + x, y, pdf.margin + x, y + PDF_ROW_HEIGHT)
+
+    def draw_page(rows, last):
+        page_number = pdf.page_count + 1
+        top = page_height - pdf.margin
+        pdf.text(pdf.margin, top - 10, title, 'F2', 12)
+        pdf.text(page_width - pdf.margin, top - 10, f"Page {page_number}", 'F1', 8, align='right')
+        top -= 16
+        y = top - PDF_ROW_HEIGHT
+        pdf.line(pdf.margin, top, pdf.margin + table_width, top)
+        draw_ledger_row(pdf, y, zip(header, widths, aligns),
+                        font='F2', fill=PDF_HEADER_COLOR, color=(1, 1, 1))
+
+        # One background for the whole body instead of one per cell
+        pdf.fill_rect(pdf.margin, y - PDF_ROW_HEIGHT * len(rows), table_width,
+                      PDF_ROW_HEIGHT * len(rows), PDF_BODY_COLOR)
+        subtotal = {"Deposit": 0, "Withdrawal": 0}
+        amounts = bankmoney.format_amounts([row[-1] or 0 for row in rows])
+        for row, amount in zip(rows, amounts):
+            if row[type_index] in subtotal:
+                subtotal[row[type_index]] += row[-1] or 0
+            cells = ["" if value is None else str(value) for value in row[:-1]] + [amount]
+            y -= PDF_ROW_HEIGHT
+            draw_ledger_row(pdf, y, zip(cells, widths, aligns), fill=None)
+        for txn_type, amount in subtotal.items():
+            grand[txn_type] += amount
+
+        x = pdf.margin
+        for width in [0] + widths:
+            x += width
+            pdf.line(x, y, x, top)
+
+        y -= PDF_ROW_HEIGHT
+        summary_row(y, "Page total", subtotal)
+        if last:
+            y -= PDF_ROW_HEIGHT
+            summary_row(y, "Grand total", grand)
+        pdf.show_page()
+
+    try:
+        page = []
+        for rows in export_rows(conn, columns, start_date, end_date, progress,
+                                chunk_size=rows_per_page * 25):
+            for row in rows:
+                if len(page) == rows_per_page:
+                    draw_page(page, last=False)
+                    page = []
+                page.append(row)
+        draw_page(page, last=True)
+    except BaseException:
+        pdf.abort()
+        raise
+    pdf.close()
+    return pdf.page_count
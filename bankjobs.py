@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+
+import bankmetrics
+
+POLL_MS = 50
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, fn, args, on_done, on_error, on_progress, on_cancel):
+        self.fn = fn
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.cancel_event = threading.Event()
+        self.executor = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+    def progress(self, done, total=None, message=""):
+        # Called from the worker; doubles as a cancellation point so long
+        # loops only need one call per chunk.
+        self.check_cancelled()
+        if self.on_progress:
+            self.executor.post(self.on_progress, done, total, message)
+
+
+# Runs database / export work on worker threads, each holding its own pooled
+# connection for as long as it runs. Job functions are called as
+# fn(job, conn, *args) on a worker; their done / error / progress / cancel
+# callbacks always run on the Tk thread. Workers only enqueue callbacks and
+# root.after drains the queue, since Tk must never be touched from another
+# thread.
+#
+# Interactive jobs (history pages, searches, charts) have a worker of their
+# own, so they are never stuck behind long exports or imports holding the
+# other workers.
+class JobExecutor:
+    def __init__(self, root, pool, workers=2):
+        self.root = root
+        self.pool = pool
+        self.jobs = queue.Queue()
+        self.interactive = queue.Queue()
+        self.callbacks = queue.Queue()
+        self.threads = []
+        lanes = [(f"bank-worker-{i}", self.jobs) for i in range(workers)]
+        lanes.append(("bank-interactive", self.interactive))
+        for name, jobs in lanes:
+            thread = threading.Thread(target=self.work, args=(jobs,), name=name, daemon=True)
+            thread.start()
+            self.threads.append((thread, jobs))
+        self.root.after(POLL_MS, self.drain)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_progress=None, on_cancel=None,
+               interactive=False):
+        job = Job(fn, args, on_done, on_error, on_progress, on_cancel)
+        job.executor = self
+        (self.interactive if interactive else self.jobs).put(job)
+        return job
+
+    def post(self, callback, *args):
+        self.callbacks.put((callback, args))
+
+    def work(self, jobs):
+        conn = self.pool.connection()
+        try:
+            while True:
+                job = jobs.get()
+                if job is None:
+                    break
+                self.run(job, conn)
+        finally:
+            self.pool.release()
+
+    def run(self, job, conn):
+        start = time.perf_counter()
+        try:
+            job.check_cancelled()
+            result = job.fn(job, conn, *job.args)
+        except Cancelled:
+            conn.rollback()
+            if job.on_cancel:
+                self.post(job.on_cancel)
+        except Exception as e:
+            conn.rollback()
+            if job.on_error:
+                self.post(job.on_error, e)
+        else:
+            if job.on_done:
+                self.post(job.on_done, result)
+        finally:
+            bankmetrics.record("job", job.fn.__name__, time.perf_counter() - start)
+
+    def drain(self):
+        # Reschedule first so a failing callback can't stop the pump
+        self.root.after(POLL_MS, self.drain)
+        while True:
+            try:
+                callback, args = self.callbacks.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+
+    def shutdown(self):
+        for _, jobs in self.threads:
+            jobs.put(None)
@@ -0,0 +1,340 @@
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Opt-in instrumentation for "it's slow" reports from a counter. Off by
+# default and free when off: nothing is wrapped until enable() runs, which
+# the GUI and the server do for --metrics or BANKINGSOFT_METRICS=1.
+#
+# When on, every SQL statement run through a bankpool connection, every
+# BankingApp method, every background job and the Tk event loop's lag are
+# timed into latency histograms (with row counts for SQL). Statements over
+# SLOW_QUERY_SECONDS are kept with their EXPLAIN QUERY PLAN, and event-loop
+# stalls over STALL_SECONDS with the handler that caused them. A snapshot of
+# it all is appended to a size-rotated JSON-lines file every
+# SNAPSHOT_INTERVAL seconds and at exit, for collecting from each counter.
+ENV_FLAG = "BANKINGSOFT_METRICS"
+METRICS_FILE = "metrics.jsonl"
+METRICS_FILE_BYTES = 5 * 2**20
+METRICS_FILE_BACKUPS = 5
+SNAPSHOT_INTERVAL = 60.0
+SLOW_QUERY_SECONDS = 0.1
+STALL_SECONDS = 0.25
+STALL_TICK_MS = 100
+RECENT_EVENTS = 50
+# Upper bounds of the histogram buckets, in seconds; one more catches the rest
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# "IN (?, ?, ?)" of any length is one statement
+PLACEHOLDER_LIST = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, seconds, rows=0):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+
+    def percentile(self, fraction):
+        # The upper bound of the bucket holding that share of calls
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "p99_ms": round(self.percentile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+            "buckets": self.buckets,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self.started = time.time()
+        self.log = None
+        # Stalls already put down to a handler, so the event loop watch
+        # doesn't report the same freeze again
+        self.handler_stalls = 0
+
+    def record(self, kind, name, seconds, rows=0):
+        with self.lock:
+            histogram = self.histograms.get((kind, name))
+            if histogram is None:
+                histogram = self.histograms[(kind, name)] = Histogram()
+            histogram.add(seconds, rows)
+
+    def event(self, kind, **fields):
+        event = {"time": datetime.now().isoformat(timespec="milliseconds"), "type": kind, **fields}
+        with self.lock:
+            self.events.append(event)
+        self.write(event)
+
+    def snapshot(self):
+        with self.lock:
+            histograms = [{"kind": kind, "name": name, **histogram.summary()}
+                          for (kind, name), histogram in self.histograms.items()]
+            events = list(self.events)
+        histograms.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "type": "snapshot",
+            "uptime_s": round(time.time() - self.started),
+            "histograms": histograms,
+            "recent": events,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.events.clear()
+            self.started = time.time()
+
+    def write(self, record):
+        if self.log:
+            self.log.info(json.dumps({"host": socket.gethostname(), "pid": os.getpid(), **record}, default=str))
+
+
+metrics = Metrics()
+_enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def requested(flag=False):
+    # --metrics, or the environment variable for counters started by a shortcut
+    return flag or os.environ.get(ENV_FLAG, "") not in ("", "0")
+
+
+def enable(path=METRICS_FILE):
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    log = logging.getLogger("bankingsoft.metrics")
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=METRICS_FILE_BYTES,
+                                                   backupCount=METRICS_FILE_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    metrics.log = log
+    threading.Thread(target=write_snapshots, name="bank-metrics", daemon=True).start()
+    atexit.register(write_snapshot)
+
+
+def write_snapshot():
+    metrics.write(metrics.snapshot())
+
+
+def write_snapshots():
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        write_snapshot()
+
+
+def record(kind, name, seconds, rows=0):
+    if _enabled:
+        metrics.record(kind, name, seconds, rows)
+
+
+# SQL. bankpool opens its connections with InstrumentedConnection as the
+# factory once metrics are on; its cursors time each statement from
+# execute until its rows are fetched (or the cursor is dropped), and count
+# the rows fetched, or changed for DML.
+def statement_name(sql):
+    return PLACEHOLDER_LIST.sub("(?, ...)", " ".join(sql.split()))[:200]
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    pending = None
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.pending = [sql, parameters, time.perf_counter() - start, 0]
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # The parameters are consumed, so a slow one is logged without a plan
+            self.pending = [sql, None, time.perf_counter() - start, 0]
+
+    def fetched(self, start, rows, exhausted):
+        if self.pending:
+            self.pending[2] += time.perf_counter() - start
+            self.pending[3] += rows
+            if exhausted:
+                self.finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(start, 0 if row is None else 1, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self.fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(start, len(rows), True)
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        # A garbage collection pass can run this on a thread that is inside
+        # record() or snapshot() holding the lock, so a finalizer never waits
+        # for it: the statement goes unrecorded instead
+        if self.pending is None or not metrics.lock.acquire(blocking=False):
+            return
+        metrics.lock.release()
+        try:
+            self.finish()
+        except Exception:
+            pass
+
+    def finish(self):
+        if self.pending is None:
+            return
+        sql, parameters, seconds, rows = self.pending
+        self.pending = None
+        if not rows and self.rowcount > 0:
+            rows = self.rowcount
+        metrics.record("sql", statement_name(sql), seconds, rows)
+        if seconds >= SLOW_QUERY_SECONDS:
+            metrics.event("slow_query", sql=statement_name(sql), ms=round(seconds * 1000, 1), rows=rows,
+                          plan=query_plan(self.connection, sql, parameters))
+
+
+def query_plan(conn, sql, parameters):
+    # On a plain cursor, so explaining isn't itself timed
+    if parameters is None:
+        return None
+    try:
+        return [row[3] for row in sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+    except sqlite3.Error as e:
+        return [f"no plan: {e}"]
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            metrics.record("sql", "COMMIT", time.perf_counter() - start)
+
+
+def connection_factory():
+    return InstrumentedConnection if _enabled else sqlite3.Connection
+
+
+# GUI. Handlers run on the Tk thread, so one that runs past STALL_SECONDS
+# froze the window for that long and is reported as a stall by name; the
+# outermost one only, as the handlers call each other.
+_ui_depth = 0
+
+
+def timed(kind, name, fn):
+    def call(*args, **kwargs):
+        global _ui_depth
+        start = time.perf_counter()
+        _ui_depth += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _ui_depth -= 1
+            seconds = time.perf_counter() - start
+            metrics.record(kind, name, seconds)
+            if kind == "ui" and not _ui_depth and seconds >= STALL_SECONDS:
+                metrics.handler_stalls += 1
+                metrics.event("stall", handler=name, ms=round(seconds * 1000, 1))
+    call.__name__ = getattr(fn, "__name__", name)
+    return call
+
+
+def instrument_methods(obj, kind="ui"):
+    # Shadows obj's public methods with timed ones on the instance itself,
+    # so commands and bindings made afterwards pick the timed ones up
+    cls = type(obj)
+    for name in dir(cls):
+        if not name.startswith("_") and callable(getattr(cls, name)):
+            setattr(obj, name, timed(kind, f"{cls.__name__}.{name}", getattr(obj, name)))
+
+
+class StallWatch:
+    # Ticks every STALL_TICK_MS and records how late each tick ran: the
+    # event loop's lag, whatever kept it busy (a handler, a redraw, a
+    # long after() callback)
+    def __init__(self, root):
+        self.root = root
+        self.expected = time.perf_counter() + STALL_TICK_MS / 1000
+        self.handler_stalls = metrics.handler_stalls
+        self.root.after(STALL_TICK_MS, self.tick)
+
+    def tick(self):
+        now = time.perf_counter()
+        lag = max(now - self.expected, 0.0)
+        metrics.record("tk", "event loop lag", lag)
+        if lag >= STALL_SECONDS and metrics.handler_stalls == self.handler_stalls:
+            metrics.event("stall", handler=None, ms=round(lag * 1000, 1))
+        self.handler_stalls = metrics.handler_stalls
+        self.expected = now + STALL_TICK_MS / 1000
+        self.root.after(STALL_TICK_MS, self.tick)
@@ -0,0 +1,110 @@
+import re
+
+# Amounts are stored and computed as whole paise (1 rupee = 100 paise) in
+# plain integers, so sums and balance updates are exact and SQLite adds
+# them with integer arithmetic. Rupees only appear at the edges: parsing
+# what the user typed and formatting what is shown or exported.
+PAISE_PER_RUPEE = 100
+CURRENCY = "₹"
+
+AMOUNT_PATTERN = re.compile(r"([+-]?)(\d{0,15})(?:\.(\d{1,2}))?")
+# Same rule for a whole column of strings at once (CSV import)
+AMOUNT_COLUMN_PATTERN = r"^([+-]?)(\d{0,15})(?:\.(\d{1,2}))?$"
+
+
+def parse_amount(text):
+    # "1,234.5" -> 123450. Parsed digit by digit, never through float, and
+    # anything finer than a paisa is rejected rather than rounded.
+    match = AMOUNT_PATTERN.fullmatch(str(text).strip().replace(",", ""))
+    if not match or not (match.group(2) or match.group(3)):
+        raise ValueError(f"Invalid amount: {text}")
+    sign, rupees, paise = match.groups()
+    value = int(rupees or 0) * PAISE_PER_RUPEE + int((paise or "").ljust(2, "0"))
+    return -value if sign == "-" else value
+
+
+def parse_amounts(texts):
+    # Vectorised parse_amount over a pandas Series of strings. Returns a
+    # nullable Int64 Series of paise, <NA> where the text is not an amount.
+    parts = texts.str.strip().str.replace(",", "", regex=False).str.extract(AMOUNT_COLUMN_PATTERN)
+    valid = parts[1].notna() & ((parts[1] != "") | parts[2].notna())
+    rupees = parts[1].where(valid & (parts[1] != ""), "0").astype("int64")
+    paise = parts[2].fillna("").str.ljust(2, "0").where(valid, "0").astype("int64")
+    value = rupees * PAISE_PER_RUPEE + paise
+    value = value.where(parts[0] != "-", -value)
+    return value.astype("Int64").where(valid)
+
+
+def format_amount(paise, grouping=True, symbol=""):
+    if paise is None:
+        return ""
+    rupees, fraction = divmod(abs(paise), PAISE_PER_RUPEE)
+    sign = "-" if paise < 0 else ""
+    if grouping:
+        return f"{sign}{symbol}{rupees:,}.{fraction:02d}"
+    return f"{sign}{symbol}{rupees}.{fraction:02d}"
+
+
+def format_amounts(values, grouping=True, symbol=""):
+    # format_amount over a whole column (a Treeview page, an export chunk)
+    # with the template bound once instead of rebuilt per value.
+    template = ("{}" + symbol + ("{:,}" if grouping else "{}") + ".{:02d}").format
+    formatted = []
+    append = formatted.append
+    for paise in values:
+        if paise is None:
+            append("")
+        elif paise < 0:
+            append(template("-", *divmod(-paise, PAISE_PER_RUPEE)))
+        else:
+            append(template("", *divmod(paise, PAISE_PER_RUPEE)))
+    return formatted
+
+
+def to_rupees(paise):
+    # Float rupees, for charts and spreadsheets only; never for arithmetic
+    return None if paise is None else paise / PAISE_PER_RUPEE
+
+
+class Money(int):
+    # A paise amount that prints as rupees. It is an int, so it can be
+    # summed, compared and bound to SQL parameters as-is; adding or
+    # subtracting another int keeps it Money.
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, text):
+        return cls(parse_amount(text))
+
+    @property
+    def rupees(self):
+        return to_rupees(int(self))
+
+    def __add__(self, other):
+        result = int.__add__(self, other)
+        return result if result is NotImplemented else Money(result)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        result = int.__sub__(self, other)
+        return result if result is NotImplemented else Money(result)
+
+    def __rsub__(self, other):
+        result = int.__rsub__(self, other)
+        return result if result is NotImplemented else Money(result)
+
+    def __neg__(self):
+        return Money(-int(self))
+
+    def __abs__(self):
+        return Money(abs(int(self)))
+
+    def __str__(self):
+        return format_amount(self, symbol=CURRENCY)
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __repr__(self):
+        return f"Money({format_amount(self, grouping=False)!r})"
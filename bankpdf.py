@@ -0,0 +1,226 @@
+import os
+import re
+import shutil
+import tempfile
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+# A reportlab canvas holds every finished page until save(), so long
+# documents are saved as parts of this many pages and joined at the end
+PAGES_PER_PART = 250
+# TrueType fonts used instead of Helvetica when one is installed, so names
+# outside Latin-1 print as themselves: (regular, bold) paths, first found wins
+UNICODE_FONTS = [
+    (r"C:\Windows\Fonts\Nirmala.ttf", r"C:\Windows\Fonts\NirmalaB.ttf"),
+    (r"C:\Windows\Fonts\arial.ttf", r"C:\Windows\Fonts\arialbd.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+]
+
+
+def ledger_fonts():
+    # F1 / F2 -> registered reportlab font names
+    for regular, bold in UNICODE_FONTS:
+        if os.path.exists(regular) and os.path.exists(bold):
+            try:
+                for name, path in (('Ledger', regular), ('Ledger-Bold', bold)):
+                    if name not in pdfmetrics.getRegisteredFontNames():
+                        pdfmetrics.registerFont(TTFont(name, path))
+                return {'F1': 'Ledger', 'F2': 'Ledger-Bold'}
+            except Exception:
+                continue
+    return FONTS
+
+
+# Long documents drawn a page at a time on a reportlab canvas: the caller
+# lays out each page with the primitives below and calls show_page. Every
+# PAGES_PER_PART pages the canvas is saved to a part file beside the
+# output and a new one started; close() joins the parts, so memory holds
+# one part whatever the length of the document.
+class LedgerCanvas:
+    def __init__(self, filename, page_size, title="", pages_per_part=PAGES_PER_PART):
+        self.filename = filename
+        self.page_size = page_size
+        self.title = title
+        self.pages_per_part = pages_per_part
+        self.directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(filename)))
+        self.parts = []
+        self.fonts = ledger_fonts()
+        self.char_widths = {name: {} for name in self.fonts}
+        self.page_count = 0
+        self.new_part()
+
+    def new_part(self):
+        self.parts.append(os.path.join(self.directory, f"part_{len(self.parts):05d}.pdf"))
+        self.canvas = canvas.Canvas(self.parts[-1], pagesize=self.page_size, pageCompression=1)
+        self.canvas.setTitle(self.title)
+        self.canvas.setCreator("Data Click Education")
+        self.part_pages = 0
+        # The canvas writes out every font and colour change, so they are
+        # only made when they differ; a page holds thousands of cells
+        self.font = self.fill = None
+
+    def set_font(self, font, size):
+        if self.font != (font, size):
+            self.canvas.setFont(self.fonts[font], size)
+            self.font = (font, size)
+
+    def set_fill(self, color):
+        if self.fill != color:
+            self.canvas.setFillColorRGB(*color)
+            self.fill = color
+
+    # Drawing, in PDF points with the origin at the bottom left
+    def fill_rect(self, x, y, width, height, color):
+        self.set_fill(color)
+        self.canvas.rect(x, y, width, height, stroke=0, fill=1)
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.canvas.setLineWidth(width)
+        self.canvas.line(x1, y1, x2, y2)
+
+    def text_width(self, text, font, size):
+        # Per-character widths are memoised; stringWidth is far too slow to
+        # call for every cell of a million-row ledger.
+        widths = self.char_widths[font]
+        total = 0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                width = widths[char] = pdfmetrics.stringWidth(char, self.fonts[font], 1000)
+            total += width
+        return total * size / 1000
+
+    def text(self, x, y, text, font='F1', size=8, color=(0, 0, 0), align='left'):
+        self.set_font(font, size)
+        self.set_fill(color)
+        if align == 'right':
+            self.canvas.drawRightString(x, y, text)
+        elif align == 'center':
+            self.canvas.drawCentredString(x, y, text)
+        else:
+            self.canvas.drawString(x, y, text)
+
+    def show_page(self):
+        self.canvas.showPage()
+        self.page_count += 1
+        self.part_pages += 1
+        self.font = self.fill = None
+        if self.part_pages == self.pages_per_part:
+            self.canvas.save()
+            self.new_part()
+
+    def close(self):
+        try:
+            if self.part_pages or len(self.parts) == 1:
+                self.canvas.save()
+            else:
+                # Nothing was drawn since the last part was saved
+                self.parts.pop()
+            concatenate(self.parts, self.filename)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def abort(self):
+        # A cancelled or failed document leaves no file behind
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# Joining PDFs written by reportlab. Each part's objects are copied across
+# renumbered, its pages hung under one page tree, and only its catalog,
+# page tree and info dictionaries left behind; stream data is copied as
+# is. Only reportlab's own output is read, which always has a plain xref
+# table and escapes parentheses in strings.
+REFERENCE = re.compile(rb"\((?:\\.|[^\\()])*\)|(\d+) 0 R")
+
+
+def read_objects(data):
+    # {object number: bytes between "n 0 obj" and "endobj"}, and the trailer
+    xref = int(re.search(rb"startxref\s+(\d+)", data[-1024:]).group(1))
+    table, trailer = data[xref:].split(b"trailer", 1)
+    offsets = {}
+    lines = table.split(b"\n")
+    start = int(lines[1].split()[0])
+    for number, line in enumerate(lines[2:], start):
+        if line.strip().endswith(b"n"):
+            offsets[number] = int(line[:10])
+    # Objects are written one after another, each ending where the next starts
+    starts = sorted(offsets.values())
+    ends = dict(zip(starts, starts[1:] + [xref]))
+    objects = {}
+    for number, offset in offsets.items():
+        body = data[offset:ends[offset]].split(b" obj", 1)[1]
+        objects[number] = body[:body.rindex(b"endobj")].strip()
+    return objects, trailer
+
+
+def reference(dictionary, key):
+    return int(re.search(key + rb"\s+(\d+) 0 R", dictionary).group(1))
+
+
+def page_tree(objects, node):
+    # The page tree's node numbers and its pages in order
+    kids = re.search(rb"/Kids\s*\[([^\]]*)\]", objects[node])
+    if not kids:
+        return [], [node]
+    nodes, pages = [node], []
+    for kid in re.findall(rb"(\d+) 0 R", kids.group(1)):
+        kid_nodes, kid_pages = page_tree(objects, int(kid))
+        nodes += kid_nodes
+        pages += kid_pages
+    return nodes, pages
+
+
+def renumber(body, numbers):
+    # References outside strings, in the dictionary part only
+    split = re.search(rb">>\s*stream\r?\n", body)
+    head, tail = (body[:split.start()], body[split.start():]) if split else (body, b"")
+    head = REFERENCE.sub(lambda m: m.group(0) if m.group(1) is None
+                         else b"%d 0 R" % numbers[int(m.group(1))], head)
+    return head + tail
+
+
+def concatenate(parts, filename):
+    # 1 is the catalog, 2 the page tree and 3 the info of the joined file
+    offsets = {}
+    kids = []
+    info = None
+    next_number = 4
+    with open(filename, "wb") as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+        def write(number, body):
+            offsets[number] = out.tell()
+            out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        for part in parts:
+            with open(part, "rb") as f:
+                objects, trailer = read_objects(f.read())
+            catalog = reference(trailer, rb"/Root")
+            nodes, pages = page_tree(objects, reference(objects[catalog], rb"/Pages"))
+            left_out = set(nodes) | {catalog, reference(trailer, rb"/Info")}
+            numbers = {node: 2 for node in nodes}
+            for number in objects:
+                if number not in left_out:
+                    numbers[number] = next_number
+                    next_number += 1
+            for number, body in objects.items():
+                if number not in left_out:
+                    write(numbers[number], renumber(body, numbers))
+            kids += [numbers[page] for page in pages]
+            if info is None:
+                info = objects[reference(trailer, rb"/Info")]
+
+        write(2, b"<< /Type /Pages /Count %d /Kids [ %s ] >>"
+              % (len(kids), b" ".join(b"%d 0 R" % kid for kid in kids)))
+        write(1, b"<< /Type /Catalog /Pages 2 0 R /PageMode /UseNone >>")
+        write(3, info or b"<< >>")
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % next_number)
+        for number in range(1, next_number):
+            out.write(b"%010d 00000 n \n" % offsets[number])
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R /Info 3 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                  % (next_number, xref))
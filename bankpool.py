@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+import bankdb
+import bankmetrics
+
+# Applied to every pooled connection. WAL lets readers run alongside the
+# writer and, with synchronous=NORMAL, a commit only appends to the WAL
+# instead of forcing a full fsync of the database file; a power cut can lose
+# the last commits but never corrupts the file.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",   # 256 MiB
+    "PRAGMA cache_size=-65536",     # 64 MiB
+    "PRAGMA temp_store=MEMORY",
+]
+BUSY_TIMEOUT = 5.0
+# Prepared statements kept per connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+
+def open_connection(path=bankdb.DB_PATH):
+    # The pool, not sqlite3, makes sure only one thread uses a connection at
+    # a time, so a released connection can move to another thread.
+    # uri lets bankarchive attach its yearly files read-only (file:...?mode=ro);
+    # a plain path opens as before. With metrics on, every statement is timed.
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+                           check_same_thread=False, uri=True, factory=bankmetrics.connection_factory())
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# Hands every thread its own tuned connection. A thread keeps the connection
+# it was given until it releases it; released connections are reused by the
+# next thread that asks instead of being reopened, keeping their page cache
+# and prepared statements.
+class ConnectionPool:
+    def __init__(self, path=bankdb.DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.idle = []
+        self.all = []
+        conn = self.connection()
+        bankdb.migrate(conn)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                # Opened without the lock held: connecting can wait on a busy file
+                conn = open_connection(self.path)
+                with self.lock:
+                    self.all.append(conn)
+            self.local.conn = conn
+        return conn
+
+    def release(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            return
+        self.local.conn = None
+        conn.rollback()
+        with self.lock:
+            self.idle.append(conn)
+
+    def close(self):
+        # Only safe once no other thread is using the pool
+        with self.lock:
+            connections, self.all, self.idle = self.all, [], []
+        for conn in connections:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        self.local = threading.local()
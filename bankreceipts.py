@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+
+import bankarchive
+import bankdb
+import bankmoney
+import bankpdf
+
+RECEIPTS_PER_TASK = 50
+RECEIPT_FILTER_COLUMNS = ['transaction_type', 'transaction_mode', 'bank_name',
+                          'customer_name', 'account_number']
+
+_styles = None
+
+
+def receipt_styles():
+    # The sample stylesheet and table style are built once per process and
+    # shared by every receipt rendered in it.
+    global _styles
+    if _styles is None:
+        styles = getSampleStyleSheet()
+        styles.add(ParagraphStyle(name='ShopStyle',
+                                  fontSize=18,
+                                  textColor=colors.HexColor('#e74c3c'),
+                                  alignment=1,
+                                  spaceAfter=20))
+        table_style = TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#4F81BD')),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0,0), (-1,0), 12),
+            ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+            ('GRID', (0,0), (-1,-1), 1, colors.black)
+        ])
+        _styles = (styles, table_style)
+    return _styles
+
+
+def receipt_elements(transaction):
+    styles, table_style = receipt_styles()
+    data = [
+        ["Transaction No:", transaction[7]],
+        ["Date:", transaction[1]],
+        ["Customer Name:", transaction[2]],
+        ["Account No:", transaction[3]],
+        ["IFSC Code:", transaction[4]],
+        ["Amount:", str(bankmoney.Money(transaction[11]))],
+        ["Transaction Type:", transaction[8]],
+        ["Mode:", transaction[9]],
+        ["Bank:", transaction[10] if transaction[10] else "N/A"]
+    ]
+    table = Table(data)
+    table.setStyle(table_style)
+    return [
+        Paragraph("Data Click Education", styles['ShopStyle']),
+        Paragraph("Bank Receipt", styles['Title']),
+        Spacer(1, 12),
+        table,
+    ]
+
+
+def build_receipt(transaction, filename):
+    SimpleDocTemplate(filename, pagesize=letter).build(receipt_elements(transaction))
+
+
+def build_combined(transactions, filename):
+    # Process pool task too: one chunk of a combined PDF
+    elements = []
+    for transaction in transactions:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(receipt_elements(transaction))
+    SimpleDocTemplate(filename, pagesize=letter).build(elements)
+    return len(transactions)
+
+
+def receipt_filename(transaction):
+    txn_no = re.sub(r'[^A-Za-z0-9_-]', '_', str(transaction[7] or ''))
+    return f"receipt_{transaction[0]:06d}_{txn_no}.pdf"
+
+
+def build_receipt_files(transactions, directory):
+    # Process pool task: one chunk of receipts, one file each
+    for transaction in transactions:
+        build_receipt(transaction, os.path.join(directory, receipt_filename(transaction)))
+    return len(transactions)
+
+
+def select_receipts(conn, sr_nos=None, start_date=None, end_date=None, filters=None):
+    conditions = []
+    params = []
+    if sr_nos:
+        conditions.append(f"sr_no IN ({', '.join('?' * len(sr_nos))})")
+        params += list(sr_nos)
+    if start_date and end_date:
+        conditions.append("date >= ? AND date < ?")
+        params += bankdb.date_bounds(start_date, end_date)
+    for column, value in (filters or {}).items():
+        if column not in RECEIPT_FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter receipts by {column}")
+        conditions.append(f"{column} = ?")
+        params.append(value)
+    # A date range also covers the archived years it reaches
+    query = "SELECT * FROM " + (bankarchive.source(conn, start_date, end_date)
+                                if start_date and end_date else "transactions")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return conn.execute(query + " ORDER BY sr_no", params).fetchall()
+
+
+def batch_receipts(conn, output, combined=False, sr_nos=None, start_date=None, end_date=None,
+                   filters=None, workers=None, progress=None):
+    # Receipts for a selection (sr_nos), a date range and/or column filters,
+    # rendered in parallel across a process pool a chunk at a time. combined
+    # writes one PDF with a receipt per page to output: each chunk becomes a
+    # part file and the parts are joined in order at the end. Otherwise
+    # output is a directory that gets one file per receipt. Returns the
+    # number of receipts.
+    transactions = select_receipts(conn, sr_nos, start_date, end_date, filters)
+    if not transactions:
+        return 0
+
+    chunks = [transactions[i:i + RECEIPTS_PER_TASK]
+              for i in range(0, len(transactions), RECEIPTS_PER_TASK)]
+    if combined:
+        parts = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output)))
+        tasks = [(build_combined, chunk, os.path.join(parts, f"part_{i:05d}.pdf"))
+                 for i, chunk in enumerate(chunks)]
+    else:
+        os.makedirs(output, exist_ok=True)
+        tasks = [(build_receipt_files, chunk, output) for chunk in chunks]
+    try:
+        done = render(tasks, len(transactions), workers, progress)
+        if combined:
+            bankpdf.concatenate([path for _, _, path in tasks], output)
+    finally:
+        if combined:
+            shutil.rmtree(parts, ignore_errors=True)
+    return done
+
+
+def render(tasks, total, workers=None, progress=None):
+    # Runs (fn, chunk, path) tasks on the pool, reporting each chunk as it
+    # finishes; progress is also where a cancel lands, between chunks
+    done = 0
+    if progress:
+        progress(0, total, f"Rendering {total:,} receipts")
+    # spawn rather than fork: the GUI process has Tk and worker threads
+    # that must not be duplicated into the children
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(fn, chunk, path) for fn, chunk, path in tasks]
+        try:
+            for future in futures:
+                done += future.result()
+                if progress:
+                    progress(done, total, f"Rendered {done:,} of {total:,} receipts")
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return done
@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+
+import bankarchive
+import bankdb
+
+# Every report is a single parameterized query that does its aggregation in
+# SQLite (mostly over daily_rollup, which already holds per-day sums), and
+# returns (columns, rows) ready to show. :start and :end are the half-open
+# date bounds from bankdb.date_bounds; {transactions} is replaced by the
+# partitions the range needs (see bankarchive). Amount columns are paise.
+REPORTS = {
+    "summary": ("Summary", """
+        SELECT transaction_type, transaction_mode, SUM(amount) AS amount, SUM(count) AS count
+        FROM daily_rollup
+        WHERE day >= :start AND day < :end
+        GROUP BY transaction_type, transaction_mode
+        ORDER BY transaction_type, transaction_mode"""),
+    "by_type": ("Totals by Type", """
+        SELECT transaction_type, SUM(amount) AS amount, SUM(count) AS count
+        FROM daily_rollup
+        WHERE day >= :start AND day < :end
+        GROUP BY transaction_type
+        ORDER BY transaction_type"""),
+    "daily_totals": ("Daily Totals", """
+        SELECT day,
+               SUM(CASE WHEN transaction_type = 'Deposit' THEN amount ELSE 0 END) AS deposits,
+               SUM(CASE WHEN transaction_type = 'Withdrawal' THEN amount ELSE 0 END) AS withdrawals,
+               SUM(count) AS count
+        FROM daily_rollup
+        WHERE day >= :start AND day < :end
+        GROUP BY day
+        ORDER BY day"""),
+    "by_bank": ("Totals by Bank", """
+        SELECT CASE WHEN bank_name = '' THEN 'Cash' ELSE bank_name END AS bank,
+               SUM(CASE WHEN transaction_type = 'Deposit' THEN amount ELSE 0 END) AS deposits,
+               SUM(CASE WHEN transaction_type = 'Withdrawal' THEN amount ELSE 0 END) AS withdrawals,
+               SUM(count) AS count
+        FROM daily_rollup
+        WHERE day >= :start AND day < :end
+        GROUP BY bank_name
+        ORDER BY bank_name"""),
+    "top_customers": ("Top Customers", """
+        SELECT customer_name, account_number, COUNT(*) AS count, SUM(amount) AS amount
+        FROM {transactions}
+        WHERE date >= :start AND date < :end
+        GROUP BY customer_name, account_number
+        ORDER BY SUM(amount) DESC
+        LIMIT 50"""),
+    "detailed": ("Detailed", """
+        SELECT * FROM {transactions}
+        WHERE date >= :start AND date < :end
+        ORDER BY date, sr_no"""),
+}
+MONEY_COLUMNS = {"amount", "deposits", "withdrawals", "net"}
+REPORT_CACHE_SIZE = 32
+# Bigger results (a long detailed report) are recomputed instead of held
+REPORT_CACHE_MAX_ROWS = 10000
+
+
+# Cash flow over time for the charts: deposits, withdrawals and net flow per
+# day, week (from Monday) or month, one series per mode or bank if asked.
+# A range with more buckets than the chart has room for is drawn at the
+# next coarser bucket instead, so a five-year chart is a few hundred points
+# whatever the number of transactions.
+FLOW_BUCKETS = {
+    "day": ("day", 1),
+    "week": ("date(day, '-6 days', 'weekday 1')", 7),
+    "month": ("substr(day, 1, 8) || '01'", 30.44),
+}
+FLOW_SERIES = {
+    "total": "'Total'",
+    "mode": "transaction_mode",
+    "bank": "CASE WHEN bank_name = '' THEN 'Cash' ELSE bank_name END",
+}
+FLOW_COLUMNS = ["period", "series", "deposits", "withdrawals", "net"]
+# About one point per two pixels of a full-width chart
+CHART_POINTS = 500
+
+
+def flow_bucket(start_date, end_date, bucket="day", points=CHART_POINTS):
+    # The requested bucket, or the finest coarser one that fits in points
+    days = (end_date - start_date).days + 1
+    names = list(FLOW_BUCKETS)
+    for name in names[names.index(bucket):]:
+        if days / FLOW_BUCKETS[name][1] <= points:
+            return name
+    return names[-1]
+
+
+def run_flow(conn, start_date, end_date, bucket, series):
+    period = FLOW_BUCKETS[bucket][0]
+    key = FLOW_SERIES[series]
+    start, end = bankdb.date_bounds(start_date, end_date)
+    cursor = conn.execute(f"""
+        SELECT {period} AS period, {key} AS series,
+               SUM(CASE WHEN transaction_type = 'Deposit' THEN amount ELSE 0 END) AS deposits,
+               SUM(CASE WHEN transaction_type = 'Withdrawal' THEN amount ELSE 0 END) AS withdrawals,
+               SUM(CASE WHEN transaction_type = 'Deposit' THEN amount ELSE -amount END) AS net
+        FROM daily_rollup
+        WHERE day >= :start AND day < :end
+        GROUP BY 1, 2
+        ORDER BY 2, 1""", {"start": start, "end": end})
+    return FLOW_COLUMNS, cursor.fetchall()
+
+
+def report_title(name):
+    return REPORTS[name][0]
+
+
+def run_report(conn, name, start_date, end_date):
+    if name not in REPORTS:
+        raise ValueError(f"Unknown report: {name}")
+    start, end = bankdb.date_bounds(start_date, end_date)
+    sql = REPORTS[name][1]
+    if "{transactions}" in sql:
+        sql = sql.format(transactions=bankarchive.source(conn, start_date, end_date))
+    cursor = conn.execute(sql, {"start": start, "end": end})
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+# Results by (database, report, arguments), least recently used dropped
+# first. Each entry remembers the data_version it was computed at and is
+# only served while the database is still at that version, so any write to
+# transactions, from any connection, invalidates every cached report.
+class ReportCache:
+    def __init__(self, size=REPORT_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, conn, name, start_date, end_date):
+        return self.cached(conn, run_report, name, start_date, end_date)
+
+    def flow(self, conn, start_date, end_date, bucket, series):
+        return self.cached(conn, run_flow, start_date, end_date, bucket, series)
+
+    def cached(self, conn, run, *args):
+        # run(conn, *args) -> (columns, rows), or its cached result
+        database = conn.execute("PRAGMA database_list").fetchone()[2]
+        key = (database, run.__name__, *args)
+        version = bankdb.read_data_version(conn.cursor())
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == version:
+                self.entries.move_to_end(key)
+                return entry[1]
+        result = run(conn, *args)
+        if len(result[1]) > REPORT_CACHE_MAX_ROWS:
+            return result
+        with self.lock:
+            self.entries[key] = (version, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+cache = ReportCache()
@@ -0,0 +1,418 @@
+# Local HTTP/JSON API over bank.db so several counters can share one set of
+# books. Reads run concurrently on a thread pool, each thread with its own
+# pooled connection; every write goes through one writer task that applies
+# them in order on a single connection, so counters never contend for
+# SQLite's write lock, and new transactions that queue up behind a commit
+# share the next one (bankwrites). Standard library only.
+#
+#   python bankserver.py [--db bank.db] [--host 127.0.0.1] [--port 8765]
+#   python bankingsoft.py --server http://127.0.0.1:8765
+#
+# Amounts are integer paise and dates ISO strings, in both directions. There
+# is no authentication beyond the users table, so bind to an address only
+# the counters can reach.
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import bankdb
+import bankmetrics
+import bankpool
+import bankreports
+import bankservice
+import bankwrites
+
+DEFAULT_PORT = 8765
+READERS = 4
+MAX_BODY = 1 << 20
+HISTORY_MAX_LIMIT = 1000
+# Writes that don't commit themselves; consecutive ones share a commit
+GROUPED_WRITES = {bankservice.insert_transaction}
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_day(text):
+    if text is None:
+        return None
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise HttpError(400, f"Invalid date: {text}")
+
+
+def parse_int(text, default=None):
+    if text is None:
+        return default
+    try:
+        return int(text)
+    except ValueError:
+        raise HttpError(400, f"Invalid number: {text}")
+
+
+def parse_columns(text):
+    # Only known column names reach the SQL
+    columns = text.split(",") if text else bankservice.TRANSACTION_COLUMNS
+    unknown = [col for col in columns if col not in bankservice.TRANSACTION_COLUMNS]
+    if unknown:
+        raise HttpError(400, f"Unknown columns: {', '.join(unknown)}")
+    return ", ".join(columns)
+
+
+def date_range(params):
+    start_date, end_date = parse_day(params.get("from")), parse_day(params.get("to"))
+    if bool(start_date) != bool(end_date):
+        raise HttpError(400, "from and to must be given together")
+    return (start_date, end_date) if start_date else None
+
+
+def transaction_fields(body):
+    try:
+        return [body[name] for name in bankservice.TRANSACTION_COLUMNS[2:]]
+    except KeyError as e:
+        raise HttpError(400, f"Missing field: {e.args[0]}")
+
+
+class BankServer:
+    def __init__(self, path=bankdb.DB_PATH, readers=READERS):
+        self.pool = bankpool.ConnectionPool(path)
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="bank-reader")
+        # The writer connection lives on its own thread for the server's life
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="bank-writer")
+        self.writes = None
+        self.closed_through = None
+        self.routes = [
+            ("POST", r"/users", self.register_user),
+            ("POST", r"/login", self.login),
+            ("GET", r"/users/([^/]+)/question", self.security_question),
+            ("POST", r"/users/([^/]+)/password", self.reset_password),
+            ("GET", r"/transactions", self.history_page),
+            ("POST", r"/transactions", self.add_transaction),
+            ("GET", r"/transactions/search", self.search_transactions),
+            ("GET", r"/transactions/rows", self.transaction_rows),
+            ("GET", r"/transactions/(\d+)", self.get_transaction),
+            ("PUT", r"/transactions/(\d+)", self.update_transaction),
+            ("DELETE", r"/transactions/(\d+)", self.delete_transaction),
+            ("GET", r"/banks", self.list_banks),
+            ("PUT", r"/banks/([^/]+)", self.set_bank_balance),
+            ("DELETE", r"/banks/([^/]+)", self.delete_bank),
+            ("PUT", r"/cash", self.set_cash),
+            ("POST", r"/close-days", self.close_days),
+            ("GET", r"/dashboard", self.dashboard),
+            ("GET", r"/balances", self.balances_as_of),
+            ("GET", r"/balances/history", self.balance_history),
+            ("GET", r"/reports/daily", self.daily_summary),
+            ("GET", r"/reports/cash-flow", self.cash_flow),
+            ("GET", r"/reports/(\w+)", self.report),
+            ("POST", r"/check", self.check_integrity),
+            ("POST", r"/rollup", self.rebuild_rollup),
+        ]
+        self.routes = [(method, re.compile(pattern + "$"), handler)
+                       for method, pattern, handler in self.routes]
+
+    # Running database calls
+    def run_read(self, fn, *args):
+        return fn(self.pool.connection(), *args)
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, self.run_read, fn, *args)
+
+    async def write(self, fn, *args):
+        # Queued for the writer task; resolves once the write has committed
+        future = asyncio.get_running_loop().create_future()
+        await self.writes.put((fn, args, future))
+        return await future
+
+    def run_write(self, fn, args):
+        conn = self.pool.connection()
+        try:
+            return fn(conn, *args)
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def run_batch(self, batch):
+        return bankwrites.apply_batch(self.pool.connection(), [(fn, args) for fn, args, _ in batch])
+
+    async def write_loop(self):
+        loop = asyncio.get_running_loop()
+        pending = None
+        while True:
+            first = pending or await self.writes.get()
+            pending = None
+            batch = [first]
+            try:
+                if first[0] in GROUPED_WRITES:
+                    # Inserts that queued up while the last commit ran go
+                    # into the next one together; no waiting beyond that
+                    while len(batch) < bankwrites.MAX_BATCH and not self.writes.empty():
+                        write = self.writes.get_nowait()
+                        if write[0] not in GROUPED_WRITES:
+                            pending = write
+                            break
+                        batch.append(write)
+                    outcomes = await loop.run_in_executor(self.writer, self.run_batch, batch)
+                else:
+                    fn, args, _ = first
+                    outcomes = [(True, await loop.run_in_executor(self.writer, self.run_write, fn, args))]
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    # Handlers: (params, body, *path groups) -> JSON-able result; None is a 404
+    async def register_user(self, params, body):
+        try:
+            await self.write(bankservice.register_user, body["username"], body["password"],
+                             body["security_question"], body["security_answer"])
+        except KeyError as e:
+            raise HttpError(400, f"Missing field: {e.args[0]}")
+        return {}
+
+    async def login(self, params, body):
+        return {"ok": await self.read(bankservice.authenticate, body.get("username", ""),
+                                      body.get("password", ""))}
+
+    async def security_question(self, params, body, username):
+        question = await self.read(bankservice.security_question, unquote(username))
+        return question and {"question": question}
+
+    async def reset_password(self, params, body, username):
+        return {"ok": await self.write(bankservice.reset_password, unquote(username),
+                                       body.get("answer", ""), body.get("password", ""))}
+
+    async def history_page(self, params, body):
+        older_than = newer_than = None
+        if "older_date" in params:
+            older_than = (params["older_date"], parse_int(params.get("older_sr_no"), 0))
+        elif "newer_date" in params:
+            newer_than = (params["newer_date"], parse_int(params.get("newer_sr_no"), 0))
+        return await self.read(bankservice.history_page, parse_columns(params.get("columns")),
+                               min(parse_int(params.get("limit"), 100), HISTORY_MAX_LIMIT),
+                               date_range(params), older_than, newer_than)
+
+    async def search_transactions(self, params, body):
+        query = bankdb.search_query(params.get("q", ""))
+        if not query:
+            return []
+        return await self.read(bankservice.search_transactions, parse_columns(params.get("columns")),
+                               query, min(parse_int(params.get("limit"), 300), HISTORY_MAX_LIMIT))
+
+    async def transaction_rows(self, params, body):
+        ids = params.get("ids", "")
+        sr_nos = [parse_int(sr_no) for sr_no in ids.split(",")] if ids else []
+        if len(sr_nos) > HISTORY_MAX_LIMIT:
+            raise HttpError(400, f"At most {HISTORY_MAX_LIMIT} ids")
+        return await self.read(bankservice.transaction_rows, parse_columns(params.get("columns")), sr_nos)
+
+    async def add_transaction(self, params, body):
+        return {"sr_no": await self.write(bankservice.insert_transaction, *transaction_fields(body))}
+
+    async def get_transaction(self, params, body, sr_no):
+        return await self.read(bankservice.get_transaction, int(sr_no))
+
+    async def update_transaction(self, params, body, sr_no):
+        fields = transaction_fields(body)
+        if not await self.read(bankservice.get_transaction, int(sr_no)):
+            return None
+        await self.write(bankservice.update_transaction, int(sr_no), *fields)
+        return {}
+
+    async def delete_transaction(self, params, body, sr_no):
+        return {} if await self.write(bankservice.delete_transaction, int(sr_no)) else None
+
+    async def list_banks(self, params, body):
+        return await self.read(bankservice.list_banks)
+
+    async def set_bank_balance(self, params, body, bank_name):
+        await self.write(bankservice.set_bank_balance, unquote(bank_name), int(body["balance"]))
+        return {}
+
+    async def delete_bank(self, params, body, bank_name):
+        return {} if await self.write(bankservice.delete_bank, unquote(bank_name)) else None
+
+    async def set_cash(self, params, body):
+        await self.write(bankservice.set_cash, int(body["balance"]))
+        return {}
+
+    async def close_days(self, params, body):
+        return {"written": await self.write(bankservice.close_days)}
+
+    async def dashboard(self, params, body):
+        # dashboard() checkpoints ended days itself, which writes; do that on
+        # the writer once a day so the read below finds nothing to write
+        if self.closed_through != date.today():
+            await self.write(bankservice.close_days)
+            self.closed_through = date.today()
+        return await self.read(bankservice.dashboard, parse_day(params.get("closing_day")))
+
+    async def balances_as_of(self, params, body):
+        return await self.read(bankservice.balances_as_of, parse_day(params.get("as_of")) or date.today())
+
+    async def balance_history(self, params, body):
+        start_date, end_date = date_range(params) or (None, None)
+        if not start_date:
+            raise HttpError(400, "from and to are required")
+        return await self.read(bankservice.balance_history, start_date, end_date)
+
+    async def report(self, params, body, name):
+        start_date, end_date = date_range(params) or (None, None)
+        if not start_date:
+            raise HttpError(400, "from and to are required")
+        if name not in bankreports.REPORTS:
+            return None
+        columns, rows = await self.read(bankservice.report, name, start_date, end_date)
+        return {"columns": columns, "rows": rows}
+
+    async def cash_flow(self, params, body):
+        start_date, end_date = date_range(params) or (None, None)
+        if not start_date:
+            raise HttpError(400, "from and to are required")
+        bucket, series = params.get("bucket", "day"), params.get("series", "total")
+        if bucket not in bankreports.FLOW_BUCKETS or series not in bankreports.FLOW_SERIES:
+            raise HttpError(400, f"Unknown bucket or series: {bucket}, {series}")
+        points = parse_int(params.get("points"), bankreports.CHART_POINTS)
+        return await self.read(bankservice.cash_flow, start_date, end_date, bucket, series, points)
+
+    async def daily_summary(self, params, body):
+        return await self.read(bankservice.daily_summary)
+
+    async def check_integrity(self, params, body):
+        return {"problems": await self.write(bankservice.check_integrity, bool(body.get("repair", True)))}
+
+    async def rebuild_rollup(self, params, body):
+        await self.write(bankservice.rebuild_rollup)
+        return {}
+
+    # HTTP
+    async def dispatch(self, method, target, body):
+        parts = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(parts.path)
+            if match:
+                if route_method != method:
+                    allowed = True
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = await handler(params, body, *match.groups())
+                finally:
+                    bankmetrics.record("http", f"{method} {pattern.pattern.rstrip('$')}", time.perf_counter() - start)
+                if result is None:
+                    raise HttpError(404, "Not found")
+                return result
+        raise HttpError(405 if allowed else 404, "Method not allowed" if allowed else "Not found")
+
+    async def respond(self, method, target, body):
+        try:
+            return 200, await self.dispatch(method, target, body)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except sqlite3.IntegrityError as e:
+            return 409, {"error": str(e)}
+        except Exception as e:
+            print(f"{method} {target}: {e!r}", file=sys.stderr)
+            return 500, {"error": "Internal error"}
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 with keep-alive: requests on one connection are answered in order
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, result = 413, {"error": "Request too large"}
+                else:
+                    raw = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw) if raw else {}
+                    except ValueError:
+                        status, result = 400, {"error": "Invalid JSON"}
+                    else:
+                        status, result = await self.respond(method, target, body)
+
+                payload = json.dumps(result, default=str).encode()
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0" \
+                    or length > MAX_BODY
+                writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode()
+                             + payload)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.writes = asyncio.Queue()
+        write_task = asyncio.create_task(self.write_loop())
+        server = await asyncio.start_server(self.handle, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"listening on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            write_task.cancel()
+            self.readers.shutdown()
+            self.writer.shutdown()
+            self.pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="bank.db API server for multiple counters")
+    parser.add_argument("--db", default=bankdb.DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--readers", type=int, default=READERS, help="concurrent read threads")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"time queries and requests into {bankmetrics.METRICS_FILE}")
+    args = parser.parse_args(argv)
+    if bankmetrics.requested(args.metrics):
+        bankmetrics.enable()
+    try:
+        asyncio.run(BankServer(args.db, args.readers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import hashlib
+import re
+from datetime import date, datetime, timedelta
+
+import bankarchive
+import bankdb
+import bankreports
+from bankmoney import format_amount
+
+# Everything the GUI and the command line do to the books, as plain
+# functions over a sqlite3 connection. Nothing here touches Tk, and the
+# modules that pull in pandas / openpyxl / reportlab are imported only by
+# the functions that need them, so scripts that don't export start fast.
+# Amounts are paise throughout (see bankmoney). Writes commit before
+# returning.
+
+IFSC_PATTERN = r"^[A-Z]{4}0[A-Z0-9]{6}$"
+MOBILE_PATTERN = r"^[6-9]\d{9}$"
+TRANSACTION_COLUMNS = [
+    'sr_no', 'date', 'customer_name', 'account_number',
+    'ifsc_code', 'mobile', 'address', 'transaction_no',
+    'transaction_type', 'transaction_mode', 'bank_name', 'amount'
+]
+TRANSACTION_TYPES = ["Deposit", "Withdrawal"]
+TRANSACTION_MODES = ["Cash", "Bank"]
+
+
+def timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def hash_secret(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+# Users
+def register_user(conn, username, password, security_question, security_answer):
+    # Raises sqlite3.IntegrityError if the username is taken
+    conn.execute("INSERT INTO users VALUES (?, ?, ?, ?)",
+                 (username, hash_secret(password), security_question, hash_secret(security_answer)))
+    conn.commit()
+
+
+def authenticate(conn, username, password):
+    return conn.execute("SELECT 1 FROM users WHERE username=? AND password=?",
+                        (username, hash_secret(password))).fetchone() is not None
+
+
+def security_question(conn, username):
+    row = conn.execute("SELECT security_question FROM users WHERE username=?", (username,)).fetchone()
+    return row[0] if row else None
+
+
+def reset_password(conn, username, answer, new_password):
+    # False when the answer doesn't match
+    if not conn.execute("SELECT 1 FROM users WHERE username=? AND security_answer=?",
+                        (username, hash_secret(answer))).fetchone():
+        return False
+    conn.execute("UPDATE users SET password=? WHERE username=?", (hash_secret(new_password), username))
+    conn.commit()
+    return True
+
+
+# Transactions
+def validate_transaction(ifsc_code, mobile, amount):
+    if not re.match(IFSC_PATTERN, ifsc_code):
+        raise ValueError("Invalid IFSC Code")
+    if not re.match(MOBILE_PATTERN, mobile):
+        raise ValueError("Invalid Mobile Number")
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+
+
+def insert_transaction(conn, customer_name, account_number, ifsc_code, mobile, address,
+                       transaction_no, transaction_type, transaction_mode, bank_name, amount):
+    # Returns the new sr_no without committing, for bankwrites to group many
+    # into one commit. The ledger triggers post the balance effect.
+    validate_transaction(ifsc_code, mobile, amount)
+    cursor = conn.execute('''INSERT INTO transactions
+                            (date, customer_name, account_number, ifsc_code, mobile, address,
+                             transaction_no, transaction_type, transaction_mode, bank_name, amount)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                          (timestamp(), customer_name, account_number, ifsc_code, mobile, address,
+                           transaction_no, transaction_type, transaction_mode,
+                           bank_name if transaction_mode == "Bank" else None, amount))
+    return cursor.lastrowid
+
+
+def add_transaction(conn, *fields):
+    try:
+        sr_no = insert_transaction(conn, *fields)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return sr_no
+
+
+def get_transaction(conn, sr_no):
+    # Falls back to the archives for rows of closed years
+    row = conn.execute("SELECT * FROM transactions WHERE sr_no=?", (sr_no,)).fetchone()
+    return row or bankarchive.find_transaction(conn, sr_no)
+
+
+def update_transaction(conn, sr_no, customer_name, account_number, ifsc_code, mobile, address,
+                       transaction_no, transaction_type, transaction_mode, bank_name, amount):
+    try:
+        cursor = conn.execute('''UPDATE transactions SET
+                        date=?,
+                        customer_name=?,
+                        account_number=?,
+                        ifsc_code=?,
+                        mobile=?,
+                        address=?,
+                        transaction_no=?,
+                        transaction_type=?,
+                        transaction_mode=?,
+                        bank_name=?,
+                        amount=?
+                        WHERE sr_no=?''',
+                     (timestamp(), customer_name, account_number, ifsc_code, mobile, address,
+                      transaction_no, transaction_type, transaction_mode,
+                      bank_name if transaction_mode == "Bank" else None, amount, sr_no))
+        if not cursor.rowcount:
+            raise ValueError(f"Transaction {sr_no} is not in the open books; archived years can't be changed")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def delete_transaction(conn, sr_no):
+    deleted = conn.execute("DELETE FROM transactions WHERE sr_no=?", (sr_no,)).rowcount
+    conn.commit()
+    if not deleted and bankarchive.find_transaction(conn, sr_no):
+        raise ValueError(f"Transaction {sr_no} is not in the open books; archived years can't be changed")
+    return deleted > 0
+
+
+def history_page(conn, columns, limit, history_filter=None, older_than=None, newer_than=None):
+    # One page of the history, newest first, by (date, sr_no) keyset:
+    # older_than / newer_than are the keys of the rows at the current edge.
+    # Unfiltered, it pages the open books only; a date filter reaches into
+    # the archived years it covers.
+    conditions = []
+    params = []
+    source = "transactions"
+    if history_filter:
+        start_date, end_date = history_filter
+        conditions.append("date >= ? AND date < ?")
+        params += bankdb.date_bounds(start_date, end_date)
+        source = bankarchive.source(conn, start_date, end_date)
+
+    order = "DESC"
+    if older_than:
+        conditions.append("(date < ? OR (date = ? AND sr_no < ?))")
+        params += [older_than[0], older_than[0], older_than[1]]
+    elif newer_than:
+        conditions.append("(date > ? OR (date = ? AND sr_no > ?))")
+        params += [newer_than[0], newer_than[0], newer_than[1]]
+        order = "ASC"
+
+    query = f"SELECT {columns} FROM {source}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY date {order}, sr_no {order} LIMIT ?"
+    params.append(limit)
+
+    rows = conn.execute(query, params).fetchall()
+    if newer_than:
+        rows.reverse()
+    return rows
+
+
+def transaction_rows(conn, columns, sr_nos):
+    # The given rows, newest first; sr_nos that no longer exist are skipped
+    sr_nos = list(sr_nos)
+    if not sr_nos:
+        return []
+    return conn.execute(f'''SELECT {columns} FROM transactions
+                           WHERE sr_no IN ({", ".join("?" * len(sr_nos))})
+                           ORDER BY date DESC, sr_no DESC''', sr_nos).fetchall()
+
+
+def search_transactions(conn, columns, query, limit):
+    # Newest matches first; the FTS index is walked in rowid order and
+    # stops at the limit, so common prefixes stay cheap
+    return conn.execute(f'''SELECT {columns} FROM transactions
+                           WHERE sr_no IN (SELECT rowid FROM transactions_fts
+                                           WHERE transactions_fts MATCH ?
+                                           ORDER BY rowid DESC LIMIT ?)
+                           ORDER BY date DESC, sr_no DESC''',
+                        (query, limit)).fetchall()
+
+
+# Banks and balances
+def list_banks(conn):
+    return [row[0] for row in conn.execute("SELECT bank_name FROM banks")]
+
+
+def set_bank_balance(conn, bank_name, balance):
+    # Adds the bank if it is new
+    conn.execute("INSERT OR IGNORE INTO banks (bank_name) VALUES (?)", (bank_name,))
+    bankdb.post_adjustment(conn.cursor(), bankdb.bank_account(bank_name), balance)
+    conn.commit()
+
+
+def delete_bank(conn, bank_name):
+    deleted = conn.execute("DELETE FROM banks WHERE bank_name=?", (bank_name,)).rowcount
+    if deleted:
+        # Whatever the bank still held is written off to adjustments
+        bankdb.post_adjustment(conn.cursor(), bankdb.bank_account(bank_name), 0)
+    conn.commit()
+    return deleted > 0
+
+
+def set_cash(conn, cash):
+    bankdb.post_adjustment(conn.cursor(), bankdb.CASH_ACCOUNT, cash)
+    conn.commit()
+
+
+def close_days(conn):
+    # Checkpoints any day that has ended since the last call
+    written = bankdb.close_days(conn.cursor())
+    if written:
+        conn.commit()
+    return written
+
+
+def dashboard(conn, closing_day=None):
+    # Figures for the balance panel, read in one query. closing is the cash
+    # + bank total at close of business on closing_day (default yesterday).
+    close_days(conn)
+    closing_day = closing_day or date.today() - timedelta(days=1)
+    figures = bankdb.read_dashboard(conn.cursor(), closing_day)
+    cash, banks, totals = figures['cash'], figures['banks'], figures['totals']
+    return {
+        'cash': cash,
+        'banks': banks,
+        'total': cash + sum(balance for _, balance in banks),
+        'deposits': totals.get('Deposit', 0),
+        'withdrawals': totals.get('Withdrawal', 0),
+        'closing_day': closing_day,
+        'closing': figures['closing'],
+    }
+
+
+def balances_as_of(conn, day):
+    return bankdb.balances_as_of(conn.cursor(), day)
+
+
+def balance_history(conn, start_date, end_date):
+    return bankdb.balance_history(conn.cursor(), start_date, end_date)
+
+
+# Reports
+def report(conn, name, start_date, end_date):
+    # (columns, rows) of a bankreports report, from the cache while no
+    # transaction has changed since it was computed
+    return bankreports.cache.get(conn, name, start_date, end_date)
+
+
+def summary_report(conn, start_date, end_date):
+    # (type, mode, amount) rows
+    return [row[:3] for row in report(conn, "summary", start_date, end_date)[1]]
+
+
+def cash_flow(conn, start_date, end_date, bucket="day", series="total", points=bankreports.CHART_POINTS):
+    # Chart data, downsampled to at most about points buckets: {'bucket'
+    # actually used, 'columns', 'rows'} with rows (period, series,
+    # deposits, withdrawals, net) ordered by series then period
+    if bucket not in bankreports.FLOW_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    if series not in bankreports.FLOW_SERIES:
+        raise ValueError(f"Unknown series: {series}")
+    bucket = bankreports.flow_bucket(start_date, end_date, bucket, points)
+    columns, rows = bankreports.cache.flow(conn, start_date, end_date, bucket, series)
+    return {'bucket': bucket, 'columns': columns, 'rows': rows}
+
+
+def daily_summary(conn):
+    return bankdb.daily_summary(conn.cursor())
+
+
+def report_rows(conn, start_date, end_date):
+    # (columns, rows) of every transaction in the range
+    return report(conn, "detailed", start_date, end_date)
+
+
+# Import / export
+def import_csv(conn, filename, progress=None):
+    import bankio
+    return bankio.import_csv(conn, filename, progress)
+
+
+def export_csv(conn, filename, columns=None, start_date=None, end_date=None, progress=None):
+    import bankio
+    return bankio.export_csv(conn, filename, columns, start_date, end_date, progress)
+
+
+def export_excel(conn, filename, columns=None, start_date=None, end_date=None, progress=None):
+    import bankio
+    return bankio.export_excel(conn, filename, columns, start_date, end_date, progress)
+
+
+def export_pdf(conn, filename, start_date=None, end_date=None, progress=None):
+    import bankio
+    return bankio.export_pdf(conn, filename, start_date, end_date, progress)
+
+
+def build_receipt(conn, sr_no, filename):
+    import bankreceipts
+    bankreceipts.build_receipt(get_transaction(conn, sr_no), filename)
+
+
+def batch_receipts(conn, output, combined=False, sr_nos=None, start_date=None, end_date=None,
+                   progress=None):
+    import bankreceipts
+    return bankreceipts.batch_receipts(conn, output, combined, sr_nos, start_date, end_date,
+                                       progress=progress)
+
+
+# Maintenance
+def check_integrity(conn, repair=True, progress=None):
+    # Every consistency check the books have, as a list of problems (empty
+    # when all is well): SQLite's own page check, the search index against
+    # its content table, and the trigger-maintained totals and balances
+    # against a recount. With repair the derived tables are rebuilt.
+    # progress(done, total, message) runs before each of the four checks.
+    def step(done, message):
+        if progress:
+            progress(done, 4, message)
+
+    step(0, "Checking database pages")
+    problems = [f"database: {row[0]}" for row in conn.execute("PRAGMA integrity_check")
+                if row[0] != "ok"]
+    step(1, "Checking search index")
+    try:
+        conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('integrity-check')")
+    except Exception as e:
+        problems.append(f"search index: {e}")
+        if repair:
+            conn.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+    conn.commit()
+    step(2, "Recounting totals")
+    problems += [f"totals {txn_type}: stored {format_amount(stored_amount)} ({stored_count} rows), "
+                 f"actual {format_amount(actual_amount)} ({actual_count} rows)"
+                 for txn_type, stored_amount, stored_count, actual_amount, actual_count
+                 in bankdb.check_totals(conn, repair)]
+    step(3, "Recounting balances")
+    problems += [f"balance {account}: stored {format_amount(stored)}, actual {format_amount(actual)}"
+                 for account, stored, actual in bankdb.check_balances(conn, repair)]
+    return problems
+
+
+def archive_years(conn, through=None, progress=None):
+    # Moves closed years up to through out to their archive files
+    return bankarchive.archive_through(conn, through, progress)
+
+
+def rebuild_rollup(conn):
+    bankdb.rebuild_daily_rollup(conn.cursor())
+    conn.commit()
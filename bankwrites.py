@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+
+# Group commit for transaction entry. Writes submitted within GROUP_WINDOW of
+# each other are applied in one SQLite transaction with a single commit
+# instead of one commit (and WAL sync) each. Every write runs inside its own
+# savepoint, so one that fails is undone alone and reported to its own
+# error callback while the rest of the batch commits.
+GROUP_WINDOW = 0.02
+MAX_BATCH = 500
+
+
+def apply_batch(conn, calls):
+    # calls: [(fn, args)] with fn(conn, *args) not committing itself.
+    # Returns [(ok, result or exception)] in order. If the commit itself
+    # fails the whole batch is rolled back and the error raised.
+    outcomes = []
+    conn.execute("BEGIN")
+    try:
+        for fn, args in calls:
+            conn.execute("SAVEPOINT item")
+            try:
+                result = fn(conn, *args)
+            except Exception as e:
+                conn.execute("ROLLBACK TO item")
+                outcomes.append((False, e))
+            else:
+                outcomes.append((True, result))
+            conn.execute("RELEASE item")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return outcomes
+
+
+def apply_each(target, calls):
+    # The same outcomes for targets that commit every call on their own
+    outcomes = []
+    for fn, args in calls:
+        try:
+            outcomes.append((True, fn(target, *args)))
+        except Exception as e:
+            outcomes.append((False, e))
+    return outcomes
+
+
+class Write:
+    def __init__(self, name, args, on_done, on_error):
+        self.name = name
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+# Collects writes on a thread of its own and hands each batch to apply(writes)
+# -> outcomes. Per-write done / error callbacks and the once-per-batch
+# on_batch(count) callback go through post, e.g. JobExecutor.post so they
+# run on the Tk thread; by default they are called on the writer thread.
+class WriteQueue:
+    def __init__(self, apply, post=None, on_batch=None, window=GROUP_WINDOW, max_batch=MAX_BATCH):
+        self.apply = apply
+        self.post = post or (lambda callback, *args: callback(*args))
+        self.on_batch = on_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.writes = queue.Queue()
+        self.thread = threading.Thread(target=self.work, name="bank-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, name, *args, on_done=None, on_error=None):
+        self.writes.put(Write(name, args, on_done, on_error))
+
+    def collect(self, first):
+        # The first write plus whatever arrives within the window
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                write = self.writes.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if write is None:
+                self.writes.put(None)
+                break
+            batch.append(write)
+        return batch
+
+    def work(self):
+        while True:
+            write = self.writes.get()
+            if write is None:
+                break
+            batch = self.collect(write)
+            try:
+                outcomes = self.apply(batch)
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+            for write, (ok, value) in zip(batch, outcomes):
+                callback = write.on_done if ok else write.on_error
+                if callback:
+                    self.post(callback, value)
+            if self.on_batch:
+                self.post(self.on_batch, len(batch))
+
+    def shutdown(self):
+        # Writes already submitted are applied first
+        self.writes.put(None)
+        self.thread.join()
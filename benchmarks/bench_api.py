@@ -0,0 +1,101 @@
+# Latency of the bankserver API under several counters at once: N client
+# threads, each on its own keep-alive connection, send a mix of history-page
+# reads and add_transaction writes to a server process on a synthetic
+# database. Reports p50 / p99 per kind and overall throughput.
+#
+#   python -m benchmarks.bench_api [--clients 1,4,16] [--requests 500] [--writes 0.2] [--rows 100000]
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import bankclient
+import bankdb
+import bankpool
+from benchmarks.synthdata import generate_transactions, populate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_COLUMNS = "sr_no, date, customer_name, amount"
+
+
+def start_server(path):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "bankserver.py"),
+                               "--db", path, "--port", "0"],
+                              stderr=subprocess.PIPE, text=True)
+    line = server.stderr.readline()
+    if not line.startswith("listening on "):
+        server.kill()
+        raise RuntimeError(f"server failed to start: {line}{server.stderr.read()}")
+    return server, line.split()[-1]
+
+
+def client(url, requests, write_share, seed, latencies):
+    session = bankclient.RemoteSession(url)
+    rng = random.Random(seed)
+    reads, writes = [], []
+    for row in generate_transactions(requests, seed=100 + seed):
+        start = time.perf_counter()
+        if rng.random() < write_share:
+            session.add_transaction(*row[1:])
+            writes.append(time.perf_counter() - start)
+        else:
+            session.history_page(HISTORY_COLUMNS, 100)
+            reads.append(time.perf_counter() - start)
+    session.close()
+    latencies.append((reads, writes))
+
+
+def percentiles(samples):
+    if not samples:
+        return f"{'-':>30}"
+    samples.sort()
+    return (f"p50 {statistics.median(samples) * 1000:7.2f} ms  "
+            f"p99 {samples[int(len(samples) * 0.99)] * 1000:7.2f} ms")
+
+
+def run(url, clients, requests, write_share):
+    latencies = []
+    threads = [threading.Thread(target=client, args=(url, requests, write_share, n, latencies))
+               for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    reads = [t for client_reads, _ in latencies for t in client_reads]
+    writes = [t for _, client_writes in latencies for t in client_writes]
+    print(f"{clients:3} clients  reads {percentiles(reads)}  writes {percentiles(writes)}  "
+          f"{(len(reads) + len(writes)) / elapsed:7,.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=500, help="requests per client")
+    parser.add_argument("--writes", type=float, default=0.2, help="share of requests that write")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows already in the table")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bank.db")
+        conn = bankpool.open_connection(path)
+        bankdb.migrate(conn)
+        populate(conn, args.rows)
+        conn.close()
+        server, url = start_server(path)
+        try:
+            for clients in map(int, args.clients.split(",")):
+                run(url, clients, args.requests, args.writes)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Commit latency of a single GUI-style write (insert a transaction and its
+# ledger postings, commit) with the default sqlite3 connection against the tuned
+# bankpool connection, which runs WAL with synchronous=NORMAL and caches
+# prepared statements.
+#
+#   python -m benchmarks.bench_commit [--commits 2000] [--rows 100000]
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import bankdb
+import bankpool
+from benchmarks.synthdata import generate_transactions, populate
+
+
+def default_connection(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    return conn
+
+
+def run(conn, commits):
+    rows = generate_transactions(commits, seed=3)
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        conn.execute('''INSERT INTO transactions
+                        (date, customer_name, account_number, ifsc_code, mobile, address,
+                         transaction_no, transaction_type, transaction_mode, bank_name, amount)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', row)
+        conn.commit()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return (statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.99)] * 1000,
+            len(latencies) / sum(latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=100_000, help="rows already in the table")
+    args = parser.parse_args()
+
+    configs = [
+        ("default", default_connection),
+        ("tuned", bankpool.open_connection),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, open_connection in configs:
+            path = os.path.join(tmp, f"{name}.db")
+            conn = open_connection(path)
+            bankdb.migrate(conn)
+            populate(conn, args.rows)
+            p50, p99, rate = run(conn, args.commits)
+            print(f"{name:8} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  {rate:8,.0f} commits/s")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# CSV import throughput: the streaming importer against the original
+# row-by-row iterrows() loop, on a synthetic statement dump with a share of
+# invalid rows mixed in.
+#
+#   python -m benchmarks.bench_import [--rows 200000] [--legacy]
+import argparse
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import bankdb
+import bankio
+import bankmoney
+from benchmarks.synthdata import BANKS, generate_transactions
+
+CSV_COLUMNS = ['customer_name', 'account_number', 'ifsc_code', 'mobile', 'address',
+               'transaction_no', 'transaction_type', 'transaction_mode', 'bank_name', 'amount']
+
+
+def write_csv(path, rows, bad_every=50):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for n, row in enumerate(generate_transactions(rows, seed=7)):
+            row = list(row[1:])
+            row[-1] = bankmoney.format_amount(row[-1], grouping=False)
+            if bad_every and n % bad_every == 0:
+                row[3] = "12345"  # invalid mobile
+            writer.writerow(row)
+
+
+def fresh_db(path):
+    conn = sqlite3.connect(path)
+    bankdb.migrate(conn)
+    conn.executemany("INSERT INTO banks (bank_name) VALUES (?)", [(b,) for b in BANKS])
+    conn.commit()
+    return conn
+
+
+def legacy_import(conn, filename):
+    cursor = conn.cursor()
+    df = pd.read_csv(filename)
+    for _, row in df.iterrows():
+        cursor.execute('''INSERT INTO transactions
+            (date, customer_name, account_number, ifsc_code, mobile, address,
+             transaction_no, transaction_type, transaction_mode, amount)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+             row['customer_name'], row['account_number'], row['ifsc_code'],
+             str(row['mobile']), row.get('address', ''),
+             row['transaction_no'], row['transaction_type'],
+             row['transaction_mode'], row['amount']))
+    conn.commit()
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--legacy", action="store_true", help="also time the original importer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "statement.csv")
+        write_csv(source, args.rows)
+
+        conn = fresh_db(os.path.join(tmp, "stream.db"))
+        start = time.perf_counter()
+        imported, rejected, _ = bankio.import_csv(conn, source)
+        elapsed = time.perf_counter() - start
+        print(f"streaming: {imported:,} imported, {rejected:,} rejected in {elapsed:.2f}s "
+              f"({args.rows / elapsed:,.0f} rows/s)")
+        conn.close()
+
+        if args.legacy:
+            conn = fresh_db(os.path.join(tmp, "legacy.db"))
+            start = time.perf_counter()
+            count = legacy_import(conn, source)
+            elapsed = time.perf_counter() - start
+            print(f"legacy:    {count:,} imported, no validation in {elapsed:.2f}s "
+                  f"({args.rows / elapsed:,.0f} rows/s)")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Query plans and timings for the GUI's transaction queries before and after
+# the secondary-index migration, on a synthetic database.
+#
+#   python -m benchmarks.bench_indexes [--rows 1000000]
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import bankdb
+from benchmarks.synthdata import populate
+
+QUERIES = [
+    ("history first page",
+     '''SELECT sr_no, date, customer_name, account_number, ifsc_code, mobile,
+               transaction_type, transaction_mode, bank_name, amount
+        FROM transactions ORDER BY date DESC, sr_no DESC LIMIT 100''', ()),
+    ("history filtered page",
+     '''SELECT sr_no, date, customer_name, account_number, ifsc_code, mobile,
+               transaction_type, transaction_mode, bank_name, amount
+        FROM transactions WHERE date >= ? AND date < ?
+        ORDER BY date DESC, sr_no DESC LIMIT 100''', ("2023-03-01", "2023-04-01")),
+    ("report range scan",
+     "SELECT * FROM transactions WHERE date BETWEEN ? AND ?", ("2023-03-01", "2023-04-01")),
+    ("report summary",
+     '''SELECT transaction_type, transaction_mode, SUM(amount) FROM transactions
+        WHERE date BETWEEN ? AND ? GROUP BY transaction_type, transaction_mode''',
+     ("2023-01-01", "2023-12-31")),
+    ("daily summary",
+     '''SELECT date(date) AS trans_date,
+               SUM(CASE WHEN transaction_type='Deposit' THEN amount ELSE 0 END),
+               SUM(CASE WHEN transaction_type='Withdrawal' THEN amount ELSE 0 END)
+        FROM transactions GROUP BY trans_date ORDER BY trans_date DESC''', ()),
+    ("deposit total",
+     "SELECT SUM(amount) FROM transactions WHERE transaction_type='Deposit'", ()),
+    ("bank ledger",
+     "SELECT * FROM transactions WHERE bank_name=? ORDER BY date DESC LIMIT 100", ("HDFC",)),
+    ("account lookup",
+     "SELECT * FROM transactions WHERE account_number=?", None),
+    ("transaction no lookup",
+     "SELECT * FROM transactions WHERE transaction_no=?", ("TXN00000123456",)),
+]
+
+
+def run_queries(conn, repeat):
+    results = {}
+    for name, sql, params in QUERIES:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            best = min(best, time.perf_counter() - start)
+        results[name] = (best, plan)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        bankdb.migrate(conn, target=1)
+        start = time.perf_counter()
+        populate(conn, args.rows)
+        print(f"populated {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+
+        account = conn.execute("SELECT account_number FROM transactions LIMIT 1").fetchone()[0]
+        for i, (name, sql, params) in enumerate(QUERIES):
+            if params is None:
+                QUERIES[i] = (name, sql, (account,))
+
+        before = run_queries(conn, args.repeat)
+        start = time.perf_counter()
+        bankdb.migrate(conn)
+        print(f"migrated to v{bankdb.schema_version(conn)} in {time.perf_counter() - start:.1f}s\n")
+        after = run_queries(conn, args.repeat)
+        conn.close()
+
+    for name, _, _ in QUERIES:
+        (t0, plan0), (t1, plan1) = before[name], after[name]
+        print(f"{name:<24} {t0 * 1000:10.2f} ms -> {t1 * 1000:10.2f} ms  ({t0 / max(t1, 1e-9):,.0f}x)")
+        print(f"    before: {'; '.join(plan0)}")
+        print(f"    after:  {'; '.join(plan1)}")
+
+
+if __name__ == "__main__":
+    main()
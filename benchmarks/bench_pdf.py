@@ -0,0 +1,61 @@
+# Ledger PDF export time and peak RSS across table sizes. Each export runs
+# in a fresh subprocess so its peak RSS is measured in isolation.
+#
+#   python -m benchmarks.bench_pdf [--sizes 10000 100000 1000000]
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import bankdb
+from benchmarks.bench_suite import peak_rss_mb
+from benchmarks.synthdata import populate
+
+
+def child(db_path, pdf_path):
+    import bankio
+
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    pages = bankio.export_pdf(conn, pdf_path)
+    elapsed = time.perf_counter() - start
+    # The child's own peak: ru_maxrss would carry over building the data
+    peak = peak_rss_mb()
+    print(f"{pages} {elapsed:.3f} {peak:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f"{'rows':>10} {'pages':>7} {'seconds':>9} {'rows/s':>9} {'peak RSS':>10} {'file':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            db_path = os.path.join(tmp, f"bench_{rows}.db")
+            pdf_path = os.path.join(tmp, f"ledger_{rows}.pdf")
+            conn = sqlite3.connect(db_path)
+            bankdb.migrate(conn)
+            populate(conn, rows)
+            conn.close()
+
+            out = subprocess.run([sys.executable, "-m", "benchmarks.bench_pdf", "--child", db_path, pdf_path],
+                                 check=True, capture_output=True, text=True).stdout.split()
+            pages, elapsed, peak = int(out[0]), float(out[1]), float(out[2])
+            size = os.path.getsize(pdf_path) / 2**20
+            print(f"{rows:>10,} {pages:>7,} {elapsed:>9.1f} {rows / elapsed:>9,.0f} "
+                  f"{peak:>7.1f} MB {size:>7.1f} MB")
+            os.remove(pdf_path)
+            os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
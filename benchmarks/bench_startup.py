@@ -0,0 +1,97 @@
+# Cold start of the GUI: wall time from launching the interpreter to the
+# first painted login screen, and the slowest imports on the way there as
+# reported by python -X importtime. --eager also imports the report modules
+# up front, the way bankingsoft did before they were deferred, for
+# comparison. Needs a display.
+#
+#   python -m benchmarks.bench_startup [--runs 5] [--top 15] [--eager]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child. mainloop is replaced by one update() so the process
+# paints the login screen, reports and exits instead of waiting for input.
+CHILD = '''
+import time
+start = time.perf_counter()
+import tkinter
+
+def mainloop(self, n=0):
+    self.update()
+    print(f"painted {time.perf_counter() - start:.6f}", flush=True)
+    self.destroy()
+
+tkinter.Misc.mainloop = mainloop
+import bankingsoft
+for name in {eager!r}:
+    __import__(name)
+bankingsoft.BankingApp()
+'''
+
+EAGER_MODULES = ["tkcalendar", "pandas", "matplotlib.pyplot",
+                 "matplotlib.backends.backend_tkagg", "bankio", "bankreceipts"]
+
+
+def launch(cwd, eager, importtime=False):
+    # (wall seconds from spawn to paint, seconds inside the child, stderr)
+    flags = ["-X", "importtime"] if importtime else []
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    code = CHILD.format(eager=EAGER_MODULES if eager else [])
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, *flags, "-c", code], cwd=cwd, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = child.stdout.readline()
+    wall = time.perf_counter() - start
+    _, stderr = child.communicate()
+    if child.returncode or not line.startswith("painted"):
+        raise RuntimeError(f"child failed:\n{stderr[-2000:]}")
+    return wall, float(line.split()[1]), stderr
+
+
+def slowest_imports(stderr, top):
+    # importtime lines: "import time: self [us] | cumulative | imported package";
+    # only top-level imports (no indentation) are ranked
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            imports.append((int(cumulative), name.strip()))
+    imports.sort(reverse=True)
+    return imports[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--eager", action="store_true", help="also import the report modules up front")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # First launch creates bank.db; it and the OS file cache are warm after it
+        launch(tmp, args.eager)
+        walls, insides = [], []
+        for _ in range(args.runs):
+            wall, inside, _ = launch(tmp, args.eager)
+            walls.append(wall)
+            insides.append(inside)
+        _, _, stderr = launch(tmp, args.eager, importtime=True)
+
+    mode = "eager" if args.eager else "lazy"
+    print(f"{mode}: first paint {statistics.median(walls) * 1000:7.1f} ms from spawn, "
+          f"{statistics.median(insides) * 1000:7.1f} ms in-process (median of {args.runs})")
+    print(f"{'cumulative ms':>14}  import")
+    for cumulative, name in slowest_imports(stderr, args.top):
+        print(f"{cumulative / 1000:14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
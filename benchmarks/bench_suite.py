@@ -0,0 +1,205 @@
+# Regression suite for the GUI's hot paths, run headlessly against the
+# bankservice functions each one calls. Every case runs in a fresh
+# subprocess on a synthetic database, so wall time starts from a cold
+# process and peak RSS is the case's own. Results go to a JSON file that
+# a later run can be compared against with --compare.
+#
+#   python -m benchmarks.bench_suite [--sizes 10000 100000 1000000] [--cases ...]
+#                                    [--output results.json] [--compare earlier.json]
+#                                    [--workdir DIR]
+#
+# 10,000,000 rows works too (--sizes 10000000) but takes a long while to
+# build and several GB of disk; --workdir keeps the databases and CSVs
+# between runs so they are only built once. Only the import and export
+# cases load pandas / openpyxl / reportlab, as in the app, so the other
+# cases' peak RSS is not inflated by them.
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import bankdb
+import bankpool
+import bankservice
+from benchmarks.synthdata import SPAN_DAYS, START_DATE, populate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED = 0
+# What load_transactions asks for: the first history page
+HISTORY_COLUMNS = '''sr_no, date, customer_name, account_number, ifsc_code, mobile,
+                   transaction_type, transaction_mode, bank_name, amount'''
+HISTORY_PAGE_SIZE = 100
+# generate_report covers the synthetic data's whole span; the dates'
+# jitter can run a little past SPAN_DAYS
+REPORT_START = START_DATE.date()
+REPORT_END = date.fromordinal(REPORT_START.toordinal() + SPAN_DAYS + 31)
+
+
+def report_case(name):
+    return lambda conn, work: len(bankservice.report(conn, name, REPORT_START, REPORT_END)[1])
+
+
+# case -> fn(conn, work directory) returning a count for the record
+CASES = {
+    "load_transactions": lambda conn, work: len(bankservice.history_page(conn, HISTORY_COLUMNS,
+                                                                         HISTORY_PAGE_SIZE)),
+    "update_balances": lambda conn, work: len(bankservice.dashboard(conn)['banks']),
+    "show_daily_summary": lambda conn, work: len(bankservice.daily_summary(conn)),
+    "report_summary": report_case("summary"),
+    "report_detailed": report_case("detailed"),
+    "report_daily_totals": report_case("daily_totals"),
+    "report_by_bank": report_case("by_bank"),
+    "report_top_customers": report_case("top_customers"),
+    "report_graphical": lambda conn, work: len(bankservice.cash_flow(conn, REPORT_START, REPORT_END)['rows']),
+    "import_csv": lambda conn, work: import_case(work),
+    "export_csv": lambda conn, work: bankservice.export_csv(conn, os.path.join(work, "export.csv")),
+    "export_excel": lambda conn, work: bankservice.export_excel(conn, os.path.join(work, "export.xlsx")),
+    "export_pdf": lambda conn, work: bankservice.export_pdf(conn, os.path.join(work, "export.pdf")),
+}
+
+
+def import_case(work):
+    # Into an empty database, as a first statement upload would be
+    from benchmarks.bench_import import fresh_db
+    path = os.path.join(work, "import.db")
+    fresh_db(path).close()
+    conn = bankpool.open_connection(path)
+    try:
+        return bankservice.import_csv(conn, os.path.join(work, "import.csv"))[0]
+    finally:
+        conn.close()
+
+
+def peak_rss_mb():
+    # VmHWM where there is /proc: ru_maxrss survives fork and exec, so a
+    # child would report the parent's peak from building the data
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def child(case, db_path, work):
+    conn = bankpool.open_connection(db_path)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    count = CASES[case](conn, work)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"wall_s": round(elapsed, 4), "peak_rss_mb": round(peak_rss_mb(), 1),
+                      "baseline_rss_mb": round(baseline, 1), "count": count}))
+
+
+def prepare(work, rows):
+    # The database and import CSV for one size, reused when already there
+    from benchmarks.bench_import import write_csv
+    db_path = os.path.join(work, f"bench_{rows}_{SEED}.db")
+    if not os.path.exists(db_path):
+        conn = bankpool.open_connection(db_path + ".part")
+        bankdb.migrate(conn)
+        populate(conn, rows, SEED)
+        # Past days checkpointed, so update_balances times the steady state
+        bankservice.close_days(conn)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.close()
+        os.replace(db_path + ".part", db_path)
+    csv_path = os.path.join(work, f"import_{rows}.csv")
+    if not os.path.exists(csv_path):
+        write_csv(csv_path + ".part", rows)
+        os.replace(csv_path + ".part", csv_path)
+    return db_path, csv_path
+
+
+def run_case(case, rows, db_path, csv_path, work):
+    # Writing cases get a scratch directory and the database stays as built
+    scratch = tempfile.mkdtemp(dir=work)
+    try:
+        os.symlink(csv_path, os.path.join(scratch, "import.csv"))
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_suite", "--child", case, db_path, scratch],
+                             cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        return {"rows": rows, "case": case, **json.loads(out.splitlines()[-1])}
+    finally:
+        for name in os.listdir(scratch):
+            os.remove(os.path.join(scratch, name))
+        os.rmdir(scratch)
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": SEED,
+    }
+
+
+def compare(results, earlier_path):
+    with open(earlier_path) as f:
+        earlier = {(r["rows"], r["case"]): r for r in json.load(f)["results"]}
+    print(f"\nagainst {earlier_path}")
+    print(f"{'rows':>10} {'case':<22} {'wall':>9} {'was':>9} {'ratio':>6} {'RSS MB':>8} {'was':>8}")
+    for result in results:
+        before = earlier.get((result["rows"], result["case"]))
+        if before:
+            print(f"{result['rows']:>10,} {result['case']:<22} {result['wall_s']:>9.3f} {before['wall_s']:>9.3f} "
+                  f"{result['wall_s'] / max(before['wall_s'], 1e-6):>6.2f} "
+                  f"{result['peak_rss_mb']:>8.1f} {before['peak_rss_mb']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--output", help="results file (default bench_suite_<time>.json)")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    parser.add_argument("--workdir", help="keep databases and CSVs here between runs")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    meta = metadata()
+    output = args.output or f"bench_suite_{datetime.now():%Y%m%d_%H%M%S}.json"
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work = args.workdir or tmp
+        os.makedirs(work, exist_ok=True)
+        print(f"{'rows':>10} {'case':<22} {'seconds':>9} {'peak RSS':>11} {'count':>10}")
+        for rows in args.sizes:
+            db_path, csv_path = prepare(work, rows)
+            for case in args.cases:
+                result = run_case(case, rows, db_path, csv_path, work)
+                results.append(result)
+                print(f"{rows:>10,} {case:<22} {result['wall_s']:>9.3f} "
+                      f"{result['peak_rss_mb']:>8.1f} MB {result['count']:>10,}")
+                # Written as it goes, so a long run stopped early keeps its results
+                with open(output, "w") as f:
+                    json.dump({"meta": meta, "results": results}, f, indent=1)
+    print(f"results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Deterministic synthetic data for the benchmarks. The same (rows, seed)
+# always produces the same database, so runs can be compared over time.
+import random
+from datetime import datetime, timedelta
+
+import bankservice
+
+BANKS = ["SBI", "HDFC", "ICICI", "Axis", "PNB", "Canara", "Kotak", "BoB"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Kavya",
+               "Rohan", "Priya", "Sneha", "Arjun", "Meera", "Rahul", "Pooja"]
+LAST_NAMES = ["Sharma", "Verma", "Patel", "Reddy", "Nair", "Gupta", "Singh",
+              "Iyer", "Das", "Khan", "Joshi", "Mehta", "Rao", "Bose"]
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Kolkata", "Jaipur", "Indore"]
+
+START_DATE = datetime(2020, 1, 1, 9, 0, 0)
+SPAN_DAYS = 5 * 365
+BATCH_SIZE = 50000
+USERS = 25
+SECURITY_QUESTIONS = ["What is your pet's name?", "What city were you born in?",
+                      "What was your first school?"]
+
+
+def make_customers(rng, count):
+    customers = []
+    for i in range(count):
+        bank = rng.choice(BANKS)
+        customers.append((
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            f"{rng.randrange(10**11, 10**12)}",
+            f"{bank[:4].upper():X<4}0{rng.randrange(10**5, 10**6)}",
+            f"{rng.choice('6789')}{rng.randrange(10**8, 10**9)}",
+            f"{rng.randrange(1, 500)} MG Road, {rng.choice(CITIES)}",
+        ))
+    return customers
+
+
+def generate_transactions(rows, seed=0):
+    rng = random.Random(seed)
+    customers = make_customers(rng, max(rows // 20, 100))
+    # Dates advance monotonically with jitter, like a real counter's log
+    step = SPAN_DAYS * 86400 / max(rows, 1)
+    elapsed = 0.0
+    for n in range(rows):
+        elapsed += rng.uniform(0, 2 * step)
+        name, account, ifsc, mobile, address = rng.choice(customers)
+        mode = "Cash" if rng.random() < 0.6 else "Bank"
+        yield (
+            (START_DATE + timedelta(seconds=elapsed)).strftime("%Y-%m-%d %H:%M:%S"),
+            name, account, ifsc, mobile, address,
+            f"TXN{seed:02d}{n:09d}",
+            "Deposit" if rng.random() < 0.55 else "Withdrawal",
+            mode,
+            rng.choice(BANKS) if mode == "Bank" else None,
+            round(rng.uniform(100, 50000) * 100),  # paise
+        )
+
+
+def generate_users(count, seed=0):
+    # Counter staff logins; every password is "pass<n>" and every answer
+    # "answer<n>", stored hashed as register_user would
+    rng = random.Random(seed)
+    for n in range(count):
+        yield (
+            f"{rng.choice(FIRST_NAMES).lower()}{n:03d}",
+            bankservice.hash_secret(f"pass{n}"),
+            rng.choice(SECURITY_QUESTIONS),
+            bankservice.hash_secret(f"answer{n}"),
+        )
+
+
+def populate(conn, rows, seed=0, users=USERS):
+    cursor = conn.cursor()
+    cursor.executemany("INSERT OR IGNORE INTO banks (bank_name) VALUES (?)",
+                       [(bank,) for bank in BANKS])
+    cursor.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?)", generate_users(users, seed))
+    batch = []
+    for row in generate_transactions(rows, seed):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            insert_transactions(cursor, batch)
+            batch = []
+    if batch:
+        insert_transactions(cursor, batch)
+    conn.commit()
+
+
+def insert_transactions(cursor, batch):
+    cursor.executemany('''INSERT INTO transactions
+                        (date, customer_name, account_number, ifsc_code, mobile, address,
+                         transaction_no, transaction_type, transaction_mode, bank_name, amount)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', batch)